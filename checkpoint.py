@@ -0,0 +1,101 @@
+"""
+Checkpoints of a deck conversion in progress.
+
+Every converted (word, reading) and its HTML is written to a checkpoint file next to the output,
+committed a batch at a time. If the conversion stops partway through, running it again with --resume
+reads the finished words back and only converts the rest.
+The file is removed once the deck has been converted.
+"""
+
+import os
+import sqlite3
+
+CHECKPOINT_EVERY = 200
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS completed (
+    word TEXT NOT NULL,
+    reading TEXT NOT NULL,
+    html TEXT NOT NULL,
+    PRIMARY KEY (word, reading)
+) WITHOUT ROWID;
+"""
+
+
+class Checkpoint:
+    """
+    SQLite file of (word, reading) -> definition HTML, like ResultCache but for one deck and one run.
+    Only the file holds the HTML, so memory doesn't grow with the deck.
+    An empty string means the word was looked up and nothing was found.
+
+    The version it was written with is kept too, a checkpoint from another version isn't resumed.
+    Writes are committed every flush_every words and on close(); use it as a context manager.
+    """
+
+    def __init__(self, path, version="", resume=False, flush_every=CHECKPOINT_EVERY):
+        self.path = path
+        self.version = version
+        self.flush_every = flush_every
+        self._pending = 0
+
+        self._connection = sqlite3.connect(path)
+        self._connection.execute("PRAGMA journal_mode = WAL")
+        self._connection.execute("PRAGMA synchronous = NORMAL")
+        self._connection.executescript(SCHEMA)
+
+        row = self._connection.execute("SELECT value FROM meta WHERE key = 'version'").fetchone()
+        same_version = row is not None and row[0] == version
+        if resume and same_version:
+            count = self._connection.execute("SELECT COUNT(*) FROM completed").fetchone()[0]
+            print(f"Resuming from {path}: {count} words already converted")
+        else:
+            if resume and row is not None:
+                print(f"{path} was written with other dictionary data, starting over")
+            self._connection.execute("DELETE FROM completed")
+            self._connection.execute(
+                "INSERT OR REPLACE INTO meta (key, value) VALUES ('version', ?)", (version,)
+            )
+            self._connection.commit()
+
+    def get(self, word, reading):
+        """Returns the checkpointed HTML ("" if nothing was found), or None if the word isn't done yet."""
+        row = self._connection.execute(
+            "SELECT html FROM completed WHERE word = ? AND reading = ?", (word, reading)
+        ).fetchone()
+        return row[0] if row else None
+
+    def put(self, word, reading, html):
+        self._connection.execute(
+            "INSERT OR REPLACE INTO completed (word, reading, html) VALUES (?, ?, ?)",
+            (word, reading, html or ""),
+        )
+        self._pending += 1
+        if self._pending >= self.flush_every:
+            self.flush()
+
+    def flush(self):
+        self._connection.commit()
+        self._pending = 0
+
+    def close(self):
+        if self._connection is not None:
+            self.flush()
+            self._connection.close()
+            self._connection = None
+
+    def discard(self):
+        """Removes the checkpoint file, once the conversion is done."""
+        self.close()
+        for path in (self.path, f"{self.path}-wal", f"{self.path}-shm"):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -2,16 +2,21 @@
 The main script.
 """
 
+import argparse
+import contextlib
+import glob
 import json
+import multiprocessing
 import os
 import re
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 
 import pandas as pd
 
-from scraper import (
-    convert_word_to_hiragana,
-    get_hiragana_only,
-)
+from kana import hiragana_only, hiragana_only_column, to_hiragana
 
 from math import exp
 from bs4 import BeautifulSoup 
@@ -31,206 +36,234 @@ from convert_to_big_data import (
     PREFIX,
     recursive_nesting_by_category,
     dict_to_text,
+    definition_fingerprint,
+    get_entry_from_sense_tree,
+    load_sense_trees,
+    BIG_DATA_FILE,
+    SENSE_TREES_FILE,
+    file_version,
 )
+from definition_store import DEFINITION_STORE_FILE, DefinitionStore
+from lookup_indexes import LOOKUP_INDEXES_FILE, LookupIndexes, load_lookup_indexes
+from result_cache import RESULT_CACHE_FILE, ResultCache
+from checkpoint import Checkpoint
+from deck_manifest import DeckManifest, note_key
+from deinflect import deinflect_with_reading
+from similarity_index import SimilarityIndex, load_similarity_index
+from link_graph import load_link_graph
 
 # from AnkiTools import anki_convert
 
 big_data_dictionary = {}
+# How many get_definitions results are kept in memory
+DEFINITIONS_CACHE_SIZE = 4096
+# How many words process_deck hands to get_definitions_batch at once
+LOOKUP_BATCH_SIZE = 1000
+# Bump when link_up or the HTML changes, so cached results aren't reused
+RENDER_VERSION = 4
+# How long a definition can get with the definitions it links to by default, see expand_links
+LINK_EXPANSION_BUDGET = 3000
+# What a link adds at the very least: "<br /> Linked 【】<br />" and a character of definition
+_SMALLEST_LINK = "<br /> Linked 【】<br />x"
+# {fingerprint: sense tree} of the definitions in big_data, see build_sense_tree.
+sense_trees = {}
+# Character bitsets of the reading buckets, for the similarity checks in find_definitions
+similarity_index = SimilarityIndex()
+# Resolved links and their expansions, see link_graph.py. None to resolve every link in link_up.
+link_graph = None
+
+
+def _kanji_number(i):
+    """1 -> 一, 10 -> 十, 42 -> 四十二"""
+    digits = "〇一二三四五六七八九"
+    if i < 10:
+        return digits[i]
+    return ("十" if i // 10 == 1 else digits[i // 10] + "十") + (digits[i % 10] if i % 10 else "")
+
+
+def _to_full_width(number):
+    return "".join(chr(ord("０") + int(digit)) for digit in str(number))
+
+
+# Tried in this order, each one on the result of the previous ones.
+# 100 first, then the bigger numbers, so 12 becomes 十二 and not 一二.
+NUMERAL_REPLACEMENTS = (
+    ("１００", "百"),
+    ("100", "百"),
+    *((str(i), _kanji_number(i)) for i in range(99, 0, -1)),  # 半角
+    *((_to_full_width(i), _kanji_number(i)) for i in range(99, 0, -1)),  # 全角
+)
+
+# (word replacement, reading replacement), in the order the versions are tried.
+# A None reading replacement keeps the reading as is.
+KANA_REPLACEMENTS = (
+    (("ず", "づ"), ("づ", "ず")),
+    (("づ", "ず"), ("ず", "づ")),
+    (("づく", "付く"), None),
+    (("づける", "付ける"), None),
+    (("じ", "ぢ"), ("じ", "ぢ")),
+    (("ぢ", "じ"), ("ぢ", "じ")),
+    (("がたい", "難い"), None),
+    (("やすい", "易い"), None),
+)
+
+# Removed from the end of the word (and reading). Conjugations are handled by deinflect.py
+POTENTIAL_SUFFIXES = ("ような", "な", "だ", "と", "に", "した", "よう", "になる", "にする", "する", "さん")
+
+_HAS_NUMBER = re.compile(r"[0-9０-９]")
+_ODORIJI = re.compile("(.)々")
+_HIRAGANA_ONLY = re.compile(rf"[{HIRAGANA}]+")
 
 
 # バグ　バグる
 # グーグル ググる　ggrks
 #
-def get_versions_of_word(word, reading, word_to_readings_map, extended=False):
+def iter_versions_of_word(word, reading, word_to_readings_map, extended=False):
     """
-    Generates possible versions of the word by applying various transformations.
+    Lazily yields the possible versions of the word, most likely first, without duplicates.
 
     Args:
     - word (str): The word to transform.
+    - reading (str): The word's reading.
+    - word_to_readings_map (dict): Used to guess the reading when there is none,
+      and to leave out dictionary forms no dictionary has, see deinflect.is_listed.
+    - extended (bool): Also try the reading as the word, and without が.
 
-    Returns:
-    - list: A list of possible word versions.
+    Yields:
+    - tuple: (word, reading)
     """
-    # original_word = word[:]  # Preserve the original word
-    versions = [(word, reading)]
-
-    reading = get_hiragana_only(reading)
-
-    versions.append((word, reading))
-
-    # Deduplicate versions
-    # Number and Katakana conversions
-    def to_full_width(num):
-        return chr(ord("０") + int(num))
-
-    # to_full_width = lambda num: chr(ord("０") + int(num))
-    digit_map = {
-        "0": "〇",
-        "1": "一",
-        "2": "二",
-        "3": "三",
-        "4": "四",
-        "5": "五",
-        "6": "六",
-        "7": "七",
-        "8": "八",
-        "9": "九",
-    }
-
-    tens_map = {
-        "1": "十",
-        "2": "二十",
-        "3": "三十",
-        "4": "四十",
-        "5": "五十",
-        "6": "六十",
-        "7": "七十",
-        "8": "八十",
-        "9": "九十",
-    }
-
-    numbers = {
-        "１００": "百",
-        "100": "百",
-        **{
-            # 半角
-            str(i): (
-                digit_map[str(i)]
-                if i < 10
-                else (
-                    tens_map[str(i // 10)]
-                    + (digit_map[str(i % 10)] if i % 10 != 0 else "")
-                )
-            )
-            for i in range(99, 0, -1)
-        },
-        **{
-            # 全角
-            "".join(to_full_width(d) for d in str(i)): (
-                digit_map[str(i)]
-                if i < 10
-                else (
-                    tens_map[str(i // 10)]
-                    + (digit_map[str(i % 10)] if i % 10 != 0 else "")
-                )
-            )
-            for i in range(99, 0, -1)
-        },
-    }
+    seen = set()
+    versions = []
 
+    def emit(version):
+        if version not in seen:
+            seen.add(version)
+            return True
+        return False
 
-    # Katakana to Hiragana Conversion
-    versions.append((word.replace("ず", "づ"), reading.replace("づ", "ず")))
-    versions.append((word.replace("づ", "ず"), reading.replace("ず", "づ")))
-    versions.append((word.replace("づく", "付く"), reading))
-    versions.append((word.replace("づける", "付ける"), reading))
+    def add(version):
+        versions.append(version)
+        return emit(version)
 
-    versions.append((word.replace("じ", "ぢ"), reading.replace("じ", "ぢ")))
-    versions.append((word.replace("ぢ", "じ"), reading.replace("ぢ", "じ")))
+    if add((word, reading)):
+        yield (word, reading)
 
-    versions.append((word.replace("がたい", "難い"), reading))
-    versions.append((word.replace("やすい", "易い"), reading))
+    reading = hiragana_only(reading)
 
-    # Number Replacement
+    base_versions = [(word, reading)]
 
+    for (word_from, word_to), reading_replacement in KANA_REPLACEMENTS:
+        if reading_replacement:
+            base_versions.append(
+                (word.replace(word_from, word_to), reading.replace(*reading_replacement))
+            )
+        else:
+            base_versions.append((word.replace(word_from, word_to), reading))
 
     # Handle words starting with "御"
     if word.startswith("御"):
         # I know this isn't the smartest check, but I'm not going to overengineer this.
-
+        # We aren't changing the reading, so no need to reflect any changes
         if "お" in reading:
-            # We aren't changing the reading, so no need to reflect any changes
-            versions.append(("お" + word[1:], reading[:]))
-
+            base_versions.append(("お" + word[1:], reading))
         if "ご" in reading:
-            # We aren't changing the reading, so no need to reflect any changes
-            versions.append(("ご" + word[1:], reading[:]))
+            base_versions.append(("ご" + word[1:], reading))
 
     # Handle words starting with "お"
     if word.startswith("お"):
-        versions.append((word[1:], reading[1:]))
+        base_versions.append((word[1:], reading[1:]))
     # ズバズバ言う
     if reading and word.endswith("言う"):
-        versions.append((word[:-2], reading[:-2]))
-
+        base_versions.append((word[:-2], reading[:-2]))
 
     # Replace "いい" with "良い"
     if "いい" in word:
-        ii_yoi_replaced_word = word.replace("いい", "良い")
-        ii_yoi_replaced_reading = reading.replace("いい", "よい")
-
-        # It might be listed as いい, or よい in the reading,
-        # so account for both options.
+        # It might be listed as いい, or よい in the reading, so account for both options.
         # If "いい" appears in the reading unrelated to 良い/いい, then it'll still get changed.
         # Again, I know this isn't the smartest thing to do, but I'm not going to overengineer this.
         # If you wish to contribute, and somehow make this take into account when いい in the reading
         # actually represents 良い in the word, you're welcome to make a PR. It'd be much appreciated.
-
-        versions.append((ii_yoi_replaced_word, reading[:]))
-        versions.append((ii_yoi_replaced_word, ii_yoi_replaced_reading))
+        ii_yoi_replaced_word = word.replace("いい", "良い")
+        base_versions.append((ii_yoi_replaced_word, reading))
+        base_versions.append((ii_yoi_replaced_word, reading.replace("いい", "よい")))
 
     # キーボードー
     if reading and reading[-1] == "ー":
-        versions.append((word[:-1], reading[:-1]))
+        base_versions.append((word[:-1], reading[:-1]))
 
     # Remove common suffixes
     # (!) We must reflect these changes in the reading too.
-    potential_suffixes = ["ような", "な", "だ", "と", "に", "した", "よう", "になる", "にする", "する", "さん"]
-
-    for suffix in [potential_suffix for potential_suffix in potential_suffixes if word.endswith(potential_suffix)]:
-
-        if word.endswith(suffix):
-            no_suffix = word[: -len(suffix)]
-        else:
-            no_suffix = word[:]
-
+    for suffix in POTENTIAL_SUFFIXES:
+        if not word.endswith(suffix):
+            continue
+        no_suffix = word[: -len(suffix)]
         no_suffix_reading = reading[: -len(suffix)]
-
         if no_suffix:
             if no_suffix[-1] == "た":
-                normalized_no_suffix = no_suffix[:-1] + "る"
-                normalized_no_suffix_reading = no_suffix_reading[:-1] + "る"
-                versions.append(
-                    (normalized_no_suffix, normalized_no_suffix_reading)
+                # 見たような → 見た → 見る
+                base_versions.extend(
+                    (candidate, candidate_reading)
+                    for candidate, candidate_reading, _ in deinflect_with_reading(
+                        no_suffix, no_suffix_reading, word_to_readings_map
+                    )
                 )
             else:
-                versions.append((no_suffix, no_suffix_reading))
+                base_versions.append((no_suffix, no_suffix_reading))
 
+    # Dictionary forms of conjugated words: 食べさせられた → 食べさせる, 食べる...
+    for candidate, candidate_reading, _ in deinflect_with_reading(word, reading, word_to_readings_map):
+        base_versions.append((candidate, candidate_reading))
 
-    versions.append((word, word))
-    versions.append((word, ""))
+    base_versions.append((word, word))
+    base_versions.append((word, ""))
 
-    if word != reading and not re.sub(rf"[{HIRAGANA}]+", "", word) == reading: # テンパる→てんぱる
-        versions.append((convert_word_to_hiragana(word), get_hiragana_only(reading)))
+    if word != reading and not _HIRAGANA_ONLY.sub("", word) == reading:  # テンパる→てんぱる
+        base_versions.append((to_hiragana(word), hiragana_only(reading)))
 
     if word in word_to_readings_map and not reading:
         for possible_reading in word_to_readings_map[word]:
-            versions.append((word, possible_reading))
+            base_versions.append((word, possible_reading))
 
-    find_numbers = re.compile(r"[0-9０-９]")
-    for w, r in versions.copy():
+    for version in base_versions:
+        if add(version):
+            yield version
+
+    # Versions derived from the ones above
+    numbered_word = word
+    for w, r in versions[:]:
         if extended:
-            versions.append((r, r))
+            if emit((r, r)):
+                yield (r, r)
             if r and "が" in r and "が" in w:
-                versions.append((w.replace("が", ""), r.replace("が", "")))
+                version = (w.replace("が", ""), r.replace("が", ""))
+                if emit(version):
+                    yield version
 
         if "々" in w:
-            versions.append((re.sub("(.)々", r"\1\1", r), r))
+            version = (_ODORIJI.sub(r"\1\1", r), r)
+            if emit(version):
+                yield version
 
-        if find_numbers.search(w):
-            for num, kanji in numbers.items():
-                if num in word:
-                    word = word.replace(num, kanji)
-                    versions.append((word, reading))
+        # The replacements build on each other, across versions too.
+        if _HAS_NUMBER.search(w) and _HAS_NUMBER.search(numbered_word):
+            for number, kanji in NUMERAL_REPLACEMENTS:
+                if number in numbered_word:
+                    numbered_word = numbered_word.replace(number, kanji)
+                    if emit((numbered_word, reading)):
+                        yield (numbered_word, reading)
 
-    versions_final = []
 
-    for version in versions:
+def get_versions_of_word(word, reading, word_to_readings_map, extended=False):
+    """
+    Generates possible versions of the word by applying various transformations.
 
-        if version and version not in versions_final:
-            versions_final.append(version)
+    Args:
+    - word (str): The word to transform.
 
-    return versions_final
+    Returns:
+    - list: A list of possible word versions.
+    """
+    return list(iter_versions_of_word(word, reading, word_to_readings_map, extended))
 
 
 def parse_definition_html(html):
@@ -506,27 +539,50 @@ def makes_no_fucking_sense(word, reading) -> bool:
 
     return False 
 
-def combine_dupes(data):
-    combined_data = []
+def group_by_definitions(data):
+    """
+    Groups entries that share at least one definition, in one pass.
+
+    Each entry joins the earliest group that has any of its definitions,
+    or starts a new group keyed by its own definitions.
+    The definition strings themselves are the hash keys (str caches its hash),
+    so there's no scanning through the groups.
+
+    Returns:
+    - dict: {tuple(definitions): [(word, reading)]}, in the order the groups were made.
+    """
     definitions_map = {}
+    # {definition: key of the first group it's in}
+    group_of_definition = {}
+    group_order = {}
 
-    for word, reading, definition_list in [
-        (x["word"], x["reading"], x["definitions"]) for x in data
-    ]:
-        # Check if any definition in the current list matches an existing entry
-        matched_key = None
+    for entry in data:
+        word, reading, definition_list = entry["word"], entry["reading"], entry["definitions"]
 
-        for def_key in definitions_map:
-            if any(def_ in def_key for def_ in definition_list):
-                matched_key = def_key
-                break
+        matched_key = None
+        for def_ in definition_list:
+            key = group_of_definition.get(def_)
+            if key is not None and (matched_key is None or group_order[key] < group_order[matched_key]):
+                matched_key = key
 
         # If a match was found, append the word to the existing entry
         if matched_key:
             definitions_map[matched_key].append((word, reading))
-        else:
-            # Use the full list as the key in case of no matches
-            definitions_map[tuple(definition_list)] = [(word, reading)]
+            continue
+
+        # Use the full list as the key in case of no matches
+        key = tuple(definition_list)
+        definitions_map[key] = [(word, reading)]
+        group_order.setdefault(key, len(group_order))
+        for def_ in key:
+            group_of_definition.setdefault(def_, key)
+
+    return definitions_map
+
+
+def combine_dupes(data):
+    combined_data = []
+    definitions_map = group_by_definitions(data)
 
     # Rebuild the combined list with merged words
 
@@ -574,20 +630,16 @@ def combine_dupes(data):
 def entries_with_reading(reading, big_data, dictionary, word_to_readings_map=None):
     # Get entries with a specific reading, then sort
     entries = []
-    if word_to_readings_map:
-        # Get all possible readings by extracting the second element from each result of get_versions_of_word
-        # Filter out None values and remove duplicates by converting to a set
-        possible_readings = set(
-            filter(
-                None, 
-                [version[1] for version in get_versions_of_word(reading, reading, word_to_readings_map, extended=True)]
-            )
-        )
-        # Convert the set to a sorted list based on the length of each reading, in descending order
-        sorted_readings = sorted(possible_readings, key=len, reverse=True)
-    else:
-        # Put our only reading in the list so we can "iterate" over it
-        possible_readings = [reading]
+    possible_readings = None
+    if isinstance(word_to_readings_map, LookupIndexes):
+        # The reading itself, or how else big_data spells it (ず/づ, じ/ぢ, katakana).
+        # Only when the dictionary has none of those, every version of the reading is tried.
+        possible_readings = [
+            possible_reading for possible_reading in word_to_readings_map.readings_like(reading)
+            if possible_reading in big_data[dictionary]
+        ]
+    if not possible_readings:
+        possible_readings = candidate_readings(reading, word_to_readings_map)
 
     # Iterate over all words in the specified dictionary
     for possible_reading in possible_readings:
@@ -613,6 +665,40 @@ def entries_with_reading(reading, big_data, dictionary, word_to_readings_map=Non
     return []
 
 
+def candidate_readings(reading, word_to_readings_map=None):
+    """
+    Every reading a reading could be looked up as, see get_versions_of_word, longest first.
+    With the lookup indexes, the readings no dictionary has are left out.
+    """
+    if not word_to_readings_map:
+        # Put our only reading in the list so we can "iterate" over it
+        return [reading]
+
+    # Get all possible readings by extracting the second element from each result of get_versions_of_word
+    # Filter out None values and remove duplicates
+    possible_readings = dict.fromkeys(
+        filter(
+            None,
+            [version[1] for version in get_versions_of_word(reading, reading, word_to_readings_map, extended=True)]
+        )
+    )
+    # Readings that aren't in any dictionary can be skipped without looking
+    if isinstance(word_to_readings_map, LookupIndexes):
+        possible_readings = [
+            possible_reading for possible_reading in possible_readings
+            if word_to_readings_map.has_reading(possible_reading)
+        ]
+    # Sorted based on the length of each reading, in descending order
+    return sorted(possible_readings, key=len, reverse=True)
+
+
+def reading_may_exist(reading, word_to_readings_map):
+    """False only if the lookup indexes say no dictionary has this reading."""
+    if isinstance(word_to_readings_map, LookupIndexes):
+        return word_to_readings_map.has_reading(reading)
+    return True
+
+
 def similarity_score(str1, str2):
     """Calculate similarity between two strings by the number of matching characters."""
     # Convert strings to sets to get unique characters in each
@@ -627,6 +713,154 @@ def similarity_score(str1, str2):
     return similarity_score
 
 
+class LookupCache:
+    """
+    Bounded, thread safe LRU cache of get_definitions results.
+
+    Counts hits, misses and evictions, see stats().
+    A maxsize of 0 turns the cache off.
+    """
+
+    def __init__(self, maxsize=DEFINITIONS_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        """Returns the cached value, or None."""
+        with self._lock:
+            value = self._entries.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            self._evict()
+
+    def resize(self, maxsize):
+        with self._lock:
+            self.maxsize = maxsize
+            self._evict()
+
+    def _evict(self):
+        while len(self._entries) > max(self.maxsize, 0):
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+
+definitions_cache = LookupCache()
+
+
+# Counts the times dictionary data was loaded, see lookup_version
+data_token = 0
+
+
+def new_data_token():
+    """
+    Marks the dictionary data as replaced, so nothing looked up in the old data is reused.
+    load_dictionary_data calls it, call it too when swapping in data loaded some other way.
+    """
+    global data_token
+    data_token += 1
+    return data_token
+
+
+def lookup_version(big_data, word_to_readings_map):
+    """
+    Identifies the data a lookup ran against, so cached results from other data aren't reused.
+    A definition store knows its own version, plain dicts are told apart by data_token.
+    """
+    return (getattr(big_data, "version", None) or data_token, data_token)
+
+
+def dictionary_data_version(big_data, link_budget=LINK_EXPANSION_BUDGET):
+    """
+    The versions of the dictionary data, the files used alongside it, RENDER_VERSION
+    and the link expansion budget.
+    """
+    return {
+        "data": getattr(big_data, "version", None) or file_version(BIG_DATA_FILE),
+        "indexes": [
+            file_version(path)
+            for path in (LOOKUP_INDEXES_FILE, "word_to_readings_map.json", SENSE_TREES_FILE)
+        ],
+        "render_version": RENDER_VERSION,
+        "link_budget": link_budget,
+    }
+
+
+def result_cache_version(big_data, dictionary_priority_order, link_budget=LINK_EXPANSION_BUDGET):
+    """
+    Everything the cached HTML depends on: the dictionary data, the priority order,
+    the link expansion budget and RENDER_VERSION.
+    """
+    return json.dumps(
+        {
+            **dictionary_data_version(big_data, link_budget),
+            "priority_order": list(dictionary_priority_order),
+        },
+        ensure_ascii=False,
+    )
+
+
+def link_graph_version(big_data, link_budget=LINK_EXPANSION_BUDGET):
+    """Everything the expansions in the link graph depend on."""
+    return json.dumps(dictionary_data_version(big_data, link_budget), ensure_ascii=False)
+
+
+def copy_definitions(word_definitions):
+    """Copies a get_definitions result deep enough that process_deck can edit it in place."""
+    return {
+        dictionary: [dict(entry, definitions=list(entry["definitions"])) for entry in entries]
+        for dictionary, entries in word_definitions.items()
+    }
+
+
+def clean_lookup_word(word):
+    """Strips the notes, brackets and alternatives a card's word may come with."""
+    return re.sub(
+        r"〈|～|\/.+|^.+・|\[[^\]]+?\]|.+,| |<[^>]+?>|。|\n|\([^\)].+?\)|【[^】]+?】|〘[^〙]+?〙|［|］|（[^）]+?）|<",
+        "",
+        word,
+    )
+
+
+def clean_lookup_reading(reading):
+    """Strips the notes, brackets and alternatives a card's reading may come with."""
+    return re.sub(
+        r"〈|～|\/.+|^.+・|.+,| |。|\n|\([^\)]+?\)|【[^】]+?】|〘[^〙]+?〙|［|］|（[^）]+?）",
+        "",
+        reading,
+    )
+
+
 def get_definitions(
     word,
     reading,
@@ -639,18 +873,81 @@ def get_definitions(
     returns an HTML string with collapsible fields.
     """
 
-    word = re.sub(
-        r"〈|～|\/.+|^.+・|\[[^\]]+?\]|.+,| |<[^>]+?>|。|\n|\([^\)].+?\)|【[^】]+?】|〘[^〙]+?〙|［|］|（[^）]+?）|<",
-        "",
+    word = clean_lookup_word(word)
+    reading = clean_lookup_reading(reading)
+
+    key = (
         word,
-    )
-    reading = re.sub(
-        r"〈|～|\/.+|^.+・|.+,| |。|\n|\([^\)]+?\)|【[^】]+?】|〘[^〙]+?〙|［|］|（[^）]+?）",
-        "",
         reading,
+        tuple(priority_order),
+        lookup_version(big_data, word_to_readings_map),
+        stop_at,
     )
+    cached = definitions_cache.get(key)
+    if cached is not None:
+        return copy_definitions(cached)
+
+    return_data = find_definitions(
+        word, reading, priority_order, big_data, word_to_readings_map, stop_at
+    )
+    definitions_cache.put(key, copy_definitions(return_data))
+    return return_data
+
+
+def get_definitions_batch(
+    pairs,
+    priority_order,
+    big_data,
+    word_to_readings_map,
+    stop_at=-1
+):
+    """
+    get_definitions for many words at once.
+
+    The words are cleaned up together, looked up once per distinct (word, reading),
+    and grouped by reading so the words sharing a reading bucket are looked up one after another.
+    A reading bucket is read and combined once per batch, however many words need it.
+
+    Args:
+    - pairs (list): [(word, reading)], e.g. one per row of a deck.
+
+    Returns:
+    - list: get_definitions' result for each pair, in the same order.
+    """
+    cleaned_pairs = [
+        (clean_lookup_word(word), clean_lookup_reading(reading)) for word, reading in pairs
+    ]
+    version = lookup_version(big_data, word_to_readings_map)
+
+    found = {}
+    # {(dictionary, reading): entries_with_reading(...)}, shared by the whole batch
+    bucket_memo = {}
+    for word, reading in sorted(set(cleaned_pairs), key=lambda pair: (pair[1], pair[0])):
+        key = (word, reading, tuple(priority_order), version, stop_at)
+        word_definitions = definitions_cache.get(key)
+        if word_definitions is None:
+            word_definitions = find_definitions(
+                word, reading, priority_order, big_data, word_to_readings_map, stop_at,
+                bucket_memo=bucket_memo,
+            )
+            definitions_cache.put(key, copy_definitions(word_definitions))
+        found[(word, reading)] = word_definitions
+
+    return [copy_definitions(found[pair]) for pair in cleaned_pairs]
+
+
+def find_definitions(
+    word, reading, priority_order, big_data, word_to_readings_map, stop_at=-1, bucket_memo=None
+):
+    """
+    The search behind get_definitions, for a word and reading that were already cleaned up.
 
+    Args:
+    - bucket_memo (dict): Reuses the combined entries of reading buckets other words already
+      needed, see get_definitions_batch. None to always read them.
+    """
     unique_versions = get_versions_of_word(word, reading, word_to_readings_map)
+    data_version = lookup_version(big_data, word_to_readings_map)[0]
 
     return_data = {}
     found = False
@@ -677,7 +974,8 @@ def get_definitions(
                     continue
 
                 if (
-                    version_reading in big_data[dictionary]
+                    reading_may_exist(version_reading, word_to_readings_map)
+                    and version_reading in big_data[dictionary]
                     and version in big_data[dictionary][version_reading]
                 ):
                     with_same_reading = [
@@ -692,18 +990,28 @@ def get_definitions(
                     defs_found_counter += 1
                     break
 
-                is_similar = False
-                if version_reading in big_data[dictionary]:
-                    for word_with_reading in big_data[dictionary][version_reading]:
-                        if similarity_score(version, word_with_reading) > 0.65:
-                            is_similar = True
-
-                            break
+                # Whether any word with this reading has a similarity_score above 0.65
+                is_similar = (
+                    reading_may_exist(version_reading, word_to_readings_map)
+                    and version_reading in big_data[dictionary]
+                    and similarity_index.has_similar(
+                        big_data, dictionary, version_reading, version, data_version
+                    )
+                )
 
                 if hiragana_only or is_similar:
-                    with_same_reading = entries_with_reading(
-                        version_reading, big_data, dictionary, word_to_readings_map
-                    )
+                    if bucket_memo is None:
+                        with_same_reading = entries_with_reading(
+                            version_reading, big_data, dictionary, word_to_readings_map
+                        )
+                    else:
+                        bucket_key = (dictionary, version_reading)
+                        if bucket_key not in bucket_memo:
+                            bucket_memo[bucket_key] = entries_with_reading(
+                                version_reading, big_data, dictionary, word_to_readings_map
+                            )
+                        # The entries get tagged below
+                        with_same_reading = [dict(entry) for entry in bucket_memo[bucket_key]]
                     if with_same_reading:
                         defs_found_counter += 1
 
@@ -786,18 +1094,34 @@ def fetch_entry_from_reference(reference_numbers: str, full_entry: str) -> str:
 
     if reference_numbers:
         reference_numbers_path = re.findall(r"〚(\d+)〛", reference_numbers)
+        sense_tree = sense_trees.get(definition_fingerprint(full_entry)) if sense_trees else None
+        if sense_tree is not None:
+            return get_entry_from_sense_tree(reference_numbers_path, full_entry, sense_tree)
         return get_entry(reference_numbers_path, full_entry)
 
     return full_entry
 
 
+def nested_definition_text(definition):
+    """recursive_nesting_by_category + dict_to_text, using the precomputed sense tree if there is one."""
+    sense_tree = sense_trees.get(definition_fingerprint(definition)) if sense_trees else None
+    if sense_tree is not None:
+        return sense_tree.get("", definition)
+
+    definition_dict = recursive_nesting_by_category(definition)
+    if isinstance(definition_dict, dict):
+        return dict_to_text(definition_dict)
+    return definition_dict
+
+
 def link_up(
     word,
     reading,
     definition_original,
     dictionary_path,
     big_data,
-    word_to_readings_map
+    word_to_readings_map,
+    max_length=LINK_EXPANSION_BUDGET,
 ):
     """
     Take links to other entries in the target entry
@@ -806,9 +1130,51 @@ def link_up(
     and add
     "Linked from 親's definition ...
 
+    The expansion is taken from the link graph when it has this entry's definition
+    and was built with the same budget, otherwise the links are resolved by expand_links.
+
+    Args:
+    - max_length (int): Character budget of the expanded definition, see expand_links.
+    """
+    if (
+        link_graph is not None
+        and max_length == link_graph.link_budget
+        and definition_original
+        and isinstance(dictionary_path, str)
+    ):
+        expanded = link_graph.expansion(dictionary_path, word, reading, definition_original)
+        if expanded is not None:
+            return expanded, dictionary_path
+
+    return expand_links(
+        word, reading, definition_original, dictionary_path, big_data, word_to_readings_map,
+        max_length=max_length,
+    )
+
+
+def expand_links(
+    word,
+    reading,
+    definition_original,
+    dictionary_path,
+    big_data,
+    word_to_readings_map,
+    links=None,
+    max_length=LINK_EXPANSION_BUDGET,
+):
+    """
+    Resolves the ⇒ links of a definition and adds the linked definitions to it.
+
     If there's a link number,
     e.g. ⇒親〚4〛
     We will take 親's number 4 definition using get_entry.
+
+    Args:
+    - links (list): If given, a (word, reading, sense path) is appended for every link resolved.
+    - max_length (int): Character budget of the expanded definition, measured on the text
+      tidy_linked_definition returns. Linked definitions that don't fit in what's left are skipped,
+      and once nothing can fit the remaining links aren't even resolved.
+      If the definition doesn't fit on its own, it's returned as is. None for no limit.
     """
     # Clean up formatting from the definition text
     super_original = definition_original[:]
@@ -816,6 +1182,15 @@ def link_up(
     if definition == "":
         return definition, dictionary_path
 
+    def remaining(*additions):
+        """What's left of the budget after adding these."""
+        if max_length is None:
+            return float("inf")
+        return max_length - len(tidy_linked_definition(definition_original + "".join(additions)))
+
+    if remaining() < 0:
+        return super_original, dictionary_path
+
     definition = definition.split("<br /> Linked")[0]
     definition = re.sub(rf"([{NUMBER_CHARS}])<br ?\/>", r"\1", definition)
     definition = re.sub(rf"([{NUMBER_CHARS}])\n", r"\1", definition)
@@ -851,7 +1226,14 @@ def link_up(
             # Skip unusually long matches
             if len(referenced_word) > 20:
                 return definition, dictionary_path
-            
+
+            # Not even an empty link fits anymore
+            if remaining(_SMALLEST_LINK) <= 0:
+                break
+            # This one's header doesn't fit, don't bother looking it up
+            if remaining(_SMALLEST_LINK, referenced_word) <= 0:
+                continue
+
             # Extract and clean furigana if present
             furigana = (
                 re.search(rf"\(([{HIRAGANA}]+)\)", furigana).group(1)
@@ -868,6 +1250,9 @@ def link_up(
                     for x in word_to_readings_map.get(referenced_word, [])
                 ]
 
+            elif isinstance(word_to_readings_map, LookupIndexes) and re.fullmatch(rf"[{KANA}]+", referenced_word):
+                # ⇒きずく is found as きづく, ⇒バイト as ばいと
+                readings = list(word_to_readings_map.readings_like(referenced_word))
             elif re.fullmatch(rf"[{HIRAGANA}]+", referenced_word):
                 readings = [referenced_word.replace(" ", "")]
             else:
@@ -938,6 +1323,9 @@ def link_up(
                 if referenced_word == word and used_reading == reading and used_reading:
                     continue
 
+                if links is not None:
+                    links.append((referenced_word, used_reading, reference_number_path or ""))
+
                 # Process the reference definitions and append to the main definition text
                 ref_definition = f"<br /> Linked {referenced_word}【{used_reading}】" + (reference_number_path if reference_number_path else '')
 
@@ -947,20 +1335,23 @@ def link_up(
                 for i, found_definition in enumerate(ref_definitions):
 
                     index = f"{i}. <br/>" if more_than_one else ""
+                    if remaining(ref_definition, "<br />", index) <= 0:
+                        # Not even the start of this one fits
+                        break
                     found_definition = found_definition.split("<br /> Linked")[0]
-                    definition_dict = recursive_nesting_by_category(found_definition)
-                    if isinstance(definition_dict, dict):
-                        cleaned_found_definition = dict_to_text(definition_dict)
-                    else:
-                        cleaned_found_definition = definition_dict
+                    cleaned_found_definition = nested_definition_text(found_definition)
 
                     if cleaned_found_definition in already_linked:
                         continue
 
+                    linked_text = f"<br />{index}{cleaned_found_definition}"
+                    if remaining(ref_definition, linked_text) < 0:
+                        continue
+
                     already_linked.append(cleaned_found_definition)
 
                     if cleaned_found_definition:
-                        ref_definition += f"<br />{index}{cleaned_found_definition}"
+                        ref_definition += linked_text
                         found = True
 
                 # Append linked information about the referenced definition
@@ -969,9 +1360,14 @@ def link_up(
 
 
             # ほんまによくわからんがダブっちゃうんだよな。already_linkedで縛っても。
-    # Append linked information about the referenced definition
+    # Every link was only added if it fit once tidied up, so this fits too
+    return tidy_linked_definition(definition_original), dictionary_path
+
+
+def tidy_linked_definition(definition):
+    """Joins the line breaks of a linked up definition and drops the linked parts that are repeated."""
     splits = [  
-                x for x in re.sub(r"(?:\n|<br />)+", "<br />", definition_original)
+                x for x in re.sub(r"(?:\n|<br />)+", "<br />", definition)
                              .replace("<br/>", "<br />")
                              .replace("<br>", "<br />")
                              .split("<br /> Linked")
@@ -984,166 +1380,420 @@ def link_up(
             continue
         already_seen.append(part)
 
-    definition_original = "<br />Linked".join(already_seen)
+    return "<br />Linked".join(already_seen)
 
-    if len(definition_original) > 3000:
-        return super_original, dictionary_path
-
-    return definition_original, dictionary_path
-
-def process_deck(
-    deck,
-    vocab_field_name,
-    reading_field_name,
-    definitions_field_name,
+def build_word_definition_html(
+    cleaned_word,
+    cleaned_reading,
     dictionary_priority_order,
     big_data,
     word_to_readings_map,
+    word_definitions=None,
+    link_budget=LINK_EXPANSION_BUDGET,
 ):
     """
-    Processes an ANKI deck by adding monolingual definitions (XLSX version).
+    Looks up a card's word, links up its definitions and renders them.
 
     Args:
-    - deck_file (str): The file name of the ANKI deck (XLSX format).
-    - vocab_field_name (str): Column name for words.
-    - definitions_field_name (str): Column name for definitions.
-    """
-    # deck = pd.read_excel(deck_file, index_col=None)
-    deck_size = len(deck)
-    progress_interval = deck_size // 10  # 10% progress intervals
-    words = deck[vocab_field_name].unique()
-    rows_to_drop = []
-    for i, word in enumerate(words):
-        # Identify duplicate rows and mark them for removal
-        if (deck[vocab_field_name] == word).sum() > 1:
-            indices = deck[deck[vocab_field_name] == word].index[1:]
-            rows_to_drop.extend(indices)
-        if word == vocab_field_name:
-            rows_to_drop.append(i)
-
-        # # Drop the marked rows from the sorted deck
-    deck_cleaned = deck.drop(rows_to_drop)
-    cleaned_definitions = []
+    - word_definitions (dict): The word's get_definitions result, if it was already looked up
+      (e.g. by get_definitions_batch). It's edited in place.
+    - link_budget (int): Character budget of each linked up definition, see expand_links.
 
-    # Iterate through the cleaned deck for processing
-    for i, row in deck_cleaned.iterrows():  # Change to deck_cleaned
-        cleaned_word = re.sub(
-            r"\[.+?\]", "", str(row[vocab_field_name])
+    Returns:
+    - str: The definition HTML, or None if nothing was found.
+    """
+    if word_definitions is None:
+        word_definitions = get_definitions(
+            cleaned_word,
+            cleaned_reading,
+            dictionary_priority_order,
+            big_data,
+            word_to_readings_map,
+            stop_at=-1
         )
-        cleaned_word = str(row[vocab_field_name]).split("/")[0].split("・")[0]
-
-        cleaned_reading = re.sub(r"\[(.+?),.+?\]", r"\1", str(row[reading_field_name]) if str(row[reading_field_name]) else "")
-        cleaned_reading = re.sub(r"\[.+?<br>([^<]+?)(?:<br>.+?)?\]", r"[\1]", cleaned_reading)
 
-        cleaned_reading = re.sub(
-            r"(?:\(|（|＜|<)[^\)）＞>]+?(?:\)|）|＞|>)", "", cleaned_reading
-        ).strip(">").strip("<")
+    already_seen = []
+    similarity_debuf = {}
+    for dictionary, dict_items in word_definitions.items():
+        for j, information in enumerate(dict_items):
+            word = information["word"].split("(")[0].strip()  # 可哀想 (可哀相)
+            reading = information["reading"]  #   ↑ only this
+            definitions = list(set(information["definitions"]))
 
-        cleaned_reading = get_hiragana_only(cleaned_reading)
+            if definitions in already_seen:
+                word_definitions[dictionary][j] = {}
+                continue
+            else:
+                already_seen.append(definitions)
 
-        if not cleaned_word or cleaned_word == 'nan':
-            cleaned_word = cleaned_reading
+            # Definition is simply a link + limit to 3
+            # definitions = [defi for defi in definitions if not re.fullmatch(rf"⇒[a-zA-Z{KANJI}{KANA}]+(?: ?\(.+?\) ?)?(?:{SUFFIX}|$)", defi)][:3]
+            definitions = definitions[:3]
             
-        monolingual_definition = row[definitions_field_name]
+            for k, definition in enumerate(definitions):
+                try:
+                    if "⇒" in definition:
+                        definition, _ = link_up(
+                            word,
+                            reading,
+                            definition,
+                            dictionary,
+                            big_data,
+                            word_to_readings_map,
+                            max_length=link_budget,
+                        )
 
+                        word_definitions[dictionary][j]["definitions"][k] = (
+                            definition  # Update definition in place
+                        )
+                except Exception as e:
+                    print(f"Couldn't link {word}【{reading}】")
+                    print("oh no", definition, word, reading, "is die.", dictionary)
+                    raise e
 
-        if not isinstance(monolingual_definition, str):
-            monolingual_definition = ""
 
-        word_definitions = get_definitions(
+    for dictionary in word_definitions:
+        word_definitions[dictionary] = [
+            entry for entry in word_definitions[dictionary] if entry
+        ]
+
+        if not word_definitions[dictionary]:
+            similarity_debuf[dictionary] = 0
+            continue
+
+        # All have at least 1
+        reading = word_definitions[dictionary][0]["reading"]
+        word = word_definitions[dictionary][0]["word"]
+
+        similarity_debuf[dictionary] = exp(1 - similarity_score(reading, cleaned_reading))
+        similarity_debuf[dictionary] += exp(1 - similarity_score(word, cleaned_word))
+
+
+    def get_total_length(entry):
+        length = 0
+        for word in entry:
+            # print(word)
+            length += len("".join(word["definitions"]))
+        return length
+
+    def get_index(dictionary):
+        if dictionary not in dictionary_priority_order:
+            return 0
+        return dictionary_priority_order.index(dictionary)
+
+    def get_new_index(item):
+
+        definitions = item[1]
+        dictionary_name = item[0]
+
+        length_debuf = get_total_length(definitions)//100
+        priority_index = get_index(dictionary_name) 
+        priority_debuf = len(dictionary_priority_order) if any([d["tag"] for d in definitions]) else 0
+        return length_debuf+priority_index+priority_debuf+similarity_debuf[dictionary_name]
+
+
+
+    word_definitions = dict(sorted(word_definitions.items(), 
+            key=lambda item: get_new_index(item)))
+
+    definition_html = build_definition_html(word_definitions)
+
+    return definition_html
+
+
+def _column_as_text(column):
+    """str() of every value of a column. Missing values (None too) become "nan"."""
+    return column.astype(object).where(column.notna(), "nan").map(str).astype(object)
+
+
+def preprocess_deck(deck, vocab_field_name, reading_field_name, seen_words=None):
+    """
+    Drops the duplicate and header rows of a deck and cleans up every word and reading,
+    a whole column at a time.
+
+    Args:
+    - deck (DataFrame): The deck.
+    - vocab_field_name (str): Column name for words.
+    - reading_field_name (str): Column name for readings.
+    - seen_words (set): The words of the rows kept so far, when a deck is converted in chunks.
+      Rows with one of these words are dropped too, and the words kept are added to it.
+
+    Returns:
+    - tuple: (deck without the dropped rows, [(cleaned word, cleaned reading)] for each of its rows)
+    """
+    vocab = deck[vocab_field_name]
+    # Only the first row of each word is kept. Empty words are all kept.
+    duplicates = vocab.duplicated() & vocab.notna()
+    if seen_words is not None:
+        vocab_text = _column_as_text(vocab)
+        duplicates |= vocab_text.isin(seen_words) & vocab.notna()
+    # The header row, when the deck was exported with one
+    header_rows = vocab == vocab_field_name
+    kept = ~(duplicates | header_rows)
+    deck_cleaned = deck[kept].copy()
+    if seen_words is not None:
+        seen_words.update(vocab_text[kept & vocab.notna()])
+
+    cleaned_words = (
+        _column_as_text(deck_cleaned[vocab_field_name]).str.split("/").str[0].str.split("・").str[0]
+    )
+
+    cleaned_readings = (
+        _column_as_text(deck_cleaned[reading_field_name])
+        .str.replace(r"\[(.+?),.+?\]", r"\1", regex=True)
+        .str.replace(r"\[.+?<br>([^<]+?)(?:<br>.+?)?\]", r"[\1]", regex=True)
+        .str.replace(r"(?:\(|（|＜|<)[^\)）＞>]+?(?:\)|）|＞|>)", "", regex=True)
+        .str.strip(">")
+        .str.strip("<")
+    )
+    cleaned_readings = hiragana_only_column(cleaned_readings)
+
+    no_word = (cleaned_words == "") | (cleaned_words == "nan")
+    cleaned_words = cleaned_words.where(~no_word, cleaned_readings)
+
+    return deck_cleaned, list(zip(cleaned_words, cleaned_readings))
+
+
+def iter_converted_words(
+    pairs, dictionary_priority_order, big_data, word_to_readings_map, link_budget=LINK_EXPANSION_BUDGET
+):
+    """
+    Looks up a list of cleaned up (word, reading) pairs, then renders them one at a time.
+
+    Returns:
+    - generator: The definition HTML of each pair (None if nothing was found), in the same order.
+    """
+    pairs_definitions = get_definitions_batch(
+        pairs, dictionary_priority_order, big_data, word_to_readings_map, stop_at=-1
+    )
+    for (cleaned_word, cleaned_reading), word_definitions in zip(pairs, pairs_definitions):
+        yield build_word_definition_html(
             cleaned_word,
             cleaned_reading,
             dictionary_priority_order,
             big_data,
             word_to_readings_map,
-            stop_at=-1
+            word_definitions=word_definitions,
+            link_budget=link_budget,
         )
 
-        already_seen = []
-        similarity_debuf = {}
-        for dictionary, dict_items in word_definitions.items():
-            for j, information in enumerate(dict_items):
-                word = information["word"].split("(")[0].strip()  # 可哀想 (可哀相)
-                reading = information["reading"]  #   ↑ only this
-                definitions = list(set(information["definitions"]))
 
-                if definitions in already_seen:
-                    word_definitions[dictionary][j] = {}
-                    continue
-                else:
-                    already_seen.append(definitions)
+def convert_words(
+    pairs, dictionary_priority_order, big_data, word_to_readings_map, link_budget=LINK_EXPANSION_BUDGET
+):
+    """
+    Looks up and renders a list of cleaned up (word, reading) pairs.
 
-                # Definition is simply a link + limit to 3
-                # definitions = [defi for defi in definitions if not re.fullmatch(rf"⇒[a-zA-Z{KANJI}{KANA}]+(?: ?\(.+?\) ?)?(?:{SUFFIX}|$)", defi)][:3]
-                definitions = definitions[:3]
-                
-                for k, definition in enumerate(definitions):
-                    try:
-                        if "⇒" in definition:
-                            definition, _ = link_up(
-                                word,
-                                reading,
-                                definition,
-                                dictionary,
-                                big_data_dictionary,
-                                word_to_readings_map,
-                            )
+    Returns:
+    - list: The definition HTML of each pair (None if nothing was found), in the same order.
+    """
+    return list(
+        iter_converted_words(
+            pairs, dictionary_priority_order, big_data, word_to_readings_map, link_budget
+        )
+    )
 
-                            word_definitions[dictionary][j]["definitions"][k] = (
-                                definition  # Update definition in place
-                            )
-                    except Exception as e:
-                        print(f"Couldn't link {word}【{reading}】")
-                        print("oh no", definition, word, reading, "is die.", dictionary)
-                        raise e
 
+# What the conversion workers look words up in, see start_conversion_workers
+_worker_context = None
 
-        for dictionary in word_definitions:
-            word_definitions[dictionary] = [
-                entry for entry in word_definitions[dictionary] if entry
-            ]
 
-            if not word_definitions[dictionary]:
-                similarity_debuf[dictionary] = 0
-                continue
+def _init_conversion_worker(context):
+    global _worker_context, sense_trees, link_graph
+    _worker_context = context
+    sense_trees = context["sense_trees"]
+    link_graph = context["link_graph"]
 
-            # All have at least 1
-            reading = word_definitions[dictionary][0]["reading"]
-            word = word_definitions[dictionary][0]["word"]
 
-            similarity_debuf[dictionary] = exp(1 - similarity_score(reading, cleaned_reading))
-            similarity_debuf[dictionary] += exp(1 - similarity_score(word, cleaned_word))
+def _convert_words_in_worker(pairs):
+    return convert_words(
+        pairs,
+        _worker_context["dictionary_priority_order"],
+        _worker_context["big_data"],
+        _worker_context["word_to_readings_map"],
+        _worker_context["link_budget"],
+    )
 
 
-        def get_total_length(entry):
-            length = 0
-            for word in entry:
-                # print(word)
-                length += len("".join(word["definitions"]))
-            return length
+def start_conversion_workers(
+    stack,
+    jobs,
+    dictionary_priority_order,
+    big_data,
+    word_to_readings_map,
+    link_budget=LINK_EXPANSION_BUDGET,
+):
+    """
+    Starts a pool of processes for convert_words, or returns None to convert in this process.
 
-        def get_index(dictionary):
-            if dictionary not in dictionary_priority_order:
-                return 0
-            return dictionary_priority_order.index(dictionary)
+    Where processes can be forked, the workers share the loaded dictionary data with this process
+    copy-on-write, so nothing is loaded twice. Elsewhere they're spawned, which only works
+    with the definition store: each worker opens the file itself instead of getting a copy of big_data.
 
-        def get_new_index(item):
+    Args:
+    - stack (ExitStack): Shuts the pool down when it's closed.
+    - jobs (int): Number of worker processes. 1 or less converts in this process.
+    - link_budget (int): Character budget of linked up definitions, see expand_links.
+    """
+    if jobs <= 1:
+        return None
 
-            definitions = item[1]
-            dictionary_name = item[0]
+    if "fork" in multiprocessing.get_all_start_methods():
+        mp_context = multiprocessing.get_context("fork")
+    elif isinstance(big_data, DefinitionStore):
+        mp_context = multiprocessing.get_context("spawn")
+    else:
+        print(
+            f"Can't share big_data with worker processes here, converting in one process."
+            f" Build {DEFINITION_STORE_FILE} to convert in parallel."
+        )
+        return None
 
-            length_debuf = get_total_length(definitions)//100
-            priority_index = get_index(dictionary_name) 
-            priority_debuf = len(dictionary_priority_order) if any([d["tag"] for d in definitions]) else 0
-            return length_debuf+priority_index+priority_debuf+similarity_debuf[dictionary_name]
+    print(f"Converting with {jobs} workers")
+    context = {
+        "dictionary_priority_order": list(dictionary_priority_order),
+        "big_data": big_data,
+        "word_to_readings_map": word_to_readings_map,
+        "sense_trees": sense_trees,
+        "link_graph": link_graph,
+        "link_budget": link_budget,
+    }
+    return stack.enter_context(
+        ProcessPoolExecutor(
+            max_workers=jobs,
+            mp_context=mp_context,
+            initializer=_init_conversion_worker,
+            initargs=(context,),
+        )
+    )
 
 
+def process_deck(
+    deck,
+    vocab_field_name,
+    reading_field_name,
+    definitions_field_name,
+    dictionary_priority_order,
+    big_data,
+    word_to_readings_map,
+    result_cache=None,
+    jobs=1,
+    seen_words=None,
+    checkpoint=None,
+    manifest=None,
+    executor=None,
+    link_budget=LINK_EXPANSION_BUDGET,
+):
+    """
+    Processes an ANKI deck by adding monolingual definitions (XLSX version).
+
+    Args:
+    - deck_file (str): The file name of the ANKI deck (XLSX format).
+    - vocab_field_name (str): Column name for words.
+    - definitions_field_name (str): Column name for definitions.
+    - result_cache (ResultCache): Where to reuse and store the HTML of each word. None to always look up.
+    - jobs (int): Number of processes converting the words, see start_conversion_workers.
+    - seen_words (set): Words of the deck's earlier chunks, see preprocess_deck.
+    - checkpoint (Checkpoint): Where to record each converted word as it's done,
+      and reuse the words a previous, interrupted run already converted. None to not checkpoint.
+    - manifest (DeckManifest): The HTML of the deck's notes from the last conversion.
+      Notes whose fields haven't changed reuse it, new and edited notes are put in it.
+      None to convert every note.
+    - executor (ProcessPoolExecutor): Conversion workers to use instead of starting new ones,
+      see start_conversion_workers. They keep the link_budget they were started with.
+    - link_budget (int): Character budget of linked up definitions, see expand_links. None for no limit.
+    """
+    # deck = pd.read_excel(deck_file, index_col=None)
+    deck_cleaned, cleaned_words = preprocess_deck(
+        deck, vocab_field_name, reading_field_name, seen_words
+    )
+    # The notes that haven't changed since the last conversion aren't looked up again
+    note_keys = None
+    reused_htmls = {}
+    words_to_convert = cleaned_words
+    if manifest is not None:
+        note_keys = [
+            note_key(vocab, reading, definition)
+            for vocab, reading, definition in zip(
+                _column_as_text(deck_cleaned[vocab_field_name]),
+                _column_as_text(deck_cleaned[reading_field_name]),
+                _column_as_text(deck_cleaned[definitions_field_name]),
+            )
+        ]
+        for key in dict.fromkeys(note_keys):
+            definition_html = manifest.get(key)
+            if definition_html is not None:
+                reused_htmls[key] = definition_html
+        words_to_convert = [
+            pair for pair, key in zip(cleaned_words, note_keys) if key not in reused_htmls
+        ]
+
+    # {(word, reading): definition HTML} of the words already converted once
+    definition_htmls = {}
+    if checkpoint is not None:
+        for cleaned_word, cleaned_reading in words_to_convert:
+            definition_html = checkpoint.get(cleaned_word, cleaned_reading)
+            if definition_html is not None:
+                definition_htmls[(cleaned_word, cleaned_reading)] = definition_html
+    if result_cache:
+        for cleaned_word, cleaned_reading in words_to_convert:
+            if (cleaned_word, cleaned_reading) in definition_htmls:
+                continue
+            definition_html = result_cache.get(cleaned_word, cleaned_reading)
+            if definition_html is not None:
+                definition_htmls[(cleaned_word, cleaned_reading)] = definition_html
+
+    # Everything else is looked up LOOKUP_BATCH_SIZE words at a time
+    to_look_up = list(
+        dict.fromkeys(pair for pair in words_to_convert if pair not in definition_htmls)
+    )
+    # With several workers, smaller chunks keep all of them busy until the end
+    chunk_size = max(min(LOOKUP_BATCH_SIZE, -(-len(to_look_up) // (jobs * 4))), 1)
+    chunks = [to_look_up[start : start + chunk_size] for start in range(0, len(to_look_up), chunk_size)]
+    progress_interval = max(len(to_look_up) // 10, 1)  # 10% progress intervals
+    done = 0
+
+    with contextlib.ExitStack() as stack:
+        if executor is None:
+            executor = start_conversion_workers(
+                stack, jobs if len(chunks) > 1 else 1,
+                dictionary_priority_order, big_data, word_to_readings_map, link_budget,
+            )
+        if executor is not None:
+            # map() yields the results in submission order
+            converted = executor.map(_convert_words_in_worker, chunks)
+        else:
+            # One word at a time, so each is checkpointed as soon as it's rendered
+            converted = (
+                iter_converted_words(
+                    chunk, dictionary_priority_order, big_data, word_to_readings_map, link_budget
+                )
+                for chunk in chunks
+            )
+
+        for chunk, chunk_htmls in zip(chunks, converted):
+            for (cleaned_word, cleaned_reading), definition_html in zip(chunk, chunk_htmls):
+                definition_htmls[(cleaned_word, cleaned_reading)] = definition_html
+                if result_cache:
+                    result_cache.put(cleaned_word, cleaned_reading, definition_html)
+                if checkpoint is not None:
+                    checkpoint.put(cleaned_word, cleaned_reading, definition_html)
 
-        original = word_definitions.copy()
-        word_definitions = dict(sorted(word_definitions.items(), 
-                key=lambda item: get_new_index(item)))
+                # Show progress every 10% of the words looked up
+                done += 1
+                if done % progress_interval == 0:
+                    print(f"Progress: {done / len(to_look_up):.0%}")
 
-        definition_html = build_definition_html(word_definitions)
+    cleaned_definitions = []
+    for i, (cleaned_word, cleaned_reading) in enumerate(cleaned_words):
+        if note_keys is not None and note_keys[i] in reused_htmls:
+            definition_html = reused_htmls[note_keys[i]]
+        else:
+            definition_html = definition_htmls[(cleaned_word, cleaned_reading)]
+            if manifest is not None:
+                # Only new and edited notes are written, once per key
+                manifest.put(note_keys[i], definition_html)
+                reused_htmls[note_keys[i]] = definition_html
 
         if definition_html:
             cleaned_definitions.append(
@@ -1154,11 +1804,6 @@ def process_deck(
             print("Didn't find", cleaned_word)
             # print(cleaned_word)
             cleaned_definitions.append(None)
-        # Show progress every 10%
-        if i > 0 and i % progress_interval == 0:
-            print(
-                f"Progress: {i / len(deck_cleaned):.0%}"
-            )  # Changed to len(deck_cleaned)
 
     # Update the definitions field in the DataFrame
     # only update where not None
@@ -1182,6 +1827,12 @@ def process_deck(
         )
     ]
 
+    stats = definitions_cache.stats()
+    print(
+        f"Lookup cache: {stats['hits']} hits, {stats['misses']} misses, "
+        f"{stats['evictions']} evictions ({stats['hit_rate']:.0%} hit rate)"
+    )
+
     return deck_cleaned
 
 
@@ -1193,6 +1844,38 @@ def load_word_to_readings_map():
     return load_word_to_readings_map
 
 
+def load_dictionary_data(link_budget=LINK_EXPANSION_BUDGET):
+    """
+    Opens the SQLite definition store if there is one,
+    otherwise loads big_data.json and word_to_readings_map.json.
+    With big_data.json, the lookup indexes take the place of word_to_readings_map when they've been built.
+    The store reads readings from disk as they're needed instead, so it doesn't load them.
+
+    The precomputed similarity index and link graph are used too if they're up to date,
+    the link graph only if it was built with this link_budget.
+
+    Returns:
+    - tuple: (big_data, word_to_readings_map, sense_trees)
+    """
+    global similarity_index, link_graph
+    new_data_token()
+    similarity_index = load_similarity_index(file_version(BIG_DATA_FILE))
+
+    if os.path.exists(DEFINITION_STORE_FILE):
+        store = DefinitionStore(DEFINITION_STORE_FILE)
+        print(f"Opened {DEFINITION_STORE_FILE}. Dictionaries:")
+        print("\n".join(f"{index}:\t{dictionary}" for index, dictionary in enumerate(store)))
+        link_graph = load_link_graph(link_graph_version(store, link_budget))
+        return store, store.word_to_readings_map, store.sense_trees
+
+    big_data = load_big_data(big_data_dictionary={}, override=False)
+    indexes = load_lookup_indexes()
+    if indexes is None:
+        indexes = load_word_to_readings_map()
+    link_graph = load_link_graph(link_graph_version(big_data, link_budget))
+    return big_data, indexes, load_sense_trees()
+
+
 def get_definitions_for_one_word(word, reading):
 
     word_definitions = get_definitions(
@@ -1293,13 +1976,44 @@ def get_definitions_for_one_word(word, reading):
     # print(json.dumps(word_definitions, indent=2, ensure_ascii=False))
 
 
-def change_to_monolingual(deck_name, big_data, word_to_readings_map, field_settings):
+def change_to_monolingual(
+    deck_name,
+    big_data,
+    word_to_readings_map,
+    field_settings,
+    jobs=1,
+    chunk_size=None,
+    resume=False,
+    full=False,
+    executor=None,
+    link_budget=LINK_EXPANSION_BUDGET,
+    result_cache=None,
+):
     """
     Converts an ANKI deck from bilingual to monolingual using dictionary files.
 
     Args:
     - deck_name (str): The name of the ANKI deck (without extension).
+    - jobs (int): Number of processes converting the words.
+    - chunk_size (int): Read, convert and write the deck this many rows at a time,
+      so memory doesn't grow with the deck and the output fills up as it goes.
+      None to convert the whole deck at once.
+    - resume (bool): Reuse the words a previous run converted before it stopped,
+      from the checkpoint next to the output. Otherwise the checkpoint starts over.
+      Converted words are only checkpointed with resume or chunk_size.
+    - full (bool): Convert every note, instead of reusing the HTML of the notes
+      that haven't changed since the last conversion (see DeckManifest).
+    - executor (ProcessPoolExecutor): Conversion workers shared with other decks, see process_deck.
+      None to start jobs workers for this deck, shared by all of its chunks.
+    - link_budget (int): Character budget of linked up definitions, see expand_links. None for no limit.
+    - result_cache (ResultCache): The result cache shared with other decks, opened with this
+      deck's result_cache_version. None to open RESULT_CACHE_FILE for this deck.
+
+    Returns:
+    - dict: Summary of the conversion: output file, rows written, notes reused from the manifest
+      and seconds taken.
     """
+    start_time = time.perf_counter()
 
     vocab_field_name=       field_settings["vocab"]                 # VocabKanji
     reading_field_name=     field_settings["reading"]  #    "Reading",    # VocabFurigana
@@ -1308,41 +2022,306 @@ def change_to_monolingual(deck_name, big_data, word_to_readings_map, field_setti
     print(f"Converting {deck_name}...")
     # # Read the .txt file, automatically using the first row as header
 
-    df = pd.read_csv(
-        f"{deck_name}", sep=",", header=0
-    )  # Change 'sep' if needed based on your file
+    if chunk_size:
+        chunks = pd.read_csv(
+            f"{deck_name}", sep=",", header=0, chunksize=chunk_size
+        )
+        # Duplicates can be in different chunks
+        seen_words = set()
+    else:
+        chunks = [pd.read_csv(
+            f"{deck_name}", sep=",", header=0
+        )]  # Change 'sep' if needed based on your file
+        seen_words = None
 
     # df.to_excel(f"{deck_name}.xlsx", index=False)
     # Word  Reading Pitch   Meaning tags
 
-    df = process_deck(
-        deck=df,
-        vocab_field_name=vocab_field_name,  # VocabKanji
-        reading_field_name=reading_field_name,  # VocabFurigana
-        definitions_field_name=definitions_field_name,  # VocabDef
-        dictionary_priority_order=PRIORITY_ORDER,
-        big_data=big_data,
-        word_to_readings_map=word_to_readings_map,
+    # Next to the deck, also when it's in another folder
+    output_file = os.path.join(
+        os.path.dirname(deck_name), f"[FIXED] {os.path.basename(deck_name)}.csv"
     )
+    rows = 0
+    version = result_cache_version(big_data, PRIORITY_ORDER, link_budget)
+    with contextlib.ExitStack() as stack:
+        manifest = stack.enter_context(
+            DeckManifest(f"{output_file}.manifest.sqlite3", version, reuse=not full)
+        )
+        owns_result_cache = result_cache is None
+        if owns_result_cache:
+            result_cache = stack.enter_context(ResultCache(RESULT_CACHE_FILE, version))
+        checkpoint = None
+        if resume or chunk_size:
+            checkpoint = stack.enter_context(
+                Checkpoint(f"{output_file}.checkpoint.sqlite3", version, resume=resume)
+            )
+        if executor is None:
+            executor = start_conversion_workers(
+                stack, jobs, PRIORITY_ORDER, big_data, word_to_readings_map, link_budget
+            )
+
+        for i, df in enumerate(chunks):
+            df = process_deck(
+                deck=df,
+                vocab_field_name=vocab_field_name,  # VocabKanji
+                reading_field_name=reading_field_name,  # VocabFurigana
+                definitions_field_name=definitions_field_name,  # VocabDef
+                dictionary_priority_order=PRIORITY_ORDER,
+                big_data=big_data,
+                word_to_readings_map=word_to_readings_map,
+                result_cache=result_cache,
+                jobs=jobs,
+                seen_words=seen_words,
+                checkpoint=checkpoint,
+                manifest=manifest,
+                executor=executor,
+                link_budget=link_budget,
+            )
+
+            # Convert to CSV, the first chunk starts the file
+            df.to_csv(output_file, index=False, sep="\t", mode="w" if i == 0 else "a", header=i == 0)
+            rows += len(df)
+            if chunk_size:
+                print(f"Wrote {len(df)} rows of chunk {i + 1} to {output_file}")
+
+        if owns_result_cache:
+            print(f"Result cache: {result_cache.hits} reused, {result_cache.misses} looked up")
+        print(
+            f"Manifest: {manifest.reused} notes unchanged, {manifest.converted} new or edited"
+        )
+        # Everything made it into the output
+        manifest.save()
+        if checkpoint is not None:
+            checkpoint.discard()
 
-    # Convert to CSV and cleanup
-    # output_file = f"[FIXED] {deck_name}.xlsx"
-    # final_xlsx_file = pd.read_excel(output_file, index_col=None)
-    df.to_csv(f"[FIXED] {deck_name}.csv", index=False, sep="\t")
     # os.remove(f"{deck_name}.xlsx")
     # os.remove(output_file)    
     # Add script for toggle functions
 
     print(f"Conversion complete for {deck_name}!\n\n")
+    return {
+        "output": output_file,
+        "rows": rows,
+        "unchanged": manifest.reused,
+        "converted": manifest.converted,
+        "seconds": time.perf_counter() - start_time,
+    }
+
+
+def find_decks(path):
+    """
+    The decks to convert in batch mode.
+
+    Args:
+    - path (str): A folder (every .txt and .csv file in it) or a glob pattern.
+
+    Returns:
+    - list: The deck files, sorted, without the [FIXED] files conversions write.
+    """
+    if os.path.isdir(path):
+        paths = glob.glob(os.path.join(path, "*.txt")) + glob.glob(os.path.join(path, "*.csv"))
+    else:
+        paths = glob.glob(path)
+    return sorted(
+        deck for deck in paths
+        if os.path.isfile(deck) and not os.path.basename(deck).startswith("[FIXED]")
+    )
+
+
+def load_field_settings(path):
+    """
+    Reads the field mapping of batch mode from a JSON file:
+        {"vocab": "Word", "reading": "Reading", "definition": "Meaning",
+         "decks": {"Other deck.txt": {"vocab": "Expression"}}}
+    The fields under "decks" override the default ones for that deck (by file name).
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def field_settings_for(config, deck_path):
+    """The field settings of one deck, see load_field_settings."""
+    settings = {field: config[field] for field in ("vocab", "reading", "definition") if field in config}
+    settings.update(config.get("decks", {}).get(os.path.basename(deck_path), {}))
+    return settings
+
+
+def convert_deck_batch(
+    deck_paths,
+    big_data,
+    word_to_readings_map,
+    config,
+    deck_jobs=2,
+    jobs=1,
+    chunk_size=None,
+    resume=False,
+    full=False,
+    link_budget=LINK_EXPANSION_BUDGET,
+):
+    """
+    Converts several decks with the dictionary data loaded once.
+
+    The decks are converted deck_jobs at a time in threads, so they share the lookup cache,
+    the result cache, the similarity index and the open store,
+    and the words of all of them go to one pool of jobs workers.
+    A deck that fails doesn't stop the others, its checkpoint stays for --resume.
+
+    Args:
+    - deck_paths (list): The deck files, see find_decks.
+    - config (dict): The field mapping, see load_field_settings.
+    - deck_jobs (int): Number of decks converted at the same time.
+    - jobs, chunk_size, resume, full, link_budget: See change_to_monolingual, for every deck.
+
+    Returns:
+    - dict: {deck path: summary (see change_to_monolingual), or {"error": message} if it failed}
+    """
+
+    def convert(deck_path):
+        try:
+            return change_to_monolingual(
+                deck_path,
+                big_data,
+                word_to_readings_map,
+                field_settings_for(config, deck_path),
+                jobs=jobs,
+                chunk_size=chunk_size,
+                resume=resume,
+                full=full,
+                executor=executor,
+                link_budget=link_budget,
+                result_cache=result_cache,
+            )
+        except Exception as e:
+            print(f"Couldn't convert {deck_path}: {e!r}")
+            return {"error": repr(e)}
+
+    with contextlib.ExitStack() as stack:
+        # One connection for every deck, a connection per deck would lock the others out of the file
+        result_cache = stack.enter_context(
+            ResultCache(RESULT_CACHE_FILE, result_cache_version(big_data, PRIORITY_ORDER, link_budget))
+        )
+        executor = start_conversion_workers(
+            stack, jobs, PRIORITY_ORDER, big_data, word_to_readings_map, link_budget
+        )
+        if executor is not None:
+            # Forked before the deck threads start, a fork would copy the locks they hold
+            executor.submit(int).result()
+
+        with ThreadPoolExecutor(max_workers=max(deck_jobs, 1)) as deck_executor:
+            summaries = dict(zip(deck_paths, deck_executor.map(convert, deck_paths)))
+
+    print(f"Result cache: {result_cache.hits} reused, {result_cache.misses} looked up")
+    print(f"{'Deck':<40} {'Rows':>7} {'Unchanged':>10} {'Converted':>10} {'Time':>8}")
+    for deck_path, summary in summaries.items():
+        name = os.path.basename(deck_path)
+        if "error" in summary:
+            print(f"{name:<40} failed: {summary['error']}")
+            continue
+        print(
+            f"{name:<40} {summary['rows']:>7} {summary['unchanged']:>10} {summary['converted']:>10} "
+            f"{summary['seconds']:>7.1f}s"
+        )
+    return summaries
 
 
 if __name__ == "__main__":
-    big_data_dictionary = load_big_data(
-        big_data_dictionary=big_data_dictionary, override=False
+    parser = argparse.ArgumentParser(
+        description="Add monolingual definitions to decks, or look up single words without arguments."
+    )
+    parser.add_argument("deck", nargs="?", help="The deck, exported as CSV")
+    parser.add_argument("--vocab", help="Vocab field name")
+    parser.add_argument("--reading", help="Reading field name")
+    parser.add_argument("--definition", help="Meaning field name (will be overridden)")
+    parser.add_argument(
+        "-j", "--jobs", type=int, default=1,
+        help="Number of processes converting the words (0 = one per CPU core)",
+    )
+    parser.add_argument(
+        "--chunk-size", type=int, default=None,
+        help="Convert and write the deck this many rows at a time",
+    )
+    parser.add_argument(
+        "--resume", action="store_true",
+        help="Continue an interrupted conversion of the deck from its checkpoint",
+    )
+    parser.add_argument(
+        "--full", action="store_true",
+        help="Convert every note, instead of only the ones changed since the last conversion",
     )
+    parser.add_argument(
+        "--link-budget", type=int, default=LINK_EXPANSION_BUDGET,
+        help="How long a definition can get with the definitions it links to (0 = no limit)",
+    )
+    parser.add_argument(
+        "--batch", metavar="PATH",
+        help="Convert every deck in a folder (.txt and .csv) or matching a glob pattern",
+    )
+    parser.add_argument(
+        "--config",
+        help="JSON field mapping of the --batch decks (otherwise --vocab, --reading and --definition)",
+    )
+    parser.add_argument(
+        "--deck-jobs", type=int, default=2,
+        help="Number of decks --batch converts at the same time",
+    )
+    args = parser.parse_args()
+    jobs = args.jobs if args.jobs > 0 else os.cpu_count()
+    link_budget = args.link_budget if args.link_budget > 0 else None
 
-    word_to_readings_map = load_word_to_readings_map()
+    if args.batch:
+        if args.config:
+            config = load_field_settings(args.config)
+        else:
+            config = {"vocab": args.vocab, "reading": args.reading, "definition": args.definition}
+        deck_paths = find_decks(args.batch)
+        if not deck_paths:
+            parser.error(f"No decks found in {args.batch}")
+        missing = [
+            deck_path
+            for deck_path in deck_paths
+            if not all(
+                field_settings_for(config, deck_path).get(field)
+                for field in ("vocab", "reading", "definition")
+            )
+        ]
+        if missing:
+            parser.error(f"No vocab, reading or definition field for {', '.join(missing)}")
 
+    big_data_dictionary, word_to_readings_map, sense_trees = load_dictionary_data(link_budget)
+
+    if args.batch:
+        convert_deck_batch(
+            deck_paths,
+            big_data_dictionary,
+            word_to_readings_map,
+            config,
+            deck_jobs=args.deck_jobs,
+            jobs=jobs,
+            chunk_size=args.chunk_size,
+            resume=args.resume,
+            full=args.full,
+            link_budget=link_budget,
+        )
+        raise SystemExit
+
+    if args.deck:
+        field_settings = {
+            "vocab": args.vocab or input("Vocab field name > "),
+            "reading": args.reading or input("Reading field name > "),
+            "definition": args.definition or input("Meaning field name (will be overridden) > "),
+        }
+        change_to_monolingual(
+            args.deck,
+            big_data_dictionary,
+            word_to_readings_map,
+            field_settings,
+            jobs=jobs,
+            chunk_size=args.chunk_size,
+            resume=args.resume,
+            full=args.full,
+            link_budget=link_budget,
+        )
+        raise SystemExit
 
     # UNCOMMENT THIS TO GET A DEFINITION FOR A SINGLE WORD
 
@@ -1352,17 +2331,3 @@ if __name__ == "__main__":
         cleaned_word = input("Enter word (w/ kanji): ")
         cleaned_reading = input("Enter word reading (hiragana only): ")
         get_definitions_for_one_word(cleaned_word, cleaned_reading)
-    
-
-    # field_settings = {
-    #     "vocab": input("Vocab field name > "),
-    #     "reading": input("Reading field name > "),
-    #     "definition": input("Meaning field name (will be overridden) > ")
-    # }
-    # for filename in os.listdir("text_files"):
-    #     if filename.endswith(".txt"):
-    #         file_path = os.path.join("text_files", filename)
-
-    #         with open(file_path, "r", encoding="utf-8") as file:
-    #             content = file.read()
-    #             change_to_monolingual(file_path, big_data_dictionary, word_to_readings_map, field_settings)
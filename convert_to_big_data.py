@@ -4,15 +4,34 @@ the big data.json file.
 Has some usful functions and variables too
 """
 
+import argparse
+import bisect
+import contextlib
+import hashlib
 import sys
 import json
 import re
 import os
-from scraper import convert_word_to_hiragana, get_hiragana_only
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from kana import hiragana_only
+from definition_store import DEFINITION_STORE_FILE, save_to_definition_store
+from lookup_indexes import build_lookup_indexes, save_lookup_indexes
+from similarity_index import SIMILARITY_INDEX_FILE, save_similarity_index
 
 big_data_dictionary = {}
 word_to_readings_map = {}
+sense_trees = {}
 BIG_DATA_FILE = "big_data.json"
+SENSE_TREES_FILE = "sense_trees.json"
+
+# Processed term banks are cached here, so a rebuild only has to redo the ones that changed.
+BUILD_CACHE_FOLDER = "big_data_cache"
+BUILD_MANIFEST_FILE = os.path.join(BUILD_CACHE_FOLDER, "manifest.json")
+# Bump this whenever a change to the cleaning code changes what ends up in big_data,
+# otherwise the cached term banks from the previous version will be reused.
+CLEANING_VERSION = 2
 
 RED = "CC2222"
 YELLOW = "ECE0B2"
@@ -107,6 +126,9 @@ REFERENCE_NUMBER_MAP = {
 }
 
 
+_REFERENCE_NUMBER = re.compile(r"|".join(map(re.escape, REFERENCE_NUMBER_MAP.keys())))
+
+
 def convert_reference_numbers(text):
     """Convert reference numbers in text to the format (number)."""
 
@@ -119,9 +141,7 @@ def convert_reference_numbers(text):
         )  # Return the number in parentheses or the char itself
 
     # Substitute each reference character with the desired format
-    result = re.sub(
-        r"|".join(map(re.escape, REFERENCE_NUMBER_MAP.keys())), replace_match, text
-    )
+    result = _REFERENCE_NUMBER.sub(replace_match, text)
     return result
 
 
@@ -156,133 +176,252 @@ def dict_to_text(d, level=0):
     result = re.sub(r"(?:└─*)(?:\n|\n|$)", "", result)
     return result
 
+# Weblio also numbers its senses with full width digits
+WEBLIO_NUMBER_CATEGORIES_REGEX = {**NUMBER_CATEGORIES_REGEX, "１": r"[０-９]+"}
+
+SenseToken = namedtuple("SenseToken", ["category", "ordinal", "span"])
+
+
+def _compile_sense_tokenizer(categories_regex):
+    """
+    One pattern for every category, tried in NUMBER_CATEGORIES_REGEX order.
+    At any position the first category that matches wins, same as find_first_category
+    picking the earliest match and the first category on a tie.
+    """
+    pattern = "|".join(
+        f"(?P<category{index}>{regex})"
+        for index, regex in enumerate(categories_regex.values())
+    )
+    categories = {f"category{index}": category for index, category in enumerate(categories_regex)}
+    return re.compile(pattern), categories
+
+
+_SENSE_TOKENIZERS = {
+    False: _compile_sense_tokenizer(NUMBER_CATEGORIES_REGEX),
+    True: _compile_sense_tokenizer(WEBLIO_NUMBER_CATEGORIES_REGEX),
+}
+# Every character a sense marker can be made of, besides digits
+_MARKER_CHARS = frozenset(
+    "".join(chars for chars in NUMBER_CATEGORIES.values() if isinstance(chars, str)) + "()\ufe0f\u20e3"
+)
+_REMOVE_PREFIXES = re.compile(r"└─*$")
+
+
+def sense_ordinal(category, key):
+    """The number of a sense marker in its category (② -> 2), or None if it isn't one."""
+    try:
+        return NUMBER_CATEGORIES[category].index(key) + 1
+    except ValueError:
+        return None
+
+
+def tokenize_senses(text, weblio=False):
+    """
+    Lexes the sense numbering of a definition in a single pass.
+
+    Yields:
+    - SenseToken: (category, ordinal, (start, end)) for every number marker, in order.
+    """
+    tokenizer, categories = _SENSE_TOKENIZERS[weblio]
+    for match in tokenizer.finditer(text):
+        category = categories[match.lastgroup]
+        yield SenseToken(category, sense_ordinal(category, match.group()), match.span())
+
+
 def find_first_category(text, weblio=False):
     """Identify the first number category that appears in the text."""
-    first_category = None
-    earliest_index = len(text) + 1  # Beyond bounds
-    
-    # Copy and modify NUMBER_CATEGORIES_REGEX if weblio is True
-    if weblio:
-        modified_regex = {**NUMBER_CATEGORIES_REGEX, "１": r"[０-９]+"}
-    else:
-        modified_regex = NUMBER_CATEGORIES_REGEX.copy()
+    first_token = next(tokenize_senses(text, weblio=weblio), None)
+    return first_token.category if first_token else None
+
+
+def _is_marker_char(char):
+    return char in _MARKER_CHARS or char.isdecimal()
 
-    # Iterate through categories and patterns to find the first match
-    for category, pattern in modified_regex.items():
-        match_object = re.search(pattern, text)
-        if match_object:
-            start_index = match_object.span()[0]
-            if start_index < earliest_index:
-                earliest_index = start_index
-                first_category = category
-                
-    return first_category
 
+def _clean_span(text, start, end):
+    """text[start:end] with the trailing └─ and the whitespace around it removed, as a (start, end) span."""
+    segment = text[start:end]
+    cleaned = _REMOVE_PREFIXES.sub("", segment).strip()
+    if not cleaned:
+        return start, start
+    start += len(segment) - len(segment.lstrip())
+    return start, start + len(cleaned)
 
-def segment_by_category(text, category, first_category, level, weblio=False):
+
+def _category_spans(text, tokens, category):
     """
-    Segments text by the first number characters of a specified category.
-    If a key has a lower value than the previous or a jump of 2 or more,
-    it includes that key and the rest of the segment in the key's segment.
-    parameters:
-        - text: str
-        - category: str
-        - first_category: str
-        - level: int
+    The (start, end) spans the markers of a category split the text at.
 
+    Those are the tokens of that category, except for Weblio's full width numbers:
+    they're split at wherever ０-９ are, also inside (１) and １️⃣.
     """
+    if category != "１":
+        return [token.span for token in tokens if token.category == category]
 
-    # Get the pattern for the category and initialize tracking variables
-        # Copy and modify NUMBER_CATEGORIES_REGEX if weblio is True
-    if weblio:
-        modified_regex = {**NUMBER_CATEGORIES_REGEX, "１": r"[０-９]+"}
-    else:
-        modified_regex = NUMBER_CATEGORIES_REGEX.copy()
+    spans = []
+    for token in tokens:
+        if token.category not in ("１", "(1)", "KeyCapEmoji"):
+            continue
+        start, end = token.span
+        position = start
+        while position < end:
+            if "０" <= text[position] <= "９":
+                run_start = position
+                while position < end and "０" <= text[position] <= "９":
+                    position += 1
+                spans.append((run_start, position))
+            else:
+                position += 1
+    return spans
 
 
-    pattern = modified_regex[category]
+def segment_by_category(text, tokens, category, first_category, level):
+    """
+    Segments text by the number characters of a specified category.
+    If a key has a lower value than the previous or a jump of 2 or more,
+    it includes that key and the rest of the segment in the key's segment.
 
-    category_regex = re.compile(fr"({pattern})")
-    remove_prefixes = re.compile(r"└─*$")
+    Args:
+    - text (str): The text to segment.
+    - tokens (list): tokenize_senses' tokens of the text.
+    - category (str): The category to segment by, the first one in the text.
+    - first_category (str): The category the whole definition was segmented by.
+    - level (int): How deep the text is nested.
 
-    def clean_text(string):
-        return remove_prefixes.sub("", string).strip()
+    Returns:
+    - dict: {"prefix": pieces, key: pieces...}, the pieces being the (start, end) spans of the text
+      each segment is made of.
 
-    segments_dict = {"prefix": ""}
-    segments = category_regex.split(text)
+    Raises:
+    - KeyError: If the first key is out of order, the text can't be segmented.
+    """
+    # The same segments as splitting the text by the category's markers would give,
+    # (1) also gives its last (n) after every key
+    segments = []
+    is_key = []
+    position = 0
+    for start, end in _category_spans(text, tokens, category):
+        segments.append((position, start))
+        segments.append((start, end))
+        is_key += [False, True]
+        if category == "(1)":
+            segments.append((text.rindex("(", start, end), end))
+            is_key.append(True)
+        position = end
+    segments.append((position, len(text)))
+    is_key.append(False)
+
+    segments_dict = {"prefix": []}
     previous = 0  # Keep track of the last processed key's value
     previous_key = None
     i = 0
     while i < len(segments) - 1:
-        try:
-
-            if re.match(pattern, segments[i]):
-                key = segments[i]
-
-                current_number = NUMBER_CATEGORIES[category].index(key) + 1
-                # Check if the current key is valid based on previous key's value
-                is_referencing_other_level = level > 0 and first_category == category
-                if is_referencing_other_level or current_number != previous + 1:
-                    # If the current key is lower or jumps 2 or more,
-                    # we're talking about a different key in reference
-                    segments_dict[previous_key] += key + clean_text(
-                        "".join(segments[i + 1])
-                    )
-
-                else:
-                    # Otherwise, add the segment normally
-                    segments_dict[key] = clean_text(segments[i + 1])
-                    previous = current_number  # Update highest
-                    previous_key = key
+        if not is_key[i]:
+            segments_dict["prefix"].append(segments[i])
+            i += 1  # Move to the next segment if not a key pattern match
+            continue
 
-                i += 2  # Move to the next potential key-value pair
-            else:
-                segments_dict["prefix"] += segments[i]
-                i += 1  # Move to the next segment if not a key pattern match
+        key = text[slice(*segments[i])]
+        try:
+            current_number = NUMBER_CATEGORIES[category].index(key) + 1
         except ValueError:
-            segments_dict[previous_key] += key
+            segments_dict[previous_key].append(segments[i])
             if i + 1 < len(segments):
-                segments_dict[previous_key] += clean_text("".join(segments[i + 1]))
+                segments_dict[previous_key].append(_clean_span(text, *segments[i + 1]))
             i += 1  # Move to the next segment if not a key pattern match
+            continue
+
+        # Check if the current key is valid based on previous key's value
+        is_referencing_other_level = level > 0 and first_category == category
+        if is_referencing_other_level or current_number != previous + 1:
+            # If the current key is lower or jumps 2 or more,
+            # we're talking about a different key in reference
+            segments_dict[previous_key] += [segments[i], _clean_span(text, *segments[i + 1])]
+        else:
+            # Otherwise, add the segment normally
+            segments_dict[key] = [_clean_span(text, *segments[i + 1])]
+            previous = current_number  # Update highest
+            previous_key = key
+        i += 2  # Move to the next potential key-value pair
 
     return segments_dict
 
 
+def _segment_text(text, tokens, token_starts, pieces, weblio):
+    """
+    The text a segment is made of, and its tokens.
+
+    The tokens are taken from the text's own. Only if a piece cuts a token in two,
+    or two pieces put next to each other could make a new one, the segment is lexed again.
+    """
+    # Pieces that follow each other in the text are one piece
+    spans = []
+    for start, end in pieces:
+        if start == end:
+            continue
+        if spans and spans[-1][1] == start:
+            spans[-1] = (spans[-1][0], end)
+        else:
+            spans.append((start, end))
+    segment = "".join(text[start:end] for start, end in spans)
+
+    segment_tokens = []
+    offset = 0
+    for index, (start, end) in enumerate(spans):
+        first = bisect.bisect_left(token_starts, start)
+        last = bisect.bisect_left(token_starts, end)
+        if (
+            (index and _is_marker_char(text[spans[index - 1][1] - 1]) and _is_marker_char(text[start]))
+            or (first and tokens[first - 1].span[1] > start)
+            or (last > first and tokens[last - 1].span[1] > end)
+        ):
+            return segment, list(tokenize_senses(segment, weblio=weblio))
+        segment_tokens += [
+            token._replace(span=(token.span[0] - start + offset, token.span[1] - start + offset))
+            for token in tokens[first:last]
+        ]
+        offset += end - start
+    return segment, segment_tokens
+
+
 def recursive_nesting_by_category(
     text, first_category=None, next_category=None, level=0, weblio=False
 ):
-    """Recursively separates the text into nested dictionaries by number character categories."""
+    """
+    Separates the text into nested dictionaries by number character categories.
 
-    next_category = find_first_category(text, weblio=weblio)
+    The text is lexed once by tokenize_senses, every segment is split by the tokens it has of its
+    first category and then segmented the same way, one level deeper, until no numbers are left.
+    """
+    root = {}
+    stack = [(root, None, text, list(tokenize_senses(text, weblio=weblio)), level)]
+    while stack:
+        parent, slot, text, tokens, level = stack.pop()
+        if not tokens:
+            parent[slot] = text  # Base case: no number characters left
+            continue
 
-    if not next_category:
-        return text  # Base case: no number characters left
-    if not first_category:
-        first_category = next_category
+        next_category = tokens[0].category
+        if not first_category:
+            first_category = next_category
 
+        try:
+            segments_dict = segment_by_category(text, tokens, next_category, first_category, level)
+        except KeyError:
+            parent[slot] = text  # Text, no longer has any segments
+            continue
 
-    try:
-        segments_dict = segment_by_category(
-            text, first_category=first_category, category=next_category, 
-            level=level, weblio=weblio
-        )
-    except KeyError:
-        return text  # Text, no longer has any segments
-
-    for key, sub_text in segments_dict.items():
-        # if not isinstance(sub_text, str):
-        #     print(json.dumps(segments_dict, indent=2, ensure_ascii=False))
-        #     print(sub_text)
-
-        segments_dict[key] = recursive_nesting_by_category(
-            sub_text,
-            first_category=first_category,
-            next_category=next_category,
-            level=level + 1,
-            weblio=weblio
-        )
+        node = {}
+        parent[slot] = node
+        token_starts = [token.span[0] for token in tokens]
+        for key, pieces in segments_dict.items():
+            node[key], sub_tokens = _segment_text(text, tokens, token_starts, pieces, weblio)
+            if level > 0 and node[key] == text:
+                # It would be segmented the same way forever
+                raise RecursionError(f"Can't separate {text!r} by category")
+            stack.append((node, key, node[key], sub_tokens, level + 1))
 
-    return segments_dict
+    return root[None]
 
 
 def get_entry(ref_path, text):
@@ -316,6 +455,97 @@ def get_entry(ref_path, text):
         return dict_to_text(current)
 
 
+def definition_fingerprint(text):
+    """Short, stable key of a definition's text, used to find its sense tree."""
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=8).hexdigest()
+
+
+def build_sense_tree(text):
+    """
+    Parses a definition's numbering once, so get_entry doesn't have to at lookup time.
+
+    The tree is flat: {"": whole entry, "2": entry ②, "2/1": entry ②❶, ...},
+    every value already rendered the way get_entry would return it.
+    Paths under "?" can't be followed (get_entry raises a KeyError there).
+    A definition without any numbering gets an empty tree.
+
+    Returns:
+    - dict: The sense tree, or None if the definition can't be parsed.
+    """
+    try:
+        entry_dict = recursive_nesting_by_category(text)
+        if isinstance(entry_dict, str):
+            return {}
+
+        sense_tree = {}
+        unresolvable = []
+        stack = [("", entry_dict)]
+        while stack:
+            path, node = stack.pop()
+            if isinstance(node, str):
+                sense_tree[path] = node
+                continue
+
+            sense_tree[path] = dict_to_text(node)
+            try:
+                numbers = [
+                    (str(REFERENCE_NUMBER_MAP[key]), child)
+                    for key, child in node.items()
+                    if key != "prefix"
+                ]
+            except KeyError:
+                unresolvable.append(path)
+                continue
+
+            seen = set()
+            for number, child in numbers:
+                # get_entry follows the first key with a matching number.
+                # References are always numbers, so ア, a, 上... can't be followed anyway.
+                if number in seen or not number.isdigit():
+                    continue
+                seen.add(number)
+                stack.append((f"{path}/{number}" if path else number, child))
+
+        if unresolvable:
+            sense_tree["?"] = unresolvable
+        return sense_tree
+    except Exception:
+        # get_entry will run into the same error when the definition is looked up.
+        return None
+
+
+def build_sense_trees(entries):
+    """Returns {fingerprint: sense tree} for every definition in {reading: {word: [definitions]}}."""
+    trees = {}
+    for words in entries.values():
+        for definitions in words.values():
+            for definition in definitions:
+                fingerprint = definition_fingerprint(definition)
+                if fingerprint not in trees:
+                    sense_tree = build_sense_tree(definition)
+                    if sense_tree is not None:
+                        trees[fingerprint] = sense_tree
+    return trees
+
+
+def get_entry_from_sense_tree(ref_path, text, sense_tree):
+    """Same as get_entry(ref_path, text), using the definition's precomputed sense tree."""
+    if not ref_path or not sense_tree:
+        return text
+
+    unresolvable = sense_tree.get("?", ())
+    path = ""
+    for step in ref_path:
+        if path in unresolvable:
+            return get_entry(ref_path, text)
+        next_path = f"{path}/{step}" if path else step
+        if next_path not in sense_tree:
+            break
+        path = next_path
+
+    return sense_tree[path]
+
+
 def convert_to_path(reference_numbers):
     path = []
     counter = 0
@@ -333,16 +563,9 @@ def convert_to_path(reference_numbers):
     return path
 
 
-def add_dictionary_to_big_data(dictionary_path, big_data):
-    """
-    Adds words and their definitions from dictionary files to the global `big_data` dictionary.
-
-    Args:
-    - dictionary_path (str): Path to the dictionary folder.
-    - big_data (dict): The shared dictionary.
-    """
-    print(f"Adding from {dictionary_path}")
-    term_bank_files = sorted(
+def list_term_bank_files(dictionary_path):
+    """Returns the term_bank_N.json files of a dictionary folder, in numeric order."""
+    return sorted(
         [
             f
             for f in os.listdir(dictionary_path)
@@ -351,18 +574,204 @@ def add_dictionary_to_big_data(dictionary_path, big_data):
         key=lambda x: int(re.search(r"\d+", x).group()),
     )
 
-    for file in term_bank_files:
-        # data = None
-        # with open(f"旺文社国語辞典 第十一版/{file}", "r", encoding="utf-8") as f:
-        #     data = json.load(f)
 
-        # with open(f"旺文社国語辞典 第十一版/{file}", "w", encoding="utf-8") as f:
-        #     json.dump(data, f, indent=2, ensure_ascii=False)
+def build_big_data(
+    dictionary_paths, big_data, jobs=1, use_cache=True, readings_map=None, trees=None
+):
+    """
+    Builds big_data from the term banks of every dictionary.
+
+    Every term bank is turned into a partial result of its own, which is cached
+    in BUILD_CACHE_FOLDER under the hash of the term bank's content.
+    On the next build, term banks whose content and CLEANING_VERSION didn't change
+    are loaded from the cache instead of being processed again.
+
+    The partials are merged in dictionary/term bank order no matter
+    where they came from, so the output is the same as a full serial build.
+
+    Args:
+    - dictionary_paths (list): Paths to the dictionary folders, in priority order.
+    - big_data (dict): The shared dictionary.
+    - jobs (int): Number of worker processes for the term banks that need processing.
+    - use_cache (bool): Reuse cached term banks. False reprocesses everything.
+    - readings_map (dict): The word -> readings map to update. Defaults to `word_to_readings_map`.
+    - trees (dict): The fingerprint -> sense tree map to update. Defaults to `sense_trees`.
+    """
+    manifest = load_build_manifest() if use_cache else {}
+    if manifest.get("cleaning_version") == CLEANING_VERSION:
+        previous_term_banks = manifest.get("term_banks", {})
+    else:
+        previous_term_banks = {}
+
+    new_manifest = {"cleaning_version": CLEANING_VERSION, "term_banks": {}}
+    tasks = []
+    for dictionary_path in dictionary_paths:
+        for file in list_term_bank_files(dictionary_path):
+            key = f"{dictionary_path}/{file}"
+            previous = previous_term_banks.get(key)
+            record = term_bank_record(os.path.join(dictionary_path, file), previous)
+            new_manifest["term_banks"][key] = record
+
+            cache_path = partial_cache_path(dictionary_path, record["sha256"])
+            is_cached = (
+                previous is not None
+                and previous["sha256"] == record["sha256"]
+                and os.path.exists(cache_path)
+            )
+            tasks.append((file, dictionary_path, cache_path, is_cached))
+
+    to_process = [(file, dictionary_path) for file, dictionary_path, _, cached in tasks if not cached]
+    print(f"{len(tasks) - len(to_process)} term banks unchanged, {len(to_process)} to process")
+
+    os.makedirs(BUILD_CACHE_FOLDER, exist_ok=True)
+    with contextlib.ExitStack() as stack:
+        if jobs > 1 and len(to_process) > 1:
+            print(f"Processing with {jobs} workers")
+            executor = stack.enter_context(ProcessPoolExecutor(max_workers=jobs))
+            # map() yields the results in submission order
+            processed = executor.map(
+                process_term_bank_file_partial,
+                [file for file, _ in to_process],
+                [dictionary_path for _, dictionary_path in to_process],
+            )
+        else:
+            processed = (
+                process_term_bank_file_partial(file, dictionary_path)
+                for file, dictionary_path in to_process
+            )
+
+        for file, dictionary_path, cache_path, is_cached in tasks:
+            if is_cached:
+                entries, readings, senses = load_partial(cache_path)
+            else:
+                entries, readings, senses = next(processed)
+                save_partial(cache_path, entries, readings, senses)
+
+            merge_partial_big_data(
+                big_data, dictionary_path, entries, readings, readings_map, senses, trees
+            )
+
+    save_build_manifest(new_manifest)
+
+
+def term_bank_record(file_path, previous=None):
+    """
+    Returns the manifest record of a term bank: its size, mtime and content hash.
+    The hash is only recomputed if the size or mtime changed since the previous record.
+    """
+    stat = os.stat(file_path)
+    if (
+        previous is not None
+        and previous.get("size") == stat.st_size
+        and previous.get("mtime_ns") == stat.st_mtime_ns
+    ):
+        return previous
+
+    sha256 = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            sha256.update(block)
+
+    return {"sha256": sha256.hexdigest(), "size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+def partial_cache_path(dictionary_path, content_hash):
+    """The same term bank can be cleaned differently depending on the dictionary, so both go in the name."""
+    dictionary_hash = hashlib.sha256(dictionary_path.encode("utf-8")).hexdigest()[:16]
+    return os.path.join(BUILD_CACHE_FOLDER, f"{dictionary_hash}-{content_hash}.json")
+
+
+def load_partial(cache_path):
+    with open(cache_path, "r", encoding="utf-8") as f:
+        partial = json.load(f)
+    return partial["entries"], partial["readings"], partial["senses"]
+
+
+def save_partial(cache_path, entries, readings, senses):
+    with open(cache_path, "w", encoding="utf-8") as f:
+        json.dump(
+            {"entries": entries, "readings": readings, "senses": senses},
+            f,
+            ensure_ascii=False,
+        )
+
+
+def load_build_manifest():
+    if not os.path.exists(BUILD_MANIFEST_FILE):
+        return {}
+    with open(BUILD_MANIFEST_FILE, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_build_manifest(manifest):
+    """Saves the manifest and removes the cached term banks it no longer refers to."""
+    with open(BUILD_MANIFEST_FILE, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+
+    in_use = {
+        os.path.basename(partial_cache_path(key.rsplit("/", 1)[0], record["sha256"]))
+        for key, record in manifest["term_banks"].items()
+    }
+    for file in os.listdir(BUILD_CACHE_FOLDER):
+        if file.endswith(".json") and file != os.path.basename(BUILD_MANIFEST_FILE) and file not in in_use:
+            os.remove(os.path.join(BUILD_CACHE_FOLDER, file))
+
+
+def process_term_bank_file_partial(file, dictionary_path):
+    """
+    Processes a single term bank file into a partial result of its own.
+    Doesn't touch any shared state, so it can run in a worker process.
+
+    Returns:
+    - tuple: ({reading: {word: [definitions]}}, {word: [readings]}, {fingerprint: sense tree})
+    """
+    partial_big_data = {}
+    partial_readings_map = {}
+    process_term_bank_file(file, dictionary_path, partial_big_data, partial_readings_map)
+    entries = partial_big_data[dictionary_path]
+    return entries, partial_readings_map, build_sense_trees(entries)
+
+
+def merge_partial_big_data(
+    big_data, dictionary_path, entries, readings, readings_map=None, senses=None, trees=None
+):
+    """
+    Merges the result of `process_term_bank_file_partial` into big_data,
+    the same way `edit_big_data` would have added the entries one by one.
+    """
+    if readings_map is None:
+        readings_map = word_to_readings_map
+    if trees is None:
+        trees = sense_trees
+
+    if senses:
+        trees.update(senses)
+
+    if dictionary_path not in big_data:
+        big_data[dictionary_path] = {}
 
-        process_term_bank_file(file, dictionary_path, big_data)
+    for reading, words in entries.items():
+        if reading not in big_data[dictionary_path]:
+            big_data[dictionary_path][reading] = {}
 
+        for word, definitions in words.items():
+            if word not in big_data[dictionary_path][reading]:
+                big_data[dictionary_path][reading][word] = []
 
-def process_term_bank_file(file, dictionary_path, big_data):
+            big_data[dictionary_path][reading][word] = unique(
+                big_data[dictionary_path][reading][word] + definitions
+            )
+
+    for word, word_readings in readings.items():
+        readings_map[word] = unique(readings_map.get(word, []) + word_readings)
+
+
+def unique(items):
+    """Removes duplicates while keeping the original order, so builds are reproducible."""
+    return list(dict.fromkeys(items))
+
+
+def process_term_bank_file(file, dictionary_path, big_data, readings_map=None):
     """Processes a single term bank file."""
     print(f"Processing {file} in {dictionary_path}")
 
@@ -370,61 +779,115 @@ def process_term_bank_file(file, dictionary_path, big_data):
         big_data[dictionary_path] = {}
 
     file_path = os.path.join(dictionary_path, file)
-    already_seen = []
-    new_data = []
+    already_seen = set()
+    total = 0
+    skipped = 0
     try:
-        with open(file_path, "r", encoding="utf-8") as f:
-            data = json.load(f)
-            for entry in data:
-
-                word, reading, entry_type, definitions_in_data = (
-                    entry[0],
-                    entry[1],
-                    entry[2],
-                    entry[5],
-                )
-                # Skip entries with unwanted types
-                if entry_type not in ["子", "句"]:
-                    # Handle missing or convert reading to Hiragana
-                    if not reading:
-                        reading = get_hiragana_only(word)
-                    else:
-                        reading = get_hiragana_only(reading)
-
-                    definition_list = []
-                    for definition in definitions_in_data:
-                        definition_text = get_text_only_from_dictionary(
-                            word, reading, definition, dictionary_path
-                        )
-                        if definition_text:
-                            definition_list.append(definition_text)
-
+        for entry in iter_term_bank_entries(file_path):
+            total += 1
+
+            word, reading, entry_type, definitions_in_data = (
+                entry[0],
+                entry[1],
+                entry[2],
+                entry[5],
+            )
+            # Skip entries with unwanted types
+            if entry_type not in ["子", "句"]:
+                # Handle missing or convert reading to Hiragana
+                if not reading:
+                    reading = hiragana_only(word)
                 else:
-                    definition_list = []
-
-                word = word.replace("＝", "")
-                
-                if (word, reading, definition_list) not in already_seen and definition_list:
-                    # Update call to `edit_big_data` with the new structure
-                    edit_big_data(
-                        big_data, dictionary_path, reading, word, definition_list
+                    reading = hiragana_only(reading)
+
+                definition_list = []
+                for definition in definitions_in_data:
+                    definition_text = get_text_only_from_dictionary(
+                        word, reading, definition, dictionary_path
                     )
-                    new_data.append(entry)
-                else: 
-                    already_seen.append((word, reading, definition_list))
-                    
-        if len(new_data) != len(data):
-            print(f"Removed {len(data)-len(new_data)} items")
+                    if definition_text:
+                        definition_list.append(definition_text)
 
-        with open(file_path, "w", encoding="utf-8") as f:
-            json.dump(new_data, f, ensure_ascii=False, indent=2)
+            else:
+                definition_list = []
+
+            word = word.replace("＝", "")
+
+            key = (word, reading, tuple(definition_list))
+            if definition_list and key not in already_seen:
+                already_seen.add(key)
+                # Update call to `edit_big_data` with the new structure
+                edit_big_data(
+                    big_data, dictionary_path, reading, word, definition_list,
+                    readings_map
+                )
+            else:
+                skipped += 1
+
+        if skipped:
+            print(f"Skipped {skipped} of {total} items")
 
     except Exception as e:
         print(f"Error processing file {file}: {e}")
         raise e
 
 
-def edit_big_data(big_data, dictionary_path, reading, word, definitions):
+# Whitespace and the commas between the entries of a term bank
+_JSON_SEPARATORS = re.compile(r"[\s,]*")
+
+
+def iter_term_bank_entries(file_path, chunk_size=1 << 16):
+    """
+    Yields the entries of a term bank (a JSON array) one at a time.
+
+    The file is read in chunks and only the entry currently being decoded is kept in memory,
+    so memory use doesn't grow with the size of the term bank.
+
+    Args:
+    - file_path (str): Path to the term_bank_N.json file.
+    - chunk_size (int): Number of characters read at a time.
+    """
+    decoder = json.JSONDecoder()
+    with open(file_path, "r", encoding="utf-8") as f:
+        buffer = f.read(chunk_size).lstrip()
+        if not buffer.startswith("["):
+            raise ValueError(f"{file_path} is not a JSON array")
+
+        position = 1
+        end_of_file = False
+        while True:
+            position = _JSON_SEPARATORS.match(buffer, position).end()
+
+            if position < len(buffer) and buffer[position] == "]":
+                return
+
+            entry = None
+            if position < len(buffer):
+                try:
+                    entry, position = decoder.raw_decode(buffer, position)
+                except json.JSONDecodeError:
+                    if end_of_file:
+                        raise
+
+            if entry is None:
+                if end_of_file:
+                    raise ValueError(f"{file_path} ended before the closing ]")
+                # The entry doesn't fit in what we've read so far.
+                # Reading at least as much as we already have keeps huge entries from being re-decoded too often.
+                more = f.read(max(chunk_size, len(buffer) - position))
+                end_of_file = not more
+                buffer = buffer[position:] + more
+                position = 0
+                continue
+
+            yield entry
+
+            if position > chunk_size:
+                buffer = buffer[position:]
+                position = 0
+
+
+def edit_big_data(big_data, dictionary_path, reading, word, definitions, readings_map=None):
     """
     Updates big_data with the specified structure:
 
@@ -437,6 +900,9 @@ def edit_big_data(big_data, dictionary_path, reading, word, definitions):
         }
     }
     """
+    if readings_map is None:
+        readings_map = word_to_readings_map
+
     if re.fullmatch(r"\d+", word):
         print(f"Skipping all-number word {word}")
         return
@@ -454,15 +920,15 @@ def edit_big_data(big_data, dictionary_path, reading, word, definitions):
     big_data[dictionary_path][reading][word].extend(filtered_definitions)
 
     # Ensure unique definitions for the word
-    big_data[dictionary_path][reading][word] = list(
-        set(big_data[dictionary_path][reading][word])
+    big_data[dictionary_path][reading][word] = unique(
+        big_data[dictionary_path][reading][word]
     )
 
-    if word not in word_to_readings_map:
-        word_to_readings_map[word] = []
+    if word not in readings_map:
+        readings_map[word] = []
 
-    word_to_readings_map[word].append(reading)
-    word_to_readings_map[word] = list(set(word_to_readings_map[word]))
+    if reading not in readings_map[word]:
+        readings_map[word].append(reading)
 
 
 def replace_furigana_references(text):
@@ -535,885 +1001,789 @@ def replace_furigana_references(text):
     return text
 
 
-def normalize_references(text: str, dictionary_path: str) -> str:
-    text = re.sub(rf" ?[{ARROWS}]", "⇒", text)
-    text = text.replace("\\n", "\n")
-    text = re.sub(r"<br ?/>", "\n", text)
-    flag = False
-    text_original = text[:]
-
-    if dictionary_path.endswith("大辞泉"):
-        # ［名］(スル)「アルバイト」の略。「夏休みにバイトする」
-        text = re.sub(rf"⇒", " ⇒", text)
-        has_ryaku = re.compile(
-            rf"({PREFIX})「([^{OPENING_BRACKETS}]+?)」の略({SUFFIX})"
-        )
-        if has_ryaku.search(text):
-            adding_text = has_ryaku.sub(r"⇒\2。 ", has_ryaku.search(text).group())
-            if adding_text not in text:
-                text += "\n" + adding_text
-
-        # Handle this?
-        # ［連語］⇒置 (お) く⑫
-        # ⇒人返 (ひとがえ) し②
-
-        """
-        0-11  ⇒異化 (いか) ②
-        0-1  
-        2-10  異化 (いか) 
-        2-4   異化
-        10-11 ②
-        """
-
-        # flag = True
-        text = replace_furigana_references(text)
-
-        text = re.sub(r"⇒⇒+", "⇒", text)
+# Patterns shared by every dictionary's cleaning pipeline.
+# They're built from PREFIX, SUFFIX etc. once here instead of on every call.
+_ANY_ARROW = re.compile(rf" ?[{ARROWS}]")
+_BR_TAG = re.compile(r"<br ?/>")
+_RYAKU = re.compile(rf"({PREFIX})「([^{OPENING_BRACKETS}]+?)」の略({SUFFIX})")
+_REPEATED_ARROWS = re.compile(r"⇒⇒+")
+_NI_ONAJI_WITH_FURIGANA = re.compile(rf"({PREFIX})「(.+?) \((.+?)\) 」に同じ({SUFFIX})")
+_NI_ONAJI = re.compile(rf"({PREFIX})「(.+?)」に同じ({SUFFIX})")
+_DAIJISEN_REFERENCE = re.compile(
+    rf"({PREFIX})?⇒([^\n]+?)(?:（.+?）)?((?:{NUMBERS_AND_EMOJIS})*?)({SUFFIX}|$|・| |　)"
+)
+_REFERENCE_IN_KAGIGAKKO = re.compile(rf"⇒「(.+?)((?:{NUMBERS_AND_EMOJIS})+)」")
+_SANSEIDO_REFERENCE = re.compile(
+    rf"({NUMBERS_AND_EMOJIS}|^|。|\n|[{CLOSING_BRACKETS}{OPENING_BRACKETS}]| |　|記号.+?)⇒([{NUMBER_CHARS}]*)([^\d{OPENING_BRACKETS}]+?)([{NUMBER_CHARS}]|\d️)?(・|{SUFFIX})"
+)
+# ⇒脇⑦・挙げ句②。  /  ⇒古人(1)：古人(2)
+_MULTIPLE_REFERENCE = rf"([^\n：・{NUMBER_CHARS}\d️⃣⇒ {OPENING_BRACKETS}{CLOSING_BRACKETS}]+)( \(.+?\) ?)?((?:[{NUMBER_CHARS}\d️⃣]| ?\(\d+\) ?)*)"
+_MULTIPLE_REFERENCES = re.compile(
+    rf"⇒{_MULTIPLE_REFERENCE}((?:(?:：|・){_MULTIPLE_REFERENCE})+)($|\n| |　|。|[{CLOSING_BRACKETS}])"
+)
+# 大辞林 only splits on ・
+_MULTIPLE_REFERENCE_DAIJIRIN = rf"([^\n・{NUMBER_CHARS}\d️⃣⇒ {OPENING_BRACKETS}{CLOSING_BRACKETS}]+)( \(.+?\) ?)?((?:[{NUMBER_CHARS}\d️⃣]| ?\(\d+\) ?)*)"
+_MULTIPLE_REFERENCES_DAIJIRIN = re.compile(
+    rf"⇒{_MULTIPLE_REFERENCE_DAIJIRIN}((?:・{_MULTIPLE_REFERENCE_DAIJIRIN})+)($|\n| |　|。|[{CLOSING_BRACKETS}])"
+)
+_NAKAGURO = re.compile("・")
+_NAKAGURO_OR_COLON = re.compile("：|・")
+_PARENTHESIZED_NUMBER = re.compile(r" ?\((d+)\) ?")
+_ARROWS_IN_KAGIGAKKO = re.compile(r"「(?:.+?⇒)+(?:.+?)」")
+_SPACED_ARROW = re.compile(r" ?⇒")
+_HIRAGANA_THEN_KANJI = re.compile(
+    rf"([{HIRAGANA}]+?)(?:（| \()((?:(?:[{KANJI} ]+)(?:[{HIRAGANA}]+))+)(?:（|\) )"
+)
+_HIRAGANA_WITH_HIRAGANA_FURIGANA = re.compile(rf"⇒([{HIRAGANA}]+) \(([{HIRAGANA}]+)\)")
+_FULL_WIDTH_FURIGANA = re.compile(rf"（([{HIRAGANA}]+?)）")
+_FINAL_REFERENCE = re.compile(
+    rf"⇒([^(]+?)( \([ぁ-ゔ]+\) )?((?:{NUMBERS_AND_EMOJIS})*)(?:。|$|\n|\n| |　)"
+)
+_NAKAGURO_NUMBER = re.compile(rf"・(?:[{NUMBER_CHARS}]|\d️⃣)")
+
+_UNNECESSARY_SECTIONS = re.compile(
+    r"(?:\[補説\]|［補説］|［用法］|\[用法\]|\[可能\]|［可能］)(?:.|\n)+"
+)
+_SPACES_AFTER_NUMBERS = re.compile(rf"((?:{NUMBERS_AND_EMOJIS})[ ]+)+")
+_EXAMPLE_REMAINS = re.compile(r"・(?:・|／)+")
+_REPEATED_PERIODS = re.compile(r"。。+")
+_KANA_WITH_KANJI_IN_KAGIGAKKO = re.compile(
+    rf"「[{HIRAGANA}]+（([{KANJI}]+)）([{HIRAGANA}]+)」"
+)
+_DANKA = re.compile(rf"(?:［.+?］)「(.+?)」の(?:..?段化|..語)({SUFFIX})")
+_RENGO_EXPLANATION = re.compile(r"［.+?］《.+?》")
+_GRAMMAR_TAGS = re.compile(rf"(?:［.+?］)+(?:[{HIRAGANA}・]+［.+?］)?(?:\(スル\))?")
+_QUOTE_WITH_SOURCE = re.compile(r"「[^」]+?」〈[^〉]+?〉")
+_SEASON_WORD_QUOTE = re.compile(r"《[^》]+?》「[^」]+?」")
+_CONJUGATION_TABLE = re.compile(r" ?\(.+?\) 《.+?》")
+_LEADING_PARENTHESES = re.compile(r"^ \(.+?\) ")
+_FIGURE = re.compile(r"図版：\n?")
+_PART_OF_SPEECH_LINE = re.compile(r"（.+?(?!の略)）(《.+?》)?\n")
+_CONJUGATION_NOTE = re.compile(rf"(?:〔.+?〕)?[{HIRAGANA}・]+ \(.+?\)")
+_TRAILING_KUN_READINGS = re.compile(rf"\\n[{HIRAGANA}・]+$")
+_EMPTY_KIKKOU = re.compile(r"〔〕")
+_KOTOWAZA_VARIANTS = re.compile(r"(異形|類句)")
+_NO_PERIOD_OR_QUOTE_AT_END = re.compile(r"[^。」]$")
+_FINAL_WORD_REFERENCE = re.compile(rf"⇒[{KANJI}{KANA}a-zA-Z・]+$")
+_WEBLIO_GRAMMAR_TAGS = re.compile(
+    rf"({PREFIX})(?:［.+?］)+(?:[{HIRAGANA}・]+［.+?］)?(?:《.+?》)?({SUFFIX})"
+)
+_NUMBER_THEN_SPACE = re.compile(rf"([{NUMBER_CHARS}][^ ]) ")
+_LINE_BREAKS = re.compile(r"(?:<br ?/>|\n|\\n)+")
+_LEADING_HEADWORD = re.compile(rf"^[{HIRAGANA}]+【.+?】")
+_RUIKU = re.compile(rf"。(?:<br />)?類句")
+_IKEI = re.compile(rf"。(?:<br />)?異形")
+_PERIODS = re.compile(r"。+")
+_SPACES_BEFORE_PERIOD = re.compile(r" *。")
+_SPACES = re.compile(r"(?: |　)+")
+_JUST_A_LINK = re.compile(rf"⇒[a-zA-Z{KANJI}{KANA}]+(?: \(.+?\) ?)?(?:{SUFFIX}|$)")
+
+
+class CleaningPipeline:
+    """
+    The cleaning steps of one dictionary, resolved once by `get_cleaning_pipeline`.
+
+    - reference_stages: text -> text, run by normalize_references
+      between the steps every dictionary shares.
+    - cleaning_stages: (text, word, reading) -> text, run by clean_definition
+      after normalize_references. Returning None drops the definition.
+    """
+
+    def __init__(self, name, reference_stages=(), cleaning_stages=()):
+        self.name = name
+        self.reference_stages = tuple(reference_stages)
+        self.cleaning_stages = tuple(cleaning_stages)
+
+    def normalize_references(self, text):
+        text = _ANY_ARROW.sub("⇒", text)
         text = text.replace("\\n", "\n")
-        # convert に同じ format to ⇒ format for linking purposes later.
-        # Either in the beginning, between lines, or between periods.
-        #                             Prefix   Word        Suffix
-        text = re.sub(
-            rf"({PREFIX})「(.+?) \((.+?)\) 」に同じ({SUFFIX})", r"\1⇒\3 (\2) \4 ", text
-        )
+        text = _BR_TAG.sub("\n", text)
 
-        text = re.sub(
-            rf"({PREFIX})「(.+?)」に同じ({SUFFIX})", r"\1⇒\2\3 ", text
-        )
+        for stage in self.reference_stages:
+            text = stage(text)
 
-        # 「荒涼1️⃣③」に同じ。
-        # 。「言葉①」に同じ。
-        # 。⇒言葉①
-        # 。⇒言葉(1) (Later)
-        """
-        人を受け入れる心が狭いこと。度量が狭いこと。また、そのさま。「狭量な人間」 ⇒広量
-        Linked 広量
-        └②「荒涼
-        └─1️⃣ ②」に同じ。
-        └③「荒涼
-        └─1️⃣ ③」に同じ。
-        """
-
-
-        # 。⇒内匠寮 (たくみりょう) ①
-        # 。⇒IOA（Independent Olympic Athletes）
-        # ⇒コマーシャル①
-        # ...ラバー。→弾性ゴム\n② 植物から...
-        # ⇒鉱工業生産指数①
-        pattern_text = rf"({PREFIX})?⇒([^\n]+?)(?:（.+?）)?((?:{NUMBERS_AND_EMOJIS})*?)({SUFFIX}|$|・| |　)"
-        pattern = re.compile(pattern_text)
-
-        results = pattern.finditer(text)
-
-        if results:
-            # if len([x for x in results]) > 1:
-
-            for result in results:
-                _prefix, word, reference_number, suffix = result.groups()
-
-                _prefix = _prefix if _prefix else ""
-                reference_number = reference_number if reference_number else ""
-                suffix = suffix if suffix else ""
-                # Reference number
-                reference_numbers = convert_to_path(reference_number)
-                try:
-                    references = "".join(
-                        [convert_reference_numbers(x) for x in reference_numbers]
-                    )
-                except KeyError:
-                    print("[ERROR]\t", text, reference_numbers)
+        return _finalize_references(text)
 
-                text = pattern.sub(f"{_prefix}⇒{word}{reference_number}{suffix}", text)
+    def clean(self, word, reading, definition_text):
+        my_word = word == ""
 
-    if dictionary_path.endswith("三省堂国語辞典"):
-        definition_text = re.sub(
-            rf"({PREFIX})「(.+?) \((.+?)\) 」と同じ({SUFFIX})", r"\1⇒\3 (\2) \4 ", text
-        )
-        definition_text = re.sub(
-            rf"({PREFIX})「(.+?)」と同じ({SUFFIX})", r"\1⇒\2\3 ", text
-        )
+        definition_text = definition_text.split("\nLinked")[0]
+        if word.endswith("の解説"):
+            return None
 
-        # ⇒「.+?」
-        reference_pattern = rf"⇒「(.+?)((?:{NUMBERS_AND_EMOJIS})+)」"
+        definition_text = definition_text.replace("<br />", "\n").replace("<br/>", "\n")
 
-        in_kagigakko = re.compile(reference_pattern)
-        if in_kagigakko.search(text):
-            text = in_kagigakko.sub(r"「⇒\1\2」", text)
+        # Normalize \n's
+        definition_text = definition_text.replace("\\n", "\n")
+        # Weird character (thin space)
+        definition_text = definition_text.replace(" ", " ")
 
-        # ⇒脇⑦・挙げ句②。
-        # ↓
-        # ⇒脇⑦　⇒挙げ句②。
-        reference_pattern = (
-            rf"([^\n：・{NUMBER_CHARS}\d️⃣⇒ {OPENING_BRACKETS}{CLOSING_BRACKETS}]+)"
-            rf"( \(.+?\) ?)?((?:[{NUMBER_CHARS}\d️⃣]| ?\(\d+\) ?)*)"
-        )
+        # Already has some links? Remove them
+        definition_text = definition_text.split("Linked")[0]
 
-        pattern_mulitple = re.compile(
-            rf"⇒{reference_pattern}((?:(?:：|・){reference_pattern})+)($|\n| |　|。|[{CLOSING_BRACKETS}])"
-        )
+        # Unecessary parts
+        definition_text = _UNNECESSARY_SECTIONS.sub("", definition_text).strip()
 
-        results_multiple = pattern_mulitple.finditer(text)
+        # I don't even know why this appears at times
+        definition_text = definition_text.replace("_x000D_", "")
+        definition_text = definition_text.replace("\r", "")
+        definition_text = definition_text.replace("\1", "")
+        definition_text = definition_text.replace("\2", "")
 
-        text_original = text[:]
-        if results_multiple:
-            for i, result in enumerate(results_multiple):
-                first = i == 1  #                          Remove ⇒
+        if not word and not reading:
+            return None
 
-                references = re.split("・", result.group()[1:])
+        # Normalize spaces after numbers:
+        definition_text = _SPACES_AFTER_NUMBERS.sub(r"\1 ", definition_text)
 
-                result_original = result.group()
-                result_after_changes = ""
-                for reference in references:
-                    reference = (
-                        reference.strip("\n").strip(" ").strip("　").replace("｠", "")
-                    )
-                    fixed_nubmers_reference = re.sub(
-                        r" ?\((d+)\) ?", r"〚{\1}〛", reference
-                    )
-                    result_after_changes = re.sub(
-                        rf" ?(?:⇒|・){re.escape(reference)}",
-                        rf" ⇒{fixed_nubmers_reference} ",
-                        result_original,
-                    )
-                text = text.replace(result_original, result_after_changes)
+        definition_text = self.normalize_references(definition_text)
 
-        text = replace_furigana_references(text)
+        for stage in self.cleaning_stages:
+            definition_text = stage(definition_text, word, reading)
+            if definition_text is None:
+                return None
 
-        # ①朝。午前。            ☓
-        # ②〘服〙←モーニングコート。 ◯
-        # ③←モーニングサービス。　　 ◯
-        # (!) Remeber,   All arrows are now "⇒"
+        if definition_text:
+            definition_text = definition_text.strip("\n").strip("\n")
 
-        pattern = re.compile(
-            rf"({NUMBERS_AND_EMOJIS}|^|。|\n|[{CLOSING_BRACKETS}{OPENING_BRACKETS}]| |　|記号.+?)⇒([{NUMBER_CHARS}]*)([^\d{OPENING_BRACKETS}]+?)([{NUMBER_CHARS}]|\d️)?(・|{SUFFIX})"
-        )
-        results = pattern.finditer(text)
-        for result in results:
-            _prefix, _, word, reference_number, suffix = result.groups()
-            _prefix = _prefix if _prefix else ""
-            reference_number = reference_number if reference_number else ""
-            suffix = suffix if suffix else ""
-            text = pattern.sub(f"{_prefix}⇒{word}{reference_number}{suffix} ", text)
-
-    if dictionary_path.endswith("大辞林"):
-        # ［名］(スル)「アルバイト」の略。「夏休みにバイトする」
-        text = text.replace(" ・", "・")
-        has_ryaku = re.compile(
-            rf"({PREFIX})「([^{OPENING_BRACKETS}]+?)」の略({SUFFIX})"
-        )
-        if has_ryaku.search(text):
-            adding_text = has_ryaku.sub(r"⇒\2。 ", has_ryaku.search(text).group())
-            if adding_text not in text:
-                text += "\n" + adding_text
+        # Normalize numbers back
+        definition_text = _NUMBER_THEN_SPACE.sub(r"\1 ", definition_text)
 
-        reference_pattern = rf"([^\n・{NUMBER_CHARS}\d️⃣⇒ {OPENING_BRACKETS}{CLOSING_BRACKETS}]+)( \(.+?\) ?)?((?:[{NUMBER_CHARS}\d️⃣]| ?\(\d+\) ?)*)"
+        # Contract multiple linebreaks into a single linebreak
+        definition_text = _LINE_BREAKS.sub(r"\n", definition_text)
 
-        pattern_mulitple = re.compile(
-            rf"⇒{reference_pattern}((?:・{reference_pattern})+)($|\n| |　|。|[{CLOSING_BRACKETS}])"
-        )
+        definition_text = _LEADING_HEADWORD.sub(r"", definition_text)
+        definition_text = _RUIKU.sub(r"。<br /><b>類句</b>", definition_text)
+        definition_text = _IKEI.sub(r"。<br /><b>異形</b>", definition_text)
 
-        results_multiple = pattern_mulitple.finditer(text)
-
-        text_original = text[:]
-        if results_multiple:
-            for i, result in enumerate(results_multiple):
-                first = i == 1  #                          Remove ⇒
-                references = re.split("・", result.group()[1:])
-                result_original = result.group()
-                result_after_changes = ""
-                for reference in references:
-                    reference = (
-                        reference.strip("\n").strip(" ").strip("　").replace("｠", "")
-                    )
-                    fixed_nubmers_reference = re.sub(
-                        r" ?\((d+)\) ?", r"〚{\1}〛", reference
-                    )
-                    result_after_changes = re.sub(
-                        rf" ?(?:⇒|・){re.escape(reference)}",
-                        rf" ⇒{fixed_nubmers_reference} ",
-                        result_original,
-                    )
-                text = text.replace(result_original, result_after_changes)
+        definition_dict = recursive_nesting_by_category(definition_text)
+        if isinstance(definition_dict, dict):
+            definition_text = dict_to_text(definition_dict)
+        else:
+            definition_text = definition_dict
 
-        text = replace_furigana_references(text)
+        definition_text = _PERIODS.sub("。", definition_text)
+        definition_text = _SPACES_BEFORE_PERIOD.sub("。", definition_text)
 
-    if dictionary_path.endswith("使い方の分かる 類語例解辞典"):
-        ...
+        definition_text = _SPACES.sub(" ", definition_text)
 
-    if dictionary_path.endswith("旺文社国語辞典 第十一版"):
-        # Change it out of our format. Not a reference
-        # 「ｘ⇒ｘ⇒」
-        text = text.replace("（", " (").replace("）", ") ")
-        transformations = re.finditer(r"「(?:.+?⇒)+(?:.+?)」", text)
-        for transformation in transformations:
-            text = text.replace(
-                transformation.group(), transformation.group().replace("⇒", "→")
-            )
+        definition_text = definition_text.strip("\n").strip()
 
-        text = re.sub(r" ?⇒", " ⇒", text)
+        if "[可能]" in definition_text:
+            definition_text = definition_text.split("[可能]")[1]
 
-        # ⇒けん（献）  -  Hiragana (kanji)
-        hiragana_kanji_references = re.finditer(
-            rf"([{HIRAGANA}]+?)(?:（| \()((?:(?:[{KANJI} ]+)(?:[{HIRAGANA}]+))+)(?:（|\) )",
-            text,
-        )
-        if hiragana_kanji_references:
-            for r in hiragana_kanji_references:
-                the_match = r.group()
-                the_hiragana = r.group(1).replace(" ", "")
-                the_kanji = r.group(2).replace(" ", "")
-                text = text.replace(
-                    the_match, f"{the_kanji.replace(' ', '')} ({the_hiragana}) "
-                )
+        if my_word:
+            print(4, definition_text)
+        # Is just a link
+        if _JUST_A_LINK.fullmatch(definition_text):
+            return None
 
-        text = replace_furigana_references(text)
+        return definition_text.replace("\n", "<br />")
 
-        text = re.sub(rf"⇒([{HIRAGANA}]+) \(([{HIRAGANA}]+)\)", "⇒\1\2", text)
-        # これから起こる事柄を表す言い 方。\n｟ ⇒過去・現在｠"
 
-        # ⇒古人(1)：古人(2)
-        # ↓
-        # ⇒古人(1) ⇒古人(2)。
+def _append_ryaku_reference(text):
+    # ［名］(スル)「アルバイト」の略。「夏休みにバイトする」
+    found = _RYAKU.search(text)
+    if found:
+        adding_text = _RYAKU.sub(r"⇒\2。 ", found.group())
+        if adding_text not in text:
+            text += "\n" + adding_text
+    return text
 
-        # ⇒下がる ⇒おりる (下りる) (1)：おりる (降りる) (2)
-        reference_pattern = rf"([^\n：・{NUMBER_CHARS}\d️⃣⇒ {OPENING_BRACKETS}{CLOSING_BRACKETS}]+)( \(.+?\) ?)?((?:[{NUMBER_CHARS}\d️⃣]| ?\(\d+\) ?)*)"
 
-        pattern_mulitple = re.compile(
-            rf"⇒{reference_pattern}((?:(?:：|・){reference_pattern})+)($|\n| |　|。|[{CLOSING_BRACKETS}])"
-        )
+def _split_multiple_references(text, pattern, separators, separators_with_arrow):
+    """
+    ⇒脇⑦・挙げ句②。
+    ↓
+    ⇒脇⑦　⇒挙げ句②。
+    """
+    for result in pattern.finditer(text):
+        references = separators.split(result.group()[1:])
+        result_original = result.group()
+        result_after_changes = ""
+        for reference in references:
+            reference = (
+                reference.strip("\n").strip(" ").strip("　").replace("｠", "")
+            )
+            fixed_nubmers_reference = _PARENTHESIZED_NUMBER.sub(r"〚{\1}〛", reference)
+            result_after_changes = re.sub(
+                rf" ?{separators_with_arrow}{re.escape(reference)}",
+                rf" ⇒{fixed_nubmers_reference} ",
+                result_original,
+            )
+        text = text.replace(result_original, result_after_changes)
+    return text
 
-        results_multiple = pattern_mulitple.finditer(text)
-
-        text_original = text[:]
-        if results_multiple:
-            for i, result in enumerate(results_multiple):
-                first = i == 1  #                          Remove ⇒
-                references = re.split("：|・", result.group()[1:])
-                result_original = result.group()
-                result_after_changes = ""
-                for reference in references:
-                    reference = (
-                        reference.strip("\n").strip(" ").strip("　").replace("｠", "")
-                    )
-                    fixed_nubmers_reference = re.sub(
-                        r" ?\((d+)\) ?", r"〚{\1}〛", reference
-                    )
-                    result_after_changes = re.sub(
-                        rf" ?(?:⇒|：|・){re.escape(reference)}",
-                        f" ⇒{fixed_nubmers_reference} ",
-                        result_original,
-                    )
-                text = text.replace(result_original, result_after_changes)
 
-        # ⇒言語（げんご）- Gengo (Furigana)
-        # Change full-width brackets to half-width for later function
-        text = re.sub(rf"（([{HIRAGANA}]+?)）", rf" (\1) ", text)
-        text = text = replace_furigana_references(text)
+def _normalize_daijisen_references(text):
+    text = text.replace("⇒", " ⇒")
+    text = _append_ryaku_reference(text)
 
-        if text.endswith("\n⇒「使い分け」"):
-            text = text[: -len("\n⇒「使い分け」")]
+    # Handle this?
+    # ［連語］⇒置 (お) く⑫
+    # ⇒人返 (ひとがえ) し②
 
+    """
+    0-11  ⇒異化 (いか) ②
+    0-1
+    2-10  異化 (いか)
+    2-4   異化
+    10-11 ②
+    """
 
+    text = replace_furigana_references(text)
 
-    # Search for reference pattern in the definition
-    reference_matches = re.finditer(
-        rf"⇒([^(]+?)( \([ぁ-ゔ]+\) )?((?:{NUMBERS_AND_EMOJIS})*)(?:。|$|\n|\n| |　)",
-        text,
-    )
-    
-    text = text.replace(" ⇒", "⇒")
-    text = re.sub(rf"・(?:[{NUMBER_CHARS}]|\d️⃣)", "", text)
-    # {prefix}{tag}⇒{word}{references}{suffix}
-    # already_linked = []
-    # If there's a reference in the definition
-    if reference_matches:
-        for reference_match in reference_matches:
-            last_char = reference_match.group()[-1]
-            suffix = last_char if last_char in ["。", "\n", "　", " ", ";"] else ""
-            if suffix == ";" and reference_match.group().endswith("\n"):
-                suffix = "\n"
-
-            referenced_word, furigana, reference_number_path = reference_match.groups()
-            furigana = furigana if furigana else ""
-
-            reference_number_path = (
-                reference_number_path if reference_number_path else ""
-            )
-            reference_numbers = convert_to_path(reference_number_path)
+    text = _REPEATED_ARROWS.sub("⇒", text)
+    text = text.replace("\\n", "\n")
+    # convert に同じ format to ⇒ format for linking purposes later.
+    # Either in the beginning, between lines, or between periods.
+    #                             Prefix   Word        Suffix
+    text = _NI_ONAJI_WITH_FURIGANA.sub(r"\1⇒\3 (\2) \4 ", text)
+    text = _NI_ONAJI.sub(r"\1⇒\2\3 ", text)
+
+    # 「荒涼1️⃣③」に同じ。
+    # 。「言葉①」に同じ。
+    # 。⇒言葉①
+    # 。⇒言葉(1) (Later)
+
+    # 。⇒内匠寮 (たくみりょう) ①
+    # 。⇒IOA（Independent Olympic Athletes）
+    # ⇒コマーシャル①
+    # ...ラバー。→弾性ゴム\n② 植物から...
+    # ⇒鉱工業生産指数①
+    for result in _DAIJISEN_REFERENCE.finditer(text):
+        _prefix, word, reference_number, suffix = result.groups()
+
+        _prefix = _prefix if _prefix else ""
+        reference_number = reference_number if reference_number else ""
+        suffix = suffix if suffix else ""
+
+        text = _DAIJISEN_REFERENCE.sub(f"{_prefix}⇒{word}{reference_number}{suffix}", text)
 
-            try:
-                reference_numbers = "".join(
-                    [convert_reference_numbers(x) for x in reference_numbers]
-                )
-            except KeyError:
-                print("[ERROR]\t", text, reference_numbers)
+    return text
 
-            text = text.replace(
-                reference_match.group(),
-                f" ⇒{referenced_word}{furigana}{reference_numbers} ",
-            )
-            text += suffix
 
-    return text.replace("\n", "\n")
+def _normalize_sanseido_references(text):
+    # ⇒「.+?」
+    if _REFERENCE_IN_KAGIGAKKO.search(text):
+        text = _REFERENCE_IN_KAGIGAKKO.sub(r"「⇒\1\2」", text)
 
+    # ⇒脇⑦・挙げ句②。
+    # ↓
+    # ⇒脇⑦　⇒挙げ句②。
+    text = _split_multiple_references(text, _MULTIPLE_REFERENCES, _NAKAGURO, "(?:⇒|・)")
 
-def clean_definition(
-    word: str, reading: str, definition_text: str, dictionary_path: str
-) -> str:
-    """
-    Cleans and formats the definition text based on the specific dictionary.
+    text = replace_furigana_references(text)
 
-    Args:
-    - definition_text (str): The raw definition text to clean.
-    - dictionary_path (str): The name or identifier of the dictionary.
+    # ①朝。午前。            ☓
+    # ②〘服〙←モーニングコート。 ◯
+    # ③←モーニングサービス。　　 ◯
+    # (!) Remeber,   All arrows are now "⇒"
+    for result in _SANSEIDO_REFERENCE.finditer(text):
+        _prefix, _, word, reference_number, suffix = result.groups()
+        _prefix = _prefix if _prefix else ""
+        reference_number = reference_number if reference_number else ""
+        suffix = suffix if suffix else ""
+        text = _SANSEIDO_REFERENCE.sub(f"{_prefix}⇒{word}{reference_number}{suffix} ", text)
 
-    Returns:
-    - str: The cleaned and formatted definition text.
-    """
-    # Remove the first line for specific dictionaries
+    return text
 
-    my_word = word == ""
 
+def _normalize_daijirin_references(text):
+    text = text.replace(" ・", "・")
+    text = _append_ryaku_reference(text)
 
-    definition_text = definition_text.split("\nLinked")[0]
-    if word.endswith("の解説"):
-        return None
+    text = _split_multiple_references(
+        text, _MULTIPLE_REFERENCES_DAIJIRIN, _NAKAGURO, "(?:⇒|・)"
+    )
 
-    definition_text = definition_text.replace("<br />", "\n").replace("<br/>", "\n")
+    return replace_furigana_references(text)
 
-    # Normalize \n's
-    definition_text = definition_text.replace("\\n", "\n")
-    # Weird character
-    definition_text = definition_text.replace(" ", " ")
 
-    # Already has some links? Remove them
-    definition_text = definition_text.split("Linked")[0]
+def _normalize_obunsha_references(text):
+    # Change it out of our format. Not a reference
+    # 「ｘ⇒ｘ⇒」
+    text = text.replace("（", " (").replace("）", ") ")
+    for transformation in _ARROWS_IN_KAGIGAKKO.finditer(text):
+        text = text.replace(
+            transformation.group(), transformation.group().replace("⇒", "→")
+        )
 
-    # Unecessary parts
-    definition_text = re.sub(
-        r"(?:\[補説\]|［補説］|［用法］|\[用法\]|\[可能\]|［可能］)(?:.|\n)+",
-        "",
-        definition_text,
-    ).strip()
+    text = _SPACED_ARROW.sub(" ⇒", text)
 
-    # I don't even know why this appears at times
-    definition_text = definition_text.replace("_x000D_", "")
-    definition_text = definition_text.replace("\r", "")
-    definition_text = definition_text.replace("\1", "")
-    definition_text = definition_text.replace("\2", "")
+    # ⇒けん（献）  -  Hiragana (kanji)
+    for r in _HIRAGANA_THEN_KANJI.finditer(text):
+        the_match = r.group()
+        the_hiragana = r.group(1).replace(" ", "")
+        the_kanji = r.group(2).replace(" ", "")
+        text = text.replace(
+            the_match, f"{the_kanji.replace(' ', '')} ({the_hiragana}) "
+        )
 
-    if not word and not reading:
-        return None
+    text = replace_furigana_references(text)
+
+    text = _HIRAGANA_WITH_HIRAGANA_FURIGANA.sub("⇒\1\2", text)
+    # これから起こる事柄を表す言い 方。\n｟ ⇒過去・現在｠"
+
+    # ⇒古人(1)：古人(2)
+    # ↓
+    # ⇒古人(1) ⇒古人(2)。
 
-    # Normalize spaces after numbers:
-    definition_text = re.sub(
-        rf"((?:{NUMBERS_AND_EMOJIS})[ ]+)+",
-        r"\1".replace(" ", "") + " ",
-        definition_text,
+    # ⇒下がる ⇒おりる (下りる) (1)：おりる (降りる) (2)
+    text = _split_multiple_references(
+        text, _MULTIPLE_REFERENCES, _NAKAGURO_OR_COLON, "(?:⇒|：|・)"
     )
 
-    definition_text = normalize_references(definition_text, dictionary_path)
+    # ⇒言語（げんご）- Gengo (Furigana)
+    # Change full-width brackets to half-width for later function
+    text = _FULL_WIDTH_FURIGANA.sub(rf" (\1) ", text)
+    text = replace_furigana_references(text)
 
-    # if "⇒" in definition_text:
+    if text.endswith("\n⇒「使い分け」"):
+        text = text[: -len("\n⇒「使い分け」")]
 
-    # Using endswith because I don't care about their order in the priority (or what order you chose to give them
-    # in the folder name). Just matters that it ends with the dictionary name.
-    # if my_word:
-        # print(1, definition_text)
-    if dictionary_path.endswith("大辞泉"):
-        splitted = definition_text.split("\n")
-        if len(splitted) > 1:
-            definition_text = "\n".join(splitted[1:])  # Remove first line
+    return text
 
 
-        # アイ (呉) (漢) いとしい めでる かなしい おしむ
-        # Clear? 
+def _finalize_references(text):
+    """Steps of normalize_references that run after the dictionary specific ones."""
+    # Search for reference pattern in the definition
+    reference_matches = _FINAL_REFERENCE.finditer(text)
 
-        if "[可能]" in definition_text:
-            definition_text = definition_text.split("[可能]")[0]
-        if "[派生]" in definition_text:
-            definition_text = definition_text.split("[派生]")[0]
-        # Remove remains of example sentences
-        # ④: 納得する。合点がいく。・・・・・・・・・・・・・・・・・ (after parsing)
-        definition_text = re.sub(r"・(?:・|／)+", "", definition_text)
-        definition_text = re.sub(r"。。+", "。", definition_text)
-
-        # ・・・・・・・・・・・・・・・・・・・・・・・・・・・・・・・・／・。 。
-        # ［動ザ上一］「まん（慢）ずる」（サ変）の上一段化。
-        # ［動ザ上一］「みそんずる」（サ変）の上一段化。「話題の展覧会を―・じる」
-        # ［動ザ上一］「てん（転）ずる」（サ変）の上一段化。「攻勢に―・じる」
-
-        # First fix 「てん（転）ずる」 → "「転ずる」"
-        definition_text = re.sub(
-            rf"「[{HIRAGANA}]+（([{KANJI}]+)）([{HIRAGANA}]+)」",
-            r"「\1\2」",
-            definition_text,
-        )
+    text = text.replace(" ⇒", "⇒")
+    text = _NAKAGURO_NUMBER.sub("", text)
+    # {prefix}{tag}⇒{word}{references}{suffix}
+    for reference_match in reference_matches:
+        last_char = reference_match.group()[-1]
+        suffix = last_char if last_char in ["。", "\n", "　", " ", ";"] else ""
+        if suffix == ";" and reference_match.group().endswith("\n"):
+            suffix = "\n"
 
-        # Then fix ［動ザ上一］「転ずる」（サ変）の上一段化。「攻勢に―・じる」 →  "⇒転ずる"
-        definition_text = re.sub(
-            rf"(?:［.+?］)「(.+?)」の(?:..?段化|..語)({SUFFIX})",
-            r"⇒\1\2 ",
-            definition_text,
-        )
+        referenced_word, furigana, reference_number_path = reference_match.groups()
+        furigana = furigana if furigana else ""
 
-        # Remove
-        # ［連語］《形容詞、および形容詞型活用語の連体形活用語尾「かる」に推量の助動詞「めり」の付いた「かるめり」の音変化》
-        # ［連語］《連語「かんめり」の撥音の無表記》
-        definition_text = re.sub(r"［.+?］《.+?》", r"", definition_text)
-
-        # ［動ラ下一］［文］かきみだ・る［ラ下二］
-        # ［動ラ五（四）］
-        # ［動サ下一］［文］かきよ・す［サ下二］
-        # ［名］(スル)
-        # ［形動］［文］［ナリ］
-        definition_text = re.sub(
-            rf"(?:［.+?］)+(?:[{HIRAGANA}・]+［.+?］)?(?:\(スル\))?",
-            r"",
-            definition_text,
+        reference_number_path = (
+            reference_number_path if reference_number_path else ""
         )
-
-        # 「一つ汲んで下されと、下々にも―に詞 (ことば) 遣ひて」〈浮・禁短気・二〉
-        definition_text = re.sub(
-            rf"「[^」]+?」〈[^〉]+?〉",
-            r"",
-            definition_text,
+        reference_numbers = convert_to_path(reference_number_path)
+        reference_numbers = "".join(
+            [convert_reference_numbers(x) for x in reference_numbers]
         )
-        # 《季 新年》「餅網も焦げて―となりにけり／友二」
-        definition_text = re.sub(
-            rf"《[^》]+?》「[^」]+?」",
-            r"",
-            definition_text,
+
+        text = text.replace(
+            reference_match.group(),
+            f" ⇒{referenced_word}{furigana}{reference_numbers} ",
         )
+        text += suffix
 
-    # if my_word:
-        # print(2, definition_text)
+    return text
 
-    if dictionary_path.endswith("旺文社国語辞典 第十一版"):
-        definition_text = definition_text.replace("〔違い〕", "")
-        # Remove first line
-        # あい‐しょう【哀傷】――シヤウ\n
-        splitted = definition_text.split("\n")
-        if len(splitted) > 1:
-            definition_text = "\n".join(splitted[1:])  # Remove first line
 
-        # (形) 《カロ・カツ (ク) ・イ・イ・ケレ・○》
-        definition_text = re.sub(r" ?\(.+?\) 《.+?》", "", definition_text)
-        definition_text = re.sub(r"^ \(.+?\) ", "", definition_text)
+def _clean_daijisen(definition_text, word, reading):
+    splitted = definition_text.split("\n")
+    if len(splitted) > 1:
+        definition_text = "\n".join(splitted[1:])  # Remove first line
 
-        # Remove the first line in items like this.
-        # あい【挨】\nアイ㊥\nおす\n筆順：\n
-        # \n\n（字義）\n① おす。押しのける。「挨拶（あいさつ）（＝原義は押しのけて進む意。国 ...
+    # アイ (呉) (漢) いとしい めでる かなしい おしむ
+    # Clear?
 
+    if "[可能]" in definition_text:
+        definition_text = definition_text.split("[可能]")[0]
+    if "[派生]" in definition_text:
+        definition_text = definition_text.split("[派生]")[0]
+    # Remove remains of example sentences
+    # ④: 納得する。合点がいく。・・・・・・・・・・・・・・・・・ (after parsing)
+    definition_text = _EXAMPLE_REMAINS.sub("", definition_text)
+    definition_text = _REPEATED_PERIODS.sub("。", definition_text)
+
+    # ・・・・・・・・・・・・・・・・・・・・・・・・・・・・・・・・／・。 。
+    # ［動ザ上一］「まん（慢）ずる」（サ変）の上一段化。
+    # ［動ザ上一］「みそんずる」（サ変）の上一段化。「話題の展覧会を―・じる」
+    # ［動ザ上一］「てん（転）ずる」（サ変）の上一段化。「攻勢に―・じる」
+
+    # First fix 「てん（転）ずる」 → "「転ずる」"
+    definition_text = _KANA_WITH_KANJI_IN_KAGIGAKKO.sub(r"「\1\2」", definition_text)
+
+    # Then fix ［動ザ上一］「転ずる」（サ変）の上一段化。「攻勢に―・じる」 →  "⇒転ずる"
+    definition_text = _DANKA.sub(r"⇒\1\2 ", definition_text)
+
+    # Remove
+    # ［連語］《形容詞、および形容詞型活用語の連体形活用語尾「かる」に推量の助動詞「めり」の付いた「かるめり」の音変化》
+    # ［連語］《連語「かんめり」の撥音の無表記》
+    definition_text = _RENGO_EXPLANATION.sub(r"", definition_text)
+
+    # ［動ラ下一］［文］かきみだ・る［ラ下二］
+    # ［動ラ五（四）］
+    # ［動サ下一］［文］かきよ・す［サ下二］
+    # ［名］(スル)
+    # ［形動］［文］［ナリ］
+    definition_text = _GRAMMAR_TAGS.sub(r"", definition_text)
+
+    # 「一つ汲んで下されと、下々にも―に詞 (ことば) 遣ひて」〈浮・禁短気・二〉
+    definition_text = _QUOTE_WITH_SOURCE.sub(r"", definition_text)
+    # 《季 新年》「餅網も焦げて―となりにけり／友二」
+    definition_text = _SEASON_WORD_QUOTE.sub(r"", definition_text)
+
+    return definition_text
+
+
+def _clean_obunsha(definition_text, word, reading):
+    definition_text = definition_text.replace("〔違い〕", "")
+    # Remove first line
+    # あい‐しょう【哀傷】――シヤウ\n
+    splitted = definition_text.split("\n")
+    if len(splitted) > 1:
+        definition_text = "\n".join(splitted[1:])  # Remove first line
+
+    # (形) 《カロ・カツ (ク) ・イ・イ・ケレ・○》
+    definition_text = _CONJUGATION_TABLE.sub("", definition_text)
+    definition_text = _LEADING_PARENTHESES.sub("", definition_text)
+
+    # Remove the first line in items like this.
+    # あい【挨】\nアイ㊥\nおす\n筆順：\n
+    # \n\n（字義）\n① おす。押しのける。「挨拶（あいさつ）（＝原義は押しのけて進む意。国 ...
+
+    if "筆順：" in definition_text:
+        return None
+    if "字義" in definition_text:
+        return None
 
-        if "筆順：" in definition_text:
-            return None
-            # definition_text = definition_text.split("筆順：")[1]
-        if "字義" in definition_text:
-            return None
-            # definition_text = definition_text.split("(字義)")[1]
-
-        definition_text = re.sub(r"図版：\n?", "", definition_text)
-        definition_text = definition_text.strip("\n")
-
-        # Remove
-        # （名・他スル）\n.
-        # （形）《カロ・カツ（ク）・イ・イ・ケレ・○》\n
-        # But keep (…の略) ?
-
-        definition_text = re.sub(r"（.+?(?!の略)）(《.+?》)?\n", "", definition_text)
-
-        # Remove
-        # 〔可能〕あが・れる（下一）\n
-        # 〔他〕あ・げる（下一 ）
-        # 〔可能〕なつ・ける (下一)
-        # 〔文〕ちかづ・く (下二)
-        # 〔文〕なにげな・し (ク)
-        definition_text = re.sub(
-            rf"(?:〔.+?〕)?[{HIRAGANA}・]+ \(.+?\)", r"", definition_text
-        )
-        # ちかづ・く (下二)
-
-        # Remove everything after 〘使い分け〙
-        if "〘使い分け〙" in definition_text:
-            definition_text = definition_text.split("〘使い分け〙")[0]
-
-        # Remove everything after 〘ちがい〙
-        if "〘ちがい〙" in definition_text:
-            definition_text = definition_text.split("〘ちがい〙")[0]
-
-        # いたる・ちか・ちかし・なる・み・みる・もと・よしみ・より
-        definition_text = re.sub(rf"\\n[{HIRAGANA}・]+$", "", definition_text)
-
-    if dictionary_path.endswith("使い方の分かる 類語例解辞典"):
-        ...
-        # This is already handled in the scraping function.
-        # definition_text = definition_text.split(r'📚使い方')[0]
-        # definition_text = definition_text.split(r'🔄使い分け')[0]
-        # definition_text = definition_text.split(r'🔗関連語')[0]
-
-    if dictionary_path.endswith("三省堂国語辞典"):
-        definition_text = re.sub(r"〔〕", "", definition_text)
-        ...
-        # This is already handled in the scraping function
-        # definition_text = re.sub(r"^.+?｠\n|「.+」(?:\n)?", "", definition_text)
-
-    if dictionary_path.endswith("事故・ことわざ・慣用句オンライン"):
-        ...
-        # This is already handled in the scraping function
-
-        # Remove spans like this
-        # しりてしらざれ【知りて知らざれ】
-        # 【失敗は成功のもと】
-        definition_text = re.sub(rf"{reading}【{word}】", "", definition_text)
-        definition_text = definition_text.replace("例文", "\n例文：")
-        definition_text = re.sub(r"(異形|類句)", fr"<br><b>\1</b>：", definition_text)
-
-
-    if dictionary_path.endswith("大辞林"):
-        no_period_quote = re.search(r"[^。」]$", definition_text)
-        final_word_reference = re.search(
-            rf"⇒[{KANJI}{KANA}a-zA-Z・]+$", definition_text
-        )
-        if no_period_quote and not final_word_reference:
-            return None
-        definition_text = definition_text.split("補説欄")[0]
-
-        # 〔③が原義〕 ......
-        startswith_comment = re.sub(r"^〔.+?〕", "", definition_text)
-
-    if dictionary_path.endswith("実用日本語表現辞典"):
-        definition_text = re.sub(fr"^「?{re.escape(word)}」?(?:とは、?)?", "", definition_text)
-        if definition_text.startswith("とは"):
-            definition_text = definition_text[2:]
-        # This is already handled in the scraping function
-
-    if dictionary_path.endswith("Weblio"):
-        # ［動カ下一］［文］なつ・く［カ下二］《「なづける」とも》
-        # ［動ア下一］［文］かま・ふ［ハ下二］
-        # ［動カ五（四）］
-        definition_text = re.sub(
-            rf"({PREFIX})(?:［.+?］)+(?:[{HIRAGANA}・]+［.+?］)?(?:《.+?》)?({SUFFIX})",
-            r"\1\2",
-            definition_text,
-        )
-        # ［名］(スル)
-        # ［形動］［文］［ナリ］
-        definition_text = re.sub(
-            rf"(?:［.+?］)+(?:[{HIRAGANA}・]+［.+?］)?(?:\(スル\))?",
-            r"",
-            definition_text,
-        )
+    definition_text = _FIGURE.sub("", definition_text)
+    definition_text = definition_text.strip("\n")
 
-    # # Add line breaks before entry numbers
-    # definition_text = re.sub(rf"({NUMBERS_AND_EMOJIS})", r"\n\1", definition_text)
-    # Clean up leading or trailing unwanted characters
+    # Remove
+    # （名・他スル）\n.
+    # （形）《カロ・カツ（ク）・イ・イ・ケレ・○》\n
+    # But keep (…の略) ?
 
-    if definition_text:
-        definition_text = definition_text.strip("\n").strip("\n")
-        # once
+    definition_text = _PART_OF_SPEECH_LINE.sub("", definition_text)
 
-    # if "⇒" in definition_text:
-    #     definition_text = re.sub(rf"({PREFIX})⇒([{NUMBER_CHARS}]*)(.+)($|。|\n|\n)", r"\1\2\3\4", definition_text)
+    # Remove
+    # 〔可能〕あが・れる（下一）\n
+    # 〔他〕あ・げる（下一 ）
+    # 〔可能〕なつ・ける (下一)
+    # 〔文〕ちかづ・く (下二)
+    # 〔文〕なにげな・し (ク)
+    definition_text = _CONJUGATION_NOTE.sub(r"", definition_text)
+    # ちかづ・く (下二)
 
-    # Normalize numbers back
-    definition_text = re.sub(rf"([{NUMBER_CHARS}][^ ]) ", r"\1 ", definition_text)
-    # if "遊里で客の相手となる遊女" in definition_text:
+    # Remove everything after 〘使い分け〙
+    if "〘使い分け〙" in definition_text:
+        definition_text = definition_text.split("〘使い分け〙")[0]
 
-    # Contract multiple linebreaks into a single linebreak
-    # For some fucking reason {2,} doesn't work so here we are.
-    definition_text = re.sub(r"(?:<br ?/>|\n|\\n)+", r"\n", definition_text)
+    # Remove everything after 〘ちがい〙
+    if "〘ちがい〙" in definition_text:
+        definition_text = definition_text.split("〘ちがい〙")[0]
 
-    definition_text = re.sub(rf"^[{HIRAGANA}]+【.+?】", r"", definition_text)
-    definition_text = re.sub(rf"。(?:<br />)?類句", r"。<br /><b>類句</b>", definition_text)
-    definition_text = re.sub(rf"。(?:<br />)?異形", r"。<br /><b>異形</b>", definition_text)
+    # いたる・ちか・ちかし・なる・み・みる・もと・よしみ・より
+    definition_text = _TRAILING_KUN_READINGS.sub("", definition_text)
 
+    return definition_text
 
-    # if "遊里で客の相手となる遊女" in definition_text:
 
-    # Temp
-    # definition_text = definition_text.replace("\n", "\n")
+def _clean_sanseido(definition_text, word, reading):
+    # The rest is already handled in the scraping function
+    return _EMPTY_KIKKOU.sub("", definition_text)
 
-    # if "遊里で客の相手となる遊女" in definition_text:
-    # if my_word:
-        # print(3, definition_text)
 
-    definition_dict = recursive_nesting_by_category(definition_text)
-    if isinstance(definition_dict, dict):
-        definition_text = dict_to_text(definition_dict)
-    else:
-        definition_text = definition_dict
+def _clean_kotowaza(definition_text, word, reading):
+    # Remove spans like this
+    # しりてしらざれ【知りて知らざれ】
+    # 【失敗は成功のもと】
+    definition_text = re.sub(rf"{reading}【{word}】", "", definition_text)
+    definition_text = definition_text.replace("例文", "\n例文：")
+    definition_text = _KOTOWAZA_VARIANTS.sub(fr"<br><b>\1</b>：", definition_text)
+    return definition_text
 
-    definition_text = re.sub(r"。+", "。", definition_text)
-    definition_text = re.sub(r" *。", "。", definition_text)
 
-    definition_text = re.sub(r"(?: |　)+", " ", definition_text)
+def _clean_daijirin(definition_text, word, reading):
+    no_period_quote = _NO_PERIOD_OR_QUOTE_AT_END.search(definition_text)
+    final_word_reference = _FINAL_WORD_REFERENCE.search(definition_text)
+    if no_period_quote and not final_word_reference:
+        return None
+    return definition_text.split("補説欄")[0]
+
+
+def _clean_jitsuyou(definition_text, word, reading):
+    definition_text = re.sub(fr"^「?{re.escape(word)}」?(?:とは、?)?", "", definition_text)
+    if definition_text.startswith("とは"):
+        definition_text = definition_text[2:]
+    # The rest is already handled in the scraping function
+    return definition_text
+
+
+def _clean_weblio(definition_text, word, reading):
+    # ［動カ下一］［文］なつ・く［カ下二］《「なづける」とも》
+    # ［動ア下一］［文］かま・ふ［ハ下二］
+    # ［動カ五（四）］
+    definition_text = _WEBLIO_GRAMMAR_TAGS.sub(r"\1\2", definition_text)
+    # ［名］(スル)
+    # ［形動］［文］［ナリ］
+    return _GRAMMAR_TAGS.sub(r"", definition_text)
+
+
+# Using endswith because I don't care about their order in the priority (or what order you chose to give them
+# in the folder name). Just matters that it ends with the dictionary name.
+CLEANING_PIPELINES = {
+    "大辞泉": CleaningPipeline(
+        "大辞泉",
+        reference_stages=[_normalize_daijisen_references],
+        cleaning_stages=[_clean_daijisen],
+    ),
+    "三省堂国語辞典": CleaningPipeline(
+        "三省堂国語辞典",
+        reference_stages=[_normalize_sanseido_references],
+        cleaning_stages=[_clean_sanseido],
+    ),
+    "大辞林": CleaningPipeline(
+        "大辞林",
+        reference_stages=[_normalize_daijirin_references],
+        cleaning_stages=[_clean_daijirin],
+    ),
+    "旺文社国語辞典 第十一版": CleaningPipeline(
+        "旺文社国語辞典 第十一版",
+        reference_stages=[_normalize_obunsha_references],
+        cleaning_stages=[_clean_obunsha],
+    ),
+    # Already handled in the scraping function.
+    "使い方の分かる 類語例解辞典": CleaningPipeline("使い方の分かる 類語例解辞典"),
+    "事故・ことわざ・慣用句オンライン": CleaningPipeline(
+        "事故・ことわざ・慣用句オンライン",
+        cleaning_stages=[_clean_kotowaza],
+    ),
+    "実用日本語表現辞典": CleaningPipeline(
+        "実用日本語表現辞典",
+        cleaning_stages=[_clean_jitsuyou],
+    ),
+    "Weblio": CleaningPipeline("Weblio", cleaning_stages=[_clean_weblio]),
+}
+DEFAULT_CLEANING_PIPELINE = CleaningPipeline("default")
 
-    definition_text = definition_text.strip("\n").strip()
 
-    if "[可能]" in definition_text:
-        definition_text = definition_text.split("[可能]")[1]
+@lru_cache(maxsize=None)
+def get_cleaning_pipeline(dictionary_path):
+    """Returns the cleaning pipeline of the dictionary whose name dictionary_path ends with."""
+    for name, pipeline in CLEANING_PIPELINES.items():
+        if dictionary_path.endswith(name):
+            return pipeline
+    return DEFAULT_CLEANING_PIPELINE
 
-    if my_word:
-        print(4, definition_text)
-    # Is just a link
-    if re.fullmatch(rf"⇒[a-zA-Z{KANJI}{KANA}]+(?: \(.+?\) ?)?(?:{SUFFIX}|$)", definition_text):
-        return None
 
-    return definition_text.replace("\n", "<br />")
+def normalize_references(text: str, dictionary_path: str) -> str:
+    return get_cleaning_pipeline(dictionary_path).normalize_references(text)
 
 
-def get_text_only_from_dictionary(
-    word: str, reading: str, definition_data: list, dic_name: str
+def clean_definition(
+    word: str, reading: str, definition_text: str, dictionary_path: str
 ) -> str:
     """
-    Extracts the main definition text from the raw data.
+    Cleans and formats the definition text based on the specific dictionary.
 
     Args:
-    - definition_data (list): List of strings and possibly other data types containing the definition.
-    - dic_name (str): Name of the dictionary being processed.
+    - definition_text (str): The raw definition text to clean.
+    - dictionary_path (str): The name or identifier of the dictionary.
 
     Returns:
-    - str: Cleaned and simplified definition text.
+    - str: The cleaned and formatted definition text.
+    """
+    return get_cleaning_pipeline(dictionary_path).clean(word, reading, definition_text)
+
+
+# Some of these have a "G" suffix, some don't, etc.
+_UNWANTED_TAGS = re.compile(
+    "違い|派生|区別|百科|アクセント|表記|品詞|用例|対義語"
+    "注記|歴史仮名|区別|ルビ|見出|可能形|異字同訓"
+)
+_REFERENCE_NUMBER_CONTENT = re.compile(NUMBER_CHARS)
+
+# What to do with a node, based on its data.name
+_KEEP = 0
+_SKIP = 1
+_UNIT_NAME = 2
+_REFERENCE_NUMBER_NODE = 3
+
+
+def _daijirin_name_action(name):
+    if name == "単位名":
+        return _UNIT_NAME
+    return _SKIP if _UNWANTED_TAGS.search(name) else _KEEP
+
+
+def _sanseido_name_action(name):
+    # Pretty sure 三省堂国語辞典 doesn't have unwanted tags but 大辞林 does.
+    if _UNWANTED_TAGS.search(name):
+        return _SKIP
+    return _REFERENCE_NUMBER_NODE if "参照語義番号" in name else _KEEP
+
+
+def _daijisen_name_action(name):
+    return _SKIP if _UNWANTED_TAGS.search(name) else _KEEP
+
+
+class StructuredContentWalker:
     """
+    Extracts the text of Yomitan structured content for one dictionary.
 
-    def get_non_recursive(information):
+    Everything that depends on the dictionary is decided when the walker is made,
+    and what to do with a data.name is worked out the first time the name is seen,
+    so walking a node doesn't involve any dictionary name checks.
+
+    - name_action: data.name -> _KEEP, _SKIP, _UNIT_NAME or _REFERENCE_NUMBER_NODE.
+    - skip_reading_pairs: Skip [reading, rest] pairs whose first item is the reading.
+    - skipped_tags: Tags whose content is skipped.
+    - kansuuji_titles: Replace img nodes titled 一, 二... with 1️⃣, 2️⃣...
+    """
+
+    def __init__(
+        self,
+        dic_name,
+        name_action=None,
+        skip_reading_pairs=False,
+        skipped_tags=(),
+        kansuuji_titles=False,
+    ):
+        self.dic_name = dic_name
+        self._name_action = name_action
+        self._name_actions = {}
+        self.skip_reading_pairs = skip_reading_pairs
+        self.skipped_tags = tuple(skipped_tags)
+        self.kansuuji_titles = kansuuji_titles
+
+    def name_action(self, name):
+        action = self._name_actions.get(name)
+        if action is None:
+            action = self._name_action(name) if self._name_action else _KEEP
+            self._name_actions[name] = action
+        return action
+
+    def walk(self, information, reading):
         """Iteratively extracts strings from the nested structure."""
         stack = [information]
         result = []
+        append = result.append
 
         while stack:
             current = stack.pop()
             if isinstance(current, str):
-                result.append(current)
+                append(current)
 
             elif isinstance(current, list):
-                flag = True
                 """
                 使い方の分かる 類語例解辞典
                 "content": [
-                  {
-                    "tag": "span",
-                    "style": {
-                      "fontWeight": "bold"
-                    },
-                    "content": "そう"
-                  },
-                  {
-                    "tag": "span",
-                    "style": {
-                      "fontWeight": "normal"
-                    },
-                    "content": "【僧】僧／僧侶／坊主／坊さん／御坊／お寺さん／僧家／沙門／法師／出家／比丘"
-                  }
+                  {"tag": "span", "style": {"fontWeight": "bold"}, "content": "そう"},
+                  {"tag": "span", "style": {"fontWeight": "normal"}, "content": "【僧】僧／僧侶／坊主..."}
                 ]
                 ---------------------------------
                 実用日本語表現辞典
                 "content": [
-                  {
-                    "tag": "span",
-                    "style": {
-                      "fontWeight": "bold"
-                    },
-                    "content": "ごじあい"
-                  },
-                  {
-                    "tag": "span",
-                    "style": {
-                      "fontWeight": "normal"
-                    },
-                    "content": "【ご自愛】"
-                  }
+                  {"tag": "span", "style": {"fontWeight": "bold"}, "content": "ごじあい"},
+                  {"tag": "span", "style": {"fontWeight": "normal"}, "content": "【ご自愛】"}
                 ]
                 """
+                if self.skip_reading_pairs and len(current) == 2:
+                    first = current[0]
+                    if "content" in first and first["content"] == reading:
+                        continue
 
-                if len(current) == 2:
-                    first, _ = current
-
-                    # These two are essentially the same thing.
-                    if dic_name.endswith("実用日本語表現辞典") or dic_name.endswith(
-                        "使い方の分かる 類語例解辞典"
-                    ):
-                        if "content" in first:
-                            if first["content"] == reading:
-                                flag = False
-
-                if flag:
-                    stack.extend(reversed(current))  # Maintain original order
+                stack.extend(reversed(current))  # Maintain original order
 
             elif isinstance(current, dict):
-                flag = True
                 content = current.get("content")
-                if "data" in current:
-                    if "name" in current["data"]:
-                        current_name = current["data"]["name"]
-                        # Some of these have a "G" suffix, some don't, etc.
-                        unwanted_tags = re.compile(
-                            "違い|派生|区別|百科|アクセント|表記|品詞|用例|対義語"
-                            "注記|歴史仮名|区別|ルビ|見出|可能形|異字同訓"
-                        )
-                        if dic_name.endswith("大辞林"):
-                            if (
-                                current_name == "単位名"
-                                and "content" in current["data"]
-                            ):
-                                if isinstance(current["data"]["content"], str):
-                                    # (センチメートル)
-                                    current["data"]["content"] = current["data"][
-                                        "content"
-                                    ][1:-1]
-                            elif unwanted_tags.search(current_name):
-                                flag = False
-
-                        if dic_name.endswith("使い方の分かる 類語例解辞典"):
-                            if current_name != "意味":
-                                flag = False
-
-                        if dic_name.endswith("三省堂国語辞典"):
-                            """
-                                {
-                                  "tag": "span",
-                                  "data": {
-                                    "name": "参照語義番号"
-                                  },
-                                  "content": {
-                                    "tag": "span",
-                                    "data": {
-                                      "name": "語義番号"
-                                    },
-                                    "content": "①"
-                                  }
-                                }
-                            """
-                            """
-                                {
-                                    "tag": "span",
-                                    "data": {
-                                        "name": "参照語義番号"
-                                    },
-                                    "content": {
-                                        "tag": "span",
-                                        "style": {
-                                            "verticalAlign": "text-bottom",
-                                            "marginRight": 0.25
-                                        },
-                                        "content": {
-                                            "tag": "img",
-                                            "height": 1.0,
-                                            "width": 1.0,
-                                            "sizeUnits": "em",
-                                            "appearance": "auto",
-                                            "title": "二",
-                                            "collapsible": false,
-                                            "collapsed": false,
-                                            "background": false,
-                                            "path": "sankoku8/二-bluefill.svg"
-                                        }
-                                    }
-                                }   
-                            """
-                            """
-                                "tag": "div",
-                                "data": {
-                                    "name": "大語義"
-                                },
-                                "content": [
-                                    {
-                                        "tag": "span",
-                                        "style": {
-                                            "verticalAlign": "text-bottom",
-                                            "marginRight": 0.25
-                                        },
-                                        "content": {
-                                            "tag": "img",
-                                            "height": 1.0,
-                                            "width": 1.0,
-                                            "sizeUnits": "em",
-                                            "appearance": "monochrome",
-                                            "title": "二",
-                                            "collapsible": false,
-                                            "collapsed": false,
-                                            "background": false,
-                                            "path": "sankoku8/二-fill.svg"
-                                        }
-                                    }
-                                ]
-                            """
-                            # print(current_name)
-                            if unwanted_tags.search(current_name):
-                                # Pretty sure 三省堂国語辞典 doesn't have this but 大辞林 does.
-                                flag = False
-
-                            elif "参照語義番号" in current_name:
-                                if "content" in content:
-                                    if isinstance(content["content"], str):
-                                        reference_number = re.fullmatch(
-                                            rf"{NUMBER_CHARS}", content["content"]
-                                        )
-                                        if reference_number:
-                                            content["content"] = (
-                                                f'〚{REFERENCE_NUMBER_MAP[content["content"]]}〛'
-                                            )
-                                        current["content"] = content
-
-                        if dic_name.endswith("大辞泉"):
-                            if unwanted_tags.search(current_name):
-                                flag = False
-                        # 実用日本語表現辞典 doesn't seem to have any names other than "definition",
-                        # but I put this here just in case.
-                        if dic_name.endswith("実用日本語表現辞典"):
-                            if current_name != "definition":
-                                flag = False
-
-                if dic_name.endswith("事故・ことわざ・慣用句オンライン"):
-                    if "tag" in current:
-                        tag = current["tag"]
+                data = current.get("data") if self._name_action is not None else None
+                if data is not None and "name" in data:
+                    action = self.name_action(data["name"])
+                    if action == _SKIP:
+                        continue
+                    if action == _UNIT_NAME:
+                        if "content" in data and isinstance(data["content"], str):
+                            # (センチメートル)
+                            data["content"] = data["content"][1:-1]
+                    elif action == _REFERENCE_NUMBER_NODE:
                         """
-                           Span example:
-                          {
-                            "tag": "span",
-                            "content": "しのしょうにん【死の商人】"
-                          },
-                          Tables are are just the 異形s summarized in table form.
+                        {
+                          "tag": "span",
+                          "data": {"name": "参照語義番号"},
+                          "content": {"tag": "span", "data": {"name": "語義番号"}, "content": "①"}
+                        }
                         """
-                        if tag in ["span", "table"]:
-                            flag = False
-
-                if dic_name.endswith("大辞林"):
-                    if "title" in current:
-                        title = current["title"]
-                        if title in KANSUUJI:
-                            content = f"{KANSUUJI.index(title) + 1}️⃣"
-
-                if dic_name.endswith("三省堂国語辞典"):
+                        if "content" in content:
+                            if isinstance(content["content"], str):
+                                if _REFERENCE_NUMBER_CONTENT.fullmatch(content["content"]):
+                                    content["content"] = (
+                                        f'〚{REFERENCE_NUMBER_MAP[content["content"]]}〛'
+                                    )
+                                current["content"] = content
+
+                if self.skipped_tags and "tag" in current and current["tag"] in self.skipped_tags:
+                    continue
+
+                if self.kansuuji_titles and "title" in current:
                     """
-                        "content": {
-                            "tag": "img",
-                            "height": 1.0,
-                            "width": 1.0,
-                            "sizeUnits": "em",
-                            "appearance": "monochrome",
-                            "title": "二",
-                            "collapsible": false,
-                            "collapsed": false,
-                            "background": false,
-                            "path": "sankoku8/二-fill.svg"
-                        }                        
+                    "content": {
+                        "tag": "img",
+                        "title": "二",
+                        "path": "sankoku8/二-fill.svg",
+                        ...
+                    }
                     """
-                    if "title" in current:
-                        title = current["title"]
-                        if title in KANSUUJI:
-                            content = f"{KANSUUJI.index(title) + 1}️⃣"
-                if flag:
-                    if content:
-                        stack.append(content)
+                    title = current["title"]
+                    if title in KANSUUJI:
+                        content = f"{KANSUUJI.index(title) + 1}️⃣"
+
+                if content:
+                    stack.append(content)
             else:
                 print(
-                    f"Unexpected type encountered in dictionary '{dic_name}': {type(current)}"
+                    f"Unexpected type encountered in dictionary '{self.dic_name}': {type(current)}"
                 )  # Logging unexpected types
         return "".join(result)
 
-    my_text = get_non_recursive(definition_data)
+
+STRUCTURED_CONTENT_WALKERS = {
+    "大辞林": dict(name_action=_daijirin_name_action, kansuuji_titles=True),
+    "三省堂国語辞典": dict(name_action=_sanseido_name_action, kansuuji_titles=True),
+    "大辞泉": dict(name_action=_daijisen_name_action),
+    # These two are essentially the same thing.
+    "使い方の分かる 類語例解辞典": dict(
+        name_action=lambda name: _KEEP if name == "意味" else _SKIP,
+        skip_reading_pairs=True,
+    ),
+    # 実用日本語表現辞典 doesn't seem to have any names other than "definition",
+    # but I put this here just in case.
+    "実用日本語表現辞典": dict(
+        name_action=lambda name: _KEEP if name == "definition" else _SKIP,
+        skip_reading_pairs=True,
+    ),
+    # Spans are the title, like "しのしょうにん【死の商人】".
+    # Tables are are just the 異形s summarized in table form.
+    "事故・ことわざ・慣用句オンライン": dict(skipped_tags=("span", "table")),
+}
+
+
+@lru_cache(maxsize=None)
+def get_structured_content_walker(dic_name):
+    """Returns the structured content walker for the dictionary whose name dic_name ends with."""
+    for name, options in STRUCTURED_CONTENT_WALKERS.items():
+        if dic_name.endswith(name):
+            return StructuredContentWalker(dic_name, **options)
+    return StructuredContentWalker(dic_name)
+
+
+def get_text_only_from_dictionary(
+    word: str, reading: str, definition_data: list, dic_name: str
+) -> str:
+    """
+    Extracts the main definition text from the raw data.
+
+    Args:
+    - definition_data (list): List of strings and possibly other data types containing the definition.
+    - dic_name (str): Name of the dictionary being processed.
+
+    Returns:
+    - str: Cleaned and simplified definition text.
+    """
+    my_text = get_structured_content_walker(dic_name).walk(definition_data, reading)
 
     return clean_definition(word, reading, my_text, dic_name)
 
@@ -1448,7 +1818,16 @@ def get_text_only_from_dictionary(
 #         )
 
 
-def load_big_data(big_data_dictionary, override=False):
+def load_big_data(big_data_dictionary, override=False, jobs=1, use_cache=True):
+    """
+    Loads big_data.json, or builds it from the dictionary folders.
+
+    Args:
+    - big_data_dictionary (dict): The dictionary to build into.
+    - override (bool): Rebuild even if big_data.json already exists.
+    - jobs (int): Number of worker processes used for the build. 1 builds serially.
+    - use_cache (bool): Only reprocess the term banks that changed since the last build.
+    """
     if not override:
         if os.path.exists("big_data.json"):
             with open("big_data.json", "r", encoding="utf-8") as f:
@@ -1464,9 +1843,7 @@ def load_big_data(big_data_dictionary, override=False):
             sys.exit()
 
     print("Making big_data")
-    for dictionary_path in PRIORITY_ORDER:
-        print(f"Loading {dictionary_path}")
-        add_dictionary_to_big_data(dictionary_path, big_data_dictionary)
+    build_big_data(PRIORITY_ORDER, big_data_dictionary, jobs=jobs, use_cache=use_cache)
 
     # Write the final big_data to a JSON file
     save_to_big_data(big_data_dictionary)
@@ -1477,9 +1854,57 @@ def save_to_big_data(big_data_dictionary):
     with open(BIG_DATA_FILE, "w", encoding="utf-8") as f:
         json.dump(big_data_dictionary, f, ensure_ascii=False, indent=2)
     with open("word_to_readings_map.json", "w", encoding="utf-8") as f:
-        json.dump(word_to_readings_map, f, ensure_ascii=False, indent=2)
+        json.dump(word_to_readings_map, f, ensure_ascii=False, separators=(",", ":"))
+    with open(SENSE_TREES_FILE, "w", encoding="utf-8") as f:
+        json.dump(sense_trees, f, ensure_ascii=False, separators=(",", ":"))
+    save_lookup_indexes(build_lookup_indexes(big_data_dictionary, word_to_readings_map))
     print("Saved to big data")
 
 
+def file_version(path):
+    """Size and modification time of a file, to tell whether it changed."""
+    if not os.path.exists(path):
+        return "missing"
+    stat = os.stat(path)
+    return f"{stat.st_size}:{stat.st_mtime_ns}"
+
+
+def load_sense_trees():
+    """Loads the sense trees saved with big_data. Empty if big_data was built before they existed."""
+    if not os.path.exists(SENSE_TREES_FILE):
+        return {}
+    with open(SENSE_TREES_FILE, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
 if __name__ == "__main__":
-    big_data_dictionary = load_big_data(big_data_dictionary, override=True)
+    parser = argparse.ArgumentParser(
+        description="Build big_data.json from the dictionaries in PRIORITY_ORDER."
+    )
+    parser.add_argument(
+        "-j", "--jobs", type=int, default=1,
+        help="Number of processes used to process the term banks (0 = one per CPU core)",
+    )
+    parser.add_argument(
+        "--full", action="store_true",
+        help=f"Reprocess every term bank instead of reusing the ones cached in {BUILD_CACHE_FOLDER}",
+    )
+    parser.add_argument(
+        "--sqlite", action="store_true",
+        help=f"Also write the SQLite definition store ({DEFINITION_STORE_FILE}) used by convert_decks.py",
+    )
+    parser.add_argument(
+        "--similarity-index", action="store_true",
+        help=f"Also precompute the character bitsets of every reading ({SIMILARITY_INDEX_FILE})",
+    )
+    args = parser.parse_args()
+
+    jobs = args.jobs if args.jobs > 0 else os.cpu_count()
+    big_data_dictionary = load_big_data(
+        big_data_dictionary, override=True, jobs=jobs, use_cache=not args.full
+    )
+
+    if args.sqlite:
+        save_to_definition_store(big_data_dictionary, word_to_readings_map, sense_trees=sense_trees)
+    if args.similarity_index:
+        save_similarity_index(big_data_dictionary, file_version(BIG_DATA_FILE))
@@ -0,0 +1,92 @@
+"""
+Per-deck manifest of the HTML every note of the deck was converted to.
+
+A note is identified by a hash of its vocab, reading and original definition fields.
+Converting a re-exported deck again only looks up the notes that were added or edited since,
+every other note reuses the HTML it got last time.
+The manifest is tied to a version string (see result_cache_version), after big_data is rebuilt,
+PRIORITY_ORDER changes or the rendering changes, every note is converted again.
+"""
+
+import hashlib
+import sqlite3
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS notes (
+    key TEXT PRIMARY KEY,
+    html TEXT NOT NULL
+) WITHOUT ROWID;
+CREATE TEMP TABLE seen (
+    key TEXT PRIMARY KEY
+) WITHOUT ROWID;
+"""
+
+
+def note_key(vocab, reading, definition):
+    """Short, stable key of a note's fields."""
+    text = "\x1f".join((vocab, reading, definition))
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).hexdigest()
+
+
+class DeckManifest:
+    """
+    SQLite file of note key -> definition HTML, for one deck.
+    An empty string means the note was looked up and nothing was found.
+
+    Only the notes that are new or edited are written. Everything is committed by save(),
+    once the deck is converted, which also drops the notes that aren't in the deck anymore.
+    Until then the manifest of the last conversion stays as it was.
+    """
+
+    def __init__(self, path, version="", reuse=True):
+        self.path = path
+        self.version = version
+        self.reused = 0
+        self.converted = 0
+
+        self._connection = sqlite3.connect(path)
+        self._connection.executescript(SCHEMA)
+
+        row = self._connection.execute("SELECT value FROM meta WHERE key = 'version'").fetchone()
+        if not reuse or row is None or row[0] != version:
+            if reuse and row is not None:
+                print(f"Dictionary data or rendering changed, converting every note in {path} again")
+            self._connection.execute("DELETE FROM notes")
+            self._connection.execute(
+                "INSERT OR REPLACE INTO meta (key, value) VALUES ('version', ?)", (version,)
+            )
+
+    def get(self, key):
+        """Returns the HTML the note got last time ("" if nothing was found), or None if it's new or edited."""
+        row = self._connection.execute("SELECT html FROM notes WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        self._connection.execute("INSERT OR IGNORE INTO seen (key) VALUES (?)", (key,))
+        self.reused += 1
+        return row[0]
+
+    def put(self, key, html):
+        """Records the HTML of a new or edited note."""
+        self._connection.execute(
+            "INSERT OR REPLACE INTO notes (key, html) VALUES (?, ?)", (key, html or "")
+        )
+        self._connection.execute("INSERT OR IGNORE INTO seen (key) VALUES (?)", (key,))
+        self.converted += 1
+
+    def save(self):
+        self._connection.execute("DELETE FROM notes WHERE key NOT IN (SELECT key FROM seen)")
+        self._connection.commit()
+
+    def close(self):
+        # Without save(), the changes are rolled back
+        self._connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
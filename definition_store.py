@@ -0,0 +1,311 @@
+"""
+SQLite-backed alternative to big_data.json.
+
+Keeps the same {dictionary: {reading: {word: [definitions]}}} layout,
+but in an indexed database file, so nothing has to be loaded up front.
+Only the readings that are actually looked up are read from disk.
+
+Build it from an existing big_data.json with:
+    python definition_store.py
+"""
+
+import json
+import os
+import sqlite3
+import threading
+from collections.abc import Mapping
+from functools import lru_cache
+from pathlib import Path
+from types import MappingProxyType
+
+DEFINITION_STORE_FILE = "big_data.sqlite3"
+
+SCHEMA = """
+CREATE TABLE dictionaries (
+    position INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE
+);
+CREATE TABLE entries (
+    dictionary TEXT NOT NULL,
+    reading TEXT NOT NULL,
+    word TEXT NOT NULL,
+    definitions TEXT NOT NULL
+);
+CREATE TABLE word_readings (
+    word TEXT PRIMARY KEY,
+    readings TEXT NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE sense_trees (
+    fingerprint TEXT PRIMARY KEY,
+    tree TEXT NOT NULL
+) WITHOUT ROWID;
+"""
+
+
+def save_to_definition_store(
+    big_data, word_to_readings_map, path=DEFINITION_STORE_FILE, sense_trees=None
+):
+    """
+    Writes big_data and word_to_readings_map to a definition store file.
+
+    The store is written to a temporary file first and then moved into place,
+    so a reader never sees a half written store.
+
+    Args:
+    - big_data (dict): {dictionary: {reading: {word: [definitions]}}}
+    - word_to_readings_map (dict): {word: [readings]}
+    - path (str): Where to write the store.
+    - sense_trees (dict): {fingerprint: sense tree}, see build_sense_tree.
+    """
+    temp_path = f"{path}.tmp"
+    if os.path.exists(temp_path):
+        os.remove(temp_path)
+
+    connection = sqlite3.connect(temp_path)
+    try:
+        connection.execute("PRAGMA journal_mode = OFF")
+        connection.execute("PRAGMA synchronous = OFF")
+        connection.executescript(SCHEMA)
+
+        connection.executemany(
+            "INSERT INTO dictionaries (position, name) VALUES (?, ?)",
+            enumerate(big_data.keys()),
+        )
+        connection.executemany(
+            "INSERT INTO entries (dictionary, reading, word, definitions) VALUES (?, ?, ?, ?)",
+            (
+                (dictionary, reading, word, json.dumps(definitions, ensure_ascii=False))
+                for dictionary, readings in big_data.items()
+                for reading, words in readings.items()
+                for word, definitions in words.items()
+            ),
+        )
+        # Built after the inserts, it's a lot faster than keeping it up to date row by row.
+        # rowid keeps the order the words were added in, same as in big_data.json.
+        connection.execute(
+            "CREATE UNIQUE INDEX entries_lookup ON entries (dictionary, reading, word)"
+        )
+        connection.executemany(
+            "INSERT INTO word_readings (word, readings) VALUES (?, ?)",
+            (
+                (word, json.dumps(readings, ensure_ascii=False))
+                for word, readings in word_to_readings_map.items()
+            ),
+        )
+        connection.executemany(
+            "INSERT INTO sense_trees (fingerprint, tree) VALUES (?, ?)",
+            (
+                (fingerprint, json.dumps(tree, ensure_ascii=False, separators=(",", ":")))
+                for fingerprint, tree in (sense_trees or {}).items()
+            ),
+        )
+        connection.commit()
+    finally:
+        connection.close()
+
+    os.replace(temp_path, path)
+    print(f"Saved definition store to {path}")
+
+
+class DefinitionStore(Mapping):
+    """
+    Read-only, mapping-like view over a definition store file.
+
+    store[dictionary][reading][word] works the same as it does on big_data,
+    so it can be passed to get_definitions, entries_with_reading and link_up as is.
+    Reading buckets are loaded lazily and the most recently used ones are kept in memory.
+    """
+
+    def __init__(self, path=DEFINITION_STORE_FILE, bucket_cache_size=8192):
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"No definition store at {path}")
+
+        self.path = path
+        stat = os.stat(path)
+        # Changes whenever the store is rebuilt, used to tell cached lookups apart
+        self.version = f"{Path(path).absolute()}:{stat.st_size}:{stat.st_mtime_ns}"
+        self._uri = Path(path).absolute().as_uri() + "?mode=ro"
+        self._local = threading.local()
+
+        self._load_bucket = lru_cache(maxsize=bucket_cache_size)(self._query_bucket)
+        self._load_readings = lru_cache(maxsize=bucket_cache_size)(self._query_readings)
+        self._load_sense_tree = lru_cache(maxsize=bucket_cache_size)(self._query_sense_tree)
+
+        self.dictionaries = [
+            name
+            for (name,) in self._connection().execute(
+                "SELECT name FROM dictionaries ORDER BY position"
+            )
+        ]
+        self._views = {
+            dictionary: DictionaryView(self, dictionary) for dictionary in self.dictionaries
+        }
+        self.word_to_readings_map = WordReadingsView(self)
+        # Stores written before sense trees existed don't have the table.
+        self.has_sense_trees = self._connection().execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'sense_trees'"
+        ).fetchone() is not None
+        self.sense_trees = SenseTreesView(self)
+
+    def _connection(self):
+        """One connection per thread and per process, since sqlite3 connections can't be shared."""
+        connection = getattr(self._local, "connection", None)
+        if connection is None or self._local.pid != os.getpid():
+            connection = sqlite3.connect(self._uri, uri=True, check_same_thread=False)
+            connection.execute("PRAGMA query_only = 1")
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return connection
+
+    def _query_bucket(self, dictionary, reading):
+        rows = self._connection().execute(
+            "SELECT word, definitions FROM entries"
+            " WHERE dictionary = ? AND reading = ? ORDER BY rowid",
+            (dictionary, reading),
+        ).fetchall()
+        if not rows:
+            return None
+        return MappingProxyType({word: json.loads(definitions) for word, definitions in rows})
+
+    def _query_readings(self, word):
+        row = self._connection().execute(
+            "SELECT readings FROM word_readings WHERE word = ?", (word,)
+        ).fetchone()
+        return tuple(json.loads(row[0])) if row else None
+
+    def _query_sense_tree(self, fingerprint):
+        if not self.has_sense_trees:
+            return None
+        row = self._connection().execute(
+            "SELECT tree FROM sense_trees WHERE fingerprint = ?", (fingerprint,)
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def lookup(self, dictionary, reading, word):
+        """Returns the definitions of word【reading】 in a dictionary, or None."""
+        bucket = self.lookup_reading(dictionary, reading)
+        if bucket is None:
+            return None
+        return bucket.get(word)
+
+    def lookup_reading(self, dictionary, reading):
+        """Returns a read-only {word: [definitions]} for a reading in a dictionary, or None."""
+        return self._load_bucket(dictionary, reading)
+
+    def __getitem__(self, dictionary):
+        return self._views[dictionary]
+
+    def __contains__(self, dictionary):
+        return dictionary in self._views
+
+    def __iter__(self):
+        return iter(self.dictionaries)
+
+    def __len__(self):
+        return len(self.dictionaries)
+
+    def __getstate__(self):
+        # Connections and caches can't be pickled, reopen the file instead.
+        return {"path": self.path}
+
+    def __setstate__(self, state):
+        self.__init__(state["path"])
+
+
+class DictionaryView(Mapping):
+    """store[dictionary], a {reading: {word: [definitions]}} mapping."""
+
+    def __init__(self, store, dictionary):
+        self._store = store
+        self.dictionary = dictionary
+
+    def __getitem__(self, reading):
+        bucket = self._store.lookup_reading(self.dictionary, reading)
+        if bucket is None:
+            raise KeyError(reading)
+        return bucket
+
+    def __contains__(self, reading):
+        return self._store.lookup_reading(self.dictionary, reading) is not None
+
+    def __iter__(self):
+        rows = self._store._connection().execute(
+            "SELECT DISTINCT reading FROM entries WHERE dictionary = ?", (self.dictionary,)
+        )
+        return (reading for (reading,) in rows)
+
+    def __len__(self):
+        return self._store._connection().execute(
+            "SELECT COUNT(DISTINCT reading) FROM entries WHERE dictionary = ?",
+            (self.dictionary,),
+        ).fetchone()[0]
+
+
+class WordReadingsView(Mapping):
+    """Drop-in for word_to_readings_map, backed by the store's word_readings table."""
+
+    def __init__(self, store):
+        self._store = store
+
+    def __getitem__(self, word):
+        readings = self._store._load_readings(word)
+        if readings is None:
+            raise KeyError(word)
+        return readings
+
+    def __contains__(self, word):
+        return self._store._load_readings(word) is not None
+
+    def __iter__(self):
+        rows = self._store._connection().execute("SELECT word FROM word_readings")
+        return (word for (word,) in rows)
+
+    def __len__(self):
+        return self._store._connection().execute(
+            "SELECT COUNT(*) FROM word_readings"
+        ).fetchone()[0]
+
+
+class SenseTreesView(Mapping):
+    """{fingerprint: sense tree}, backed by the store's sense_trees table."""
+
+    def __init__(self, store):
+        self._store = store
+
+    def __getitem__(self, fingerprint):
+        sense_tree = self._store._load_sense_tree(fingerprint)
+        if sense_tree is None:
+            raise KeyError(fingerprint)
+        return sense_tree
+
+    def __contains__(self, fingerprint):
+        return self._store._load_sense_tree(fingerprint) is not None
+
+    def __iter__(self):
+        if not self._store.has_sense_trees:
+            return iter(())
+        rows = self._store._connection().execute("SELECT fingerprint FROM sense_trees")
+        return (fingerprint for (fingerprint,) in rows)
+
+    def __bool__(self):
+        # Without this, `if sense_trees` would count the whole table
+        return self._store.has_sense_trees
+
+    def __len__(self):
+        if not self._store.has_sense_trees:
+            return 0
+        return self._store._connection().execute(
+            "SELECT COUNT(*) FROM sense_trees"
+        ).fetchone()[0]
+
+
+if __name__ == "__main__":
+    from convert_to_big_data import BIG_DATA_FILE, load_sense_trees
+
+    print(f"Reading {BIG_DATA_FILE}")
+    with open(BIG_DATA_FILE, "r", encoding="utf-8") as f:
+        big_data = json.load(f)
+    with open("word_to_readings_map.json", "r", encoding="utf-8") as f:
+        word_to_readings_map = json.load(f)
+
+    save_to_definition_store(big_data, word_to_readings_map, sense_trees=load_sense_trees())
@@ -0,0 +1,274 @@
+"""
+Table-driven deinflection of Japanese verbs and adjectives,
+along the lines of Yomitan's deinflection rules.
+
+deinflect("食べさせられました") gives 食べさせられる, 食べさせる, 食べる... together with
+the rules that led to them. The rules are indexed by the suffix they remove,
+so each candidate only looks at the handful of rules that can apply to it.
+"""
+
+import re
+from collections import namedtuple
+
+# What kind of word a form is. A rule only applies to forms of the kinds in its rules_in,
+# and the form it produces is of the kinds in its rules_out.
+V1 = 1  # 一段動詞
+V5 = 2  # 五段動詞
+VS = 4  # する
+VK = 8  # 来る
+VZ = 16  # 〜ずる
+ADJ_I = 32  # 形容詞
+TE = 64  # て形 (before いる, しまう...)
+# rules_in of 0: the rule only applies to the word as it was given
+
+VERB = V1 | V5 | VS | VK | VZ
+
+Rule = namedtuple("Rule", ["reason", "kana_in", "kana_out", "rules_in", "rules_out", "reading_in", "reading_out"])
+Deinflection = namedtuple("Deinflection", ["term", "rules", "reasons", "chain"])
+
+# 五段 endings and their stems
+V5_ENDINGS = "うくぐすつぬぶむる"
+V5_A = dict(zip(V5_ENDINGS, "わかがさたなばまら"))
+V5_I = dict(zip(V5_ENDINGS, "いきぎしちにびみり"))
+V5_E = dict(zip(V5_ENDINGS, "えけげせてねべめれ"))
+V5_O = dict(zip(V5_ENDINGS, "おこごそとのぼもろ"))
+# The た/て forms of 五段 verbs: 書いた, 泳いだ, 話した, 買った, 死んだ...
+V5_TA = {
+    "う": "った", "く": "いた", "ぐ": "いだ", "す": "した", "つ": "った",
+    "ぬ": "んだ", "ぶ": "んだ", "む": "んだ", "る": "った",
+}
+
+RULES = []
+
+_KANA_ONLY = re.compile(r"[ぁ-ゖァ-ヺー]+")
+
+
+def _add(reason, kana_in, kana_out, rules_in, rules_out, reading_in=None, reading_out=None):
+    RULES.append(
+        Rule(
+            reason, kana_in, kana_out, rules_in, rules_out,
+            kana_in if reading_in is None else reading_in,
+            kana_out if reading_out is None else reading_out,
+        )
+    )
+
+
+def _add_verb_forms(reason, suffix, v5_stem, rules_in, v1="", vs="し", vk="き"):
+    """
+    Adds the rules for a form made of a verb stem + suffix.
+
+    Args:
+    - v5_stem (dict): Which stem 五段 verbs use (V5_A, V5_I...).
+    - v1, vs, vk: What comes before the suffix for 一段 verbs, する and 来る.
+    """
+    _add(reason, v1 + suffix, "る", rules_in, V1)
+    for ending in V5_ENDINGS:
+        _add(reason, v5_stem[ending] + suffix, ending, rules_in, V5)
+    if vs is not None:
+        _add(reason, vs + suffix, "する", rules_in, VS)
+    if vk is not None:
+        _add(reason, vk + suffix, "くる", rules_in, VK)
+        _add(reason, "来" + suffix, "来る", rules_in, VK, vk + suffix, "くる")
+
+
+def _add_ta_forms(reason, ta, da, rules_in):
+    """Adds the rules for forms built on た/て (ta, da are た/だ, て/で, たら/だら...)."""
+    _add(reason, ta, "る", rules_in, V1)
+    for ending, past in V5_TA.items():
+        past = past[:-1] + (da if past.endswith("だ") else ta)
+        _add(reason, past, ending, rules_in, V5)
+    # 行く is the one 五段 verb that doesn't follow the pattern
+    _add(reason, "いっ" + ta, "いく", rules_in, V5)
+    _add(reason, "行っ" + ta, "行く", rules_in, V5, "いっ" + ta, "いく")
+    _add(reason, "し" + ta, "する", rules_in, VS)
+    _add(reason, "き" + ta, "くる", rules_in, VK)
+    _add(reason, "来" + ta, "来る", rules_in, VK, "き" + ta, "くる")
+    _add(reason, "じ" + ta, "ずる", rules_in, VZ)
+
+
+# Past, て form and the forms built on them
+_add_ta_forms("past", "た", "だ", 0)
+_add_ta_forms("-te", "て", "で", TE)
+_add_ta_forms("-tara", "たら", "だら", 0)
+_add_ta_forms("-tari", "たり", "だり", 0)
+_add("past", "かった", "い", 0, ADJ_I)
+_add("-te", "くて", "い", 0, ADJ_I)
+_add("-tara", "かったら", "い", 0, ADJ_I)
+_add("-tari", "かったり", "い", 0, ADJ_I)
+
+# 〜ている, 〜てしまう... They turn back into the て form
+for auxiliary, kind in (("いる", V1), ("る", V1), ("おく", V5), ("しまう", V5), ("ある", V5), ("いく", V5), ("くる", VK)):
+    _add(f"-te {auxiliary}", "て" + auxiliary, "て", kind, TE)
+    _add(f"-te {auxiliary}", "で" + auxiliary, "で", kind, TE)
+_add("-chau", "ちゃう", "て", V5, TE)
+_add("-chau", "じゃう", "で", V5, TE)
+_add("-toku", "とく", "て", V5, TE)
+_add("-toku", "どく", "で", V5, TE)
+
+# Polite
+for suffix in ("ます", "ました", "ません", "ませんでした", "ましょう", "まして", "なさい"):
+    _add_verb_forms("polite", suffix, V5_I, 0)
+
+# Negative
+_add_verb_forms("negative", "ない", V5_A, ADJ_I, vk="こ")
+_add_verb_forms("-zu", "ず", V5_A, 0, vs="せ", vk="こ")
+_add_verb_forms("-zu", "ずに", V5_A, 0, vs="せ", vk="こ")
+_add_verb_forms("-nu", "ぬ", V5_A, 0, vs="せ", vk="こ")
+_add("negative", "くない", "い", ADJ_I, ADJ_I)
+
+# Want to
+_add_verb_forms("-tai", "たい", V5_I, ADJ_I)
+# Too much
+_add_verb_forms("-sugiru", "すぎる", V5_I, V1)
+_add("-sugiru", "すぎる", "い", V1, ADJ_I)
+# While
+_add_verb_forms("-nagara", "ながら", V5_I, 0)
+
+# Passive, potential and causative. All of them are 一段 verbs themselves.
+_add_verb_forms("passive", "れる", V5_A, V1, v1="ら", vs="さ", vk="こら")
+_add_verb_forms("causative", "せる", V5_A, V1, v1="さ", vs="さ", vk="こさ")
+_add_verb_forms("causative", "す", V5_A, V5, v1="さ", vs="さ", vk="こさ")
+_add_verb_forms("potential", "る", V5_E, V1, v1="られ", vs=None, vk="こられ")
+_add("potential", "れる", "る", V1, V1)  # ら抜き言葉
+_add("potential", "できる", "する", V1, VS)
+
+# Volitional
+_add_verb_forms("volitional", "う", V5_O, 0, v1="よ", vs="しよ", vk="こよ")
+
+# Imperative
+_add("imperative", "ろ", "る", 0, V1)
+_add("imperative", "よ", "る", 0, V1)
+for ending in V5_ENDINGS:
+    _add("imperative", V5_E[ending], ending, 0, V5)
+_add("imperative", "しろ", "する", 0, VS)
+_add("imperative", "せよ", "する", 0, VS)
+_add("imperative", "こい", "くる", 0, VK)
+_add("imperative", "来い", "来る", 0, VK, "こい", "くる")
+
+# Conditional
+_add_verb_forms("-ba", "ば", V5_E, 0, v1="れ", vs="すれ", vk="くれ")
+_add("-ba", "ければ", "い", 0, ADJ_I)
+
+# Adjectives
+_add("adv", "く", "い", 0, ADJ_I)
+_add("noun", "さ", "い", 0, ADJ_I)
+_add("-sou", "そう", "い", 0, ADJ_I)
+_add_verb_forms("-sou", "そう", V5_I, 0)
+
+
+def _index_rules(rules):
+    """{suffix: [rules removing that suffix]}"""
+    index = {}
+    for rule in rules:
+        index.setdefault(rule.kana_in, []).append(rule)
+    return index
+
+
+RULES_BY_SUFFIX = _index_rules(RULES)
+SUFFIX_LENGTHS = sorted({len(suffix) for suffix in RULES_BY_SUFFIX}, reverse=True)
+
+
+def deinflect(term, max_candidates=64):
+    """
+    Returns every form term could have been inflected from, itself included,
+    shortest rule chains first.
+
+    Args:
+    - term (str): An inflected word, e.g. 食べられなかった.
+    - max_candidates (int): Stop after this many candidates.
+
+    Returns:
+    - list: [Deinflection(term, rules, reasons, chain)]. reasons are the names of the rules
+      from the dictionary form outwards, chain the (reading_in, reading_out) of each step.
+    """
+    results = [Deinflection(term, 0, (), ())]
+    seen = {(term, 0)}
+
+    i = 0
+    while i < len(results) and len(results) < max_candidates:
+        current = results[i]
+        i += 1
+        for length in SUFFIX_LENGTHS:
+            if length > len(current.term):
+                continue
+            for rule in RULES_BY_SUFFIX.get(current.term[-length:], ()):
+                if current.rules and not current.rules & rule.rules_in:
+                    continue
+
+                new_term = current.term[:-length] + rule.kana_out
+                key = (new_term, rule.rules_out)
+                if key in seen:
+                    continue
+                seen.add(key)
+                results.append(
+                    Deinflection(
+                        new_term,
+                        rule.rules_out,
+                        (rule.reason,) + current.reasons,
+                        current.chain + ((rule.reading_in, rule.reading_out),),
+                    )
+                )
+    return results
+
+
+def deinflect_reading(reading, chain):
+    """Applies the steps of a Deinflection's chain to the word's reading. None if they don't fit."""
+    for reading_in, reading_out in chain:
+        if not reading.endswith(reading_in):
+            return None
+        reading = reading[: -len(reading_in)] + reading_out
+    return reading
+
+
+def is_listed(term, reading, word_to_readings_map):
+    """
+    Whether a dictionary form candidate is a word the dictionaries have, with that reading.
+
+    Rules apply to the kana at the end of the word, so one can turn a kanji that's read differently
+    into the wrong kind of verb: 来た -> 来る【きる】, 行った -> 行る【いる】.
+    Kana-only candidates are always kept, they're looked up by their reading.
+    """
+    if _KANA_ONLY.fullmatch(term):
+        return True
+    readings = word_to_readings_map.get(term)
+    if not readings:
+        return False
+    return not reading or reading in readings
+
+
+def deinflect_with_reading(word, reading, word_to_readings_map=None):
+    """
+    Dictionary form candidates for a word and its reading.
+
+    Args:
+    - word (str): An inflected word, e.g. 食べられなかった.
+    - reading (str): Its reading, or "" if it isn't known.
+    - word_to_readings_map (dict): If given, candidates the dictionaries don't have
+      (with that reading) are left out, see is_listed.
+
+    Returns:
+    - list: [(word, reading, reasons)], without the word itself.
+    A candidate whose reading can't be worked out gets an empty reading if there was none to begin with,
+    and is left out otherwise.
+    """
+    candidates = []
+    seen = set()
+    for deinflection in deinflect(word)[1:]:
+        if deinflection.rules & TE:
+            # Only an intermediate step, not a dictionary form
+            continue
+        if reading:
+            candidate_reading = deinflect_reading(reading, deinflection.chain)
+            if candidate_reading is None:
+                continue
+        else:
+            candidate_reading = ""
+        if (deinflection.term, candidate_reading) in seen:
+            continue
+        seen.add((deinflection.term, candidate_reading))
+        if word_to_readings_map is not None and not is_listed(
+            deinflection.term, candidate_reading, word_to_readings_map
+        ):
+            continue
+        candidates.append((deinflection.term, candidate_reading, deinflection.reasons))
+    return candidates
@@ -0,0 +1,157 @@
+"""
+Kana normalization with translation tables that are built once.
+
+Every function has a scalar form that takes a string,
+and a column form that takes a pandas Series (or anything with a .str accessor)
+and runs on the whole column at once. Given a plain list or array, the column form
+applies the scalar form to every item and returns a list.
+
+- to_hiragana: カタカナ -> かたかな (what scraper.convert_word_to_hiragana did)
+- hiragana_only: Only the hiragana of a reading (what scraper.get_hiragana_only did)
+- fold_width: ｶﾀｶﾅ -> カタカナ, ＡＢＣ１２３ -> ABC123
+- fold_small_kana: ぁ -> あ, ッ -> ツ
+- expand_long_vowels: らーめん -> らあめん, ラーメン -> ラアメン
+- normalize_kana: Katakana to hiragana, ぢ/づ to じ/ず. What the lookup indexes fold together.
+"""
+
+import re
+import unicodedata
+
+# ァ to ヵ. ヶ is left alone, it's usually read か/が/こ rather than け.
+KATAKANA_TO_HIRAGANA = str.maketrans({chr(k): chr(k - 96) for k in range(12449, 12534)})
+
+NORMALIZE_KANA = str.maketrans(
+    {
+        **{chr(k): chr(k - 96) for k in range(ord("ァ"), ord("ヶ") + 1)},
+        "ぢ": "じ",
+        "づ": "ず",
+        "ヂ": "じ",
+        "ヅ": "ず",
+    }
+)
+
+# Ａ to ～ and the ideographic space
+FULL_WIDTH_TO_ASCII = str.maketrans(
+    {**{chr(k): chr(k - 0xFEE0) for k in range(0xFF01, 0xFF5F)}, "　": " "}
+)
+
+SMALL_KANA = str.maketrans(
+    dict(zip("ぁぃぅぇぉっゃゅょゎゕゖァィゥェォッャュョヮヵヶ", "あいうえおつやゆよわかけアイウエオツヤユヨワカケ"))
+)
+
+# The vowel every kana ends with, for the ー after it
+_VOWEL_ROWS = {
+    "あ": "あかさたなはまやらわがざだばぱぁゃゎゕ",
+    "い": "いきしちにひみりゐぎじぢびぴぃ",
+    "う": "うくすつぬふむゆるぐずづぶぷぅゅゔっ",
+    "え": "えけせてねへめれゑげぜでべぺぇゖ",
+    "お": "おこそとのほもよろをごぞどぼぽぉょ",
+}
+HIRAGANA_TO_KATAKANA = str.maketrans({chr(k - 96): chr(k) for k in range(12449, 12535)})
+LONG_VOWELS = {
+    **{kana: vowel for vowel, row in _VOWEL_ROWS.items() for kana in row},
+    **{
+        kana: vowel.translate(HIRAGANA_TO_KATAKANA)
+        for vowel, row in _VOWEL_ROWS.items()
+        for kana in row.translate(HIRAGANA_TO_KATAKANA)
+    },
+}
+
+_HALF_WIDTH_KATAKANA = re.compile(r"[｡-ﾟ]+")
+_LONG_VOWEL = re.compile(r"(?<=(.))ー")
+# [かな/カナ] alternatives, only the second one is kept
+_READING_ALTERNATIVES = re.compile(r"\[(?:[ぁ-ゔー]+)(?:/|／|・|\n| |<br ?\\?>)([ぁ-ゔ]+)\]")
+_NOT_HIRAGANA = re.compile(r"[^ぁ-ゔー]")
+
+
+def _is_column(values):
+    return hasattr(values, "str")
+
+
+def to_hiragana(text):
+    """カタカナ -> かたかな"""
+    return text.translate(KATAKANA_TO_HIRAGANA)
+
+
+def to_hiragana_column(values):
+    if _is_column(values):
+        return values.str.translate(KATAKANA_TO_HIRAGANA)
+    return [to_hiragana(text) for text in values]
+
+
+def hiragana_only(text):
+    """
+    Turns katakana into hiragana and drops everything that isn't hiragana or ー.
+    Of [reading/reading] alternatives, the second one is kept.
+    """
+    text = text.translate(KATAKANA_TO_HIRAGANA)
+    text = _READING_ALTERNATIVES.sub(r"\1", text)
+    return _NOT_HIRAGANA.sub("", text)
+
+
+def hiragana_only_column(values):
+    if _is_column(values):
+        return (
+            values.str.translate(KATAKANA_TO_HIRAGANA)
+            .str.replace(_READING_ALTERNATIVES, r"\1", regex=True)
+            .str.replace(_NOT_HIRAGANA, "", regex=True)
+        )
+    return [hiragana_only(text) for text in values]
+
+
+def _full_width_katakana(match):
+    # NFKC also joins ﾞ and ﾟ with the kana before them: ｶﾞ -> ガ
+    return unicodedata.normalize("NFKC", match.group())
+
+
+def fold_width(text):
+    """ｶﾀｶﾅ -> カタカナ, ＡＢＣ１２３ -> ABC123"""
+    text = text.translate(FULL_WIDTH_TO_ASCII)
+    return _HALF_WIDTH_KATAKANA.sub(_full_width_katakana, text)
+
+
+def fold_width_column(values):
+    if _is_column(values):
+        return values.str.translate(FULL_WIDTH_TO_ASCII).str.replace(
+            _HALF_WIDTH_KATAKANA, _full_width_katakana, regex=True
+        )
+    return [fold_width(text) for text in values]
+
+
+def fold_small_kana(text):
+    """ぁ -> あ, ッ -> ツ"""
+    return text.translate(SMALL_KANA)
+
+
+def fold_small_kana_column(values):
+    if _is_column(values):
+        return values.str.translate(SMALL_KANA)
+    return [fold_small_kana(text) for text in values]
+
+
+def _long_vowel(match):
+    return LONG_VOWELS.get(match.group(1), "ー")
+
+
+def expand_long_vowels(text):
+    """らーめん -> らあめん, ラーメン -> ラアメン. A ー that doesn't follow a kana is kept."""
+    if "ー" not in text:
+        return text
+    return _LONG_VOWEL.sub(_long_vowel, text)
+
+
+def expand_long_vowels_column(values):
+    if _is_column(values):
+        return values.str.replace(_LONG_VOWEL, _long_vowel, regex=True)
+    return [expand_long_vowels(text) for text in values]
+
+
+def normalize_kana(reading):
+    """ギリ -> ぎり, はなぢ -> はなじ, きづく -> きずく"""
+    return reading.translate(NORMALIZE_KANA)
+
+
+def normalize_kana_column(values):
+    if _is_column(values):
+        return values.str.translate(NORMALIZE_KANA)
+    return [normalize_kana(reading) for reading in values]
@@ -0,0 +1,215 @@
+"""
+The ⇒ references between dictionary entries, resolved ahead of time.
+
+For every definition in big_data with a ⇒ link, the build stage records
+- the entries it links to: (dictionary, reading, word, sense path) nodes
+- its expansion: the definition with the linked definitions added, as link_up renders it
+
+Expansions are keyed by the entry (dictionary, word, reading) and a fingerprint of the definition,
+so link_up at deck time is a single lookup for every entry the stage has seen,
+and only has to resolve links itself for anything else.
+Like link_up, an expansion only goes one link deep, so links that loop (A ⇒ B ⇒ A) can't recurse.
+
+Build it after big_data (and big_data.sqlite3, if you use it) with:
+    python link_graph.py
+Expansions depend on the link budget, pass the same --link-budget as to convert_decks.py.
+"""
+
+import argparse
+import json
+import os
+import sqlite3
+import threading
+from pathlib import Path
+
+from convert_to_big_data import definition_fingerprint
+
+LINK_GRAPH_FILE = "link_graph.sqlite3"
+
+SCHEMA = """
+CREATE TABLE meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE links (
+    dictionary TEXT NOT NULL,
+    reading TEXT NOT NULL,
+    word TEXT NOT NULL,
+    fingerprint TEXT NOT NULL,
+    target_reading TEXT NOT NULL,
+    target_word TEXT NOT NULL,
+    sense_path TEXT NOT NULL
+);
+CREATE TABLE expansions (
+    dictionary TEXT NOT NULL,
+    word TEXT NOT NULL,
+    reading TEXT NOT NULL,
+    fingerprint TEXT NOT NULL,
+    text TEXT NOT NULL,
+    PRIMARY KEY (dictionary, word, reading, fingerprint)
+) WITHOUT ROWID;
+"""
+
+
+def iter_linking_definitions(big_data):
+    """Yields (dictionary, reading, word, definition) for every definition with a ⇒ link."""
+    for dictionary, readings in big_data.items():
+        for reading, words in readings.items():
+            for word, definitions in words.items():
+                for definition in dict.fromkeys(definitions):
+                    if "⇒" in definition and definition != "⇒":
+                        yield dictionary, reading, word, definition
+
+
+def build_link_graph(
+    big_data, expand, data_version, link_budget, path=LINK_GRAPH_FILE, progress_every=10000
+):
+    """
+    Resolves and expands every ⇒ link in big_data and saves the graph.
+
+    Args:
+    - big_data (dict): {dictionary: {reading: {word: [definitions]}}}, or a DefinitionStore.
+    - expand (function): expand(word, reading, definition, dictionary, links) -> expanded definition.
+      It appends a (target_word, target_reading, sense_path) to links for every link it resolves.
+    - data_version (str): Identifies the data the graph is built from, see load_link_graph.
+    - link_budget (int): The character budget expand uses, None for no limit.
+    - path (str): Where to save the graph.
+    """
+    temp_path = f"{path}.tmp"
+    if os.path.exists(temp_path):
+        os.remove(temp_path)
+
+    connection = sqlite3.connect(temp_path)
+    try:
+        connection.execute("PRAGMA journal_mode = OFF")
+        connection.execute("PRAGMA synchronous = OFF")
+        connection.executescript(SCHEMA)
+        connection.execute("INSERT INTO meta (key, value) VALUES ('version', ?)", (data_version,))
+        connection.execute(
+            "INSERT INTO meta (key, value) VALUES ('link_budget', ?)", (json.dumps(link_budget),)
+        )
+
+        count = 0
+        for dictionary, reading, word, definition in iter_linking_definitions(big_data):
+            fingerprint = definition_fingerprint(definition)
+            links = []
+            text = expand(word, reading, definition, dictionary, links)
+            connection.execute(
+                "INSERT OR REPLACE INTO expansions (dictionary, word, reading, fingerprint, text)"
+                " VALUES (?, ?, ?, ?, ?)",
+                (dictionary, word, reading, fingerprint, text),
+            )
+            connection.executemany(
+                "INSERT INTO links"
+                " (dictionary, reading, word, fingerprint, target_reading, target_word, sense_path)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (
+                    (dictionary, reading, word, fingerprint, target_reading, target_word, sense_path)
+                    for target_word, target_reading, sense_path in links
+                ),
+            )
+            count += 1
+            if count % progress_every == 0:
+                print(f"Linked {count} definitions")
+
+        connection.execute("CREATE INDEX links_source ON links (dictionary, reading, word)")
+        connection.execute("CREATE INDEX links_target ON links (dictionary, target_reading, target_word)")
+        connection.commit()
+    finally:
+        connection.close()
+
+    os.replace(temp_path, path)
+    print(f"Saved the links of {count} definitions to {path}")
+
+
+class LinkGraph:
+    """Read-only view over a link graph file."""
+
+    def __init__(self, path=LINK_GRAPH_FILE):
+        self.path = path
+        self._uri = Path(path).absolute().as_uri() + "?mode=ro"
+        self._local = threading.local()
+        meta = dict(self._connection().execute("SELECT key, value FROM meta"))
+        self.version = meta.get("version")
+        # The budget the expansions were made with, link_up only uses them for the same budget
+        self.link_budget = json.loads(meta["link_budget"]) if "link_budget" in meta else None
+
+    def _connection(self):
+        """One connection per thread and per process, since sqlite3 connections can't be shared."""
+        connection = getattr(self._local, "connection", None)
+        if connection is None or self._local.pid != os.getpid():
+            connection = sqlite3.connect(self._uri, uri=True, check_same_thread=False)
+            connection.execute("PRAGMA query_only = 1")
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return connection
+
+    def expansion(self, dictionary, word, reading, definition):
+        """The expanded definition, or None if the graph doesn't have this entry's definition."""
+        row = self._connection().execute(
+            "SELECT text FROM expansions"
+            " WHERE dictionary = ? AND word = ? AND reading = ? AND fingerprint = ?",
+            (dictionary, word, reading, definition_fingerprint(definition)),
+        ).fetchone()
+        return row[0] if row else None
+
+    def links_from(self, dictionary, reading, word):
+        """[(target_reading, target_word, sense_path)] the entry's definitions link to."""
+        return self._connection().execute(
+            "SELECT DISTINCT target_reading, target_word, sense_path FROM links"
+            " WHERE dictionary = ? AND reading = ? AND word = ?",
+            (dictionary, reading, word),
+        ).fetchall()
+
+    def links_to(self, dictionary, reading, word):
+        """[(reading, word, sense_path)] of the entries linking to this one."""
+        return self._connection().execute(
+            "SELECT DISTINCT reading, word, sense_path FROM links"
+            " WHERE dictionary = ? AND target_reading = ? AND target_word = ?",
+            (dictionary, reading, word),
+        ).fetchall()
+
+    def __getstate__(self):
+        # Connections can't be pickled, reopen the file instead.
+        return {"path": self.path}
+
+    def __setstate__(self, state):
+        self.__init__(state["path"])
+
+
+def load_link_graph(data_version, path=LINK_GRAPH_FILE):
+    """Returns the LinkGraph, or None if there is none or it was built from other data."""
+    if not os.path.exists(path):
+        return None
+    graph = LinkGraph(path)
+    if graph.version != data_version:
+        print(f"{path} was built from other data, run `python link_graph.py` to update it")
+        return None
+    return graph
+
+
+if __name__ == "__main__":
+    import convert_decks
+
+    parser = argparse.ArgumentParser(description=f"Build {LINK_GRAPH_FILE} from big_data.")
+    parser.add_argument(
+        "--link-budget", type=int, default=convert_decks.LINK_EXPANSION_BUDGET,
+        help="How long a definition can get with the definitions it links to (0 = no limit)",
+    )
+    args = parser.parse_args()
+    link_budget = args.link_budget if args.link_budget > 0 else None
+
+    big_data, word_to_readings_map, convert_decks.sense_trees = convert_decks.load_dictionary_data(
+        link_budget
+    )
+
+    def expand(word, reading, definition, dictionary, links):
+        expanded, _ = convert_decks.expand_links(
+            word, reading, definition, dictionary, big_data, word_to_readings_map,
+            links=links, max_length=link_budget,
+        )
+        return expanded
+
+    build_link_graph(
+        big_data, expand, convert_decks.link_graph_version(big_data, link_budget), link_budget
+    )
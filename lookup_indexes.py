@@ -0,0 +1,125 @@
+"""
+Lookup indexes built alongside big_data.
+
+- word -> readings (the same as word_to_readings_map)
+- reading -> words, over every dictionary, so readings that don't exist are skipped without looking them up
+- normalized reading -> readings, where ず/づ, じ/ぢ and katakana/hiragana are folded together,
+  so the readings a reading could be spelled as are found without generating every version of it
+
+They're saved as compact JSON and loaded into frozen structures,
+so every lookup is a single dict access.
+The definition store reads readings from disk as they're needed, so they're only loaded along with big_data.json.
+"""
+
+import json
+import os
+from collections.abc import Mapping
+from types import MappingProxyType
+
+from kana import normalize_kana
+
+LOOKUP_INDEXES_FILE = "lookup_indexes.json"
+LOOKUP_INDEXES_VERSION = 3
+
+
+def build_lookup_indexes(big_data, word_to_readings_map):
+    """
+    Builds the indexes from big_data and word_to_readings_map.
+
+    Returns:
+    - dict: The indexes as plain lists, ready to be saved with save_lookup_indexes.
+    """
+    reading_words = {}
+    for readings in big_data.values():
+        for reading, words in readings.items():
+            reading_words.setdefault(reading, {}).update(dict.fromkeys(words))
+
+    normalized_readings = {}
+    for reading in reading_words:
+        normalized_readings.setdefault(normalize_kana(reading), []).append(reading)
+
+    return {
+        "version": LOOKUP_INDEXES_VERSION,
+        "word_readings": {word: list(readings) for word, readings in word_to_readings_map.items()},
+        "reading_words": {reading: list(words) for reading, words in reading_words.items()},
+        "normalized_readings": normalized_readings,
+    }
+
+
+def save_lookup_indexes(indexes, path=LOOKUP_INDEXES_FILE):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(indexes, f, ensure_ascii=False, separators=(",", ":"))
+    print(f"Saved lookup indexes to {path}")
+
+
+def load_lookup_indexes(path=LOOKUP_INDEXES_FILE):
+    """Returns the saved LookupIndexes, or None if there are none (or they're from an older version)."""
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        indexes = json.load(f)
+    if indexes.get("version") != LOOKUP_INDEXES_VERSION:
+        print(f"{path} is outdated, rebuild big_data to update it")
+        return None
+    return LookupIndexes(indexes)
+
+
+class LookupIndexes(Mapping):
+    """
+    Read-only indexes over big_data.
+
+    As a mapping it's {word: (readings)}, so it can be passed anywhere
+    word_to_readings_map is used.
+    """
+
+    def __init__(self, indexes):
+        self._word_readings = MappingProxyType(
+            {word: tuple(readings) for word, readings in indexes["word_readings"].items()}
+        )
+        self._reading_words = MappingProxyType(
+            {reading: tuple(words) for reading, words in indexes["reading_words"].items()}
+        )
+        self._normalized_readings = MappingProxyType(
+            {key: tuple(readings) for key, readings in indexes["normalized_readings"].items()}
+        )
+
+    def __getitem__(self, word):
+        return self._word_readings[word]
+
+    def __contains__(self, word):
+        return word in self._word_readings
+
+    def __iter__(self):
+        return iter(self._word_readings)
+
+    def __len__(self):
+        return len(self._word_readings)
+
+    def has_reading(self, reading):
+        """Whether any dictionary has an entry with this reading."""
+        return reading in self._reading_words
+
+    def words_with_reading(self, reading):
+        """Every word with this reading, over all dictionaries."""
+        return self._reading_words.get(reading, ())
+
+    def readings_like(self, reading):
+        """
+        The readings in big_data that only differ from this one by ず/づ, じ/ぢ or katakana,
+        the reading itself first if big_data has it.
+        """
+        readings = self._normalized_readings.get(normalize_kana(reading), ())
+        if reading in readings:
+            return (reading,) + tuple(other for other in readings if other != reading)
+        return readings
+
+    def __getstate__(self):
+        # MappingProxyType can't be pickled
+        return {
+            "word_readings": dict(self._word_readings),
+            "reading_words": dict(self._reading_words),
+            "normalized_readings": dict(self._normalized_readings),
+        }
+
+    def __setstate__(self, state):
+        self.__init__(state)
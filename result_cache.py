@@ -0,0 +1,103 @@
+"""
+Persistent cache of the final definition HTML of every (word, reading) a deck conversion looked up.
+
+Re-converting a deck (or another deck with the same words) reads the HTML back
+instead of looking everything up and linking it again.
+The cache is tied to a version string. Opening it with a different version,
+e.g. after big_data was rebuilt or PRIORITY_ORDER changed, empties it.
+"""
+
+import sqlite3
+import threading
+
+RESULT_CACHE_FILE = "lookup_cache.sqlite3"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS results (
+    word TEXT NOT NULL,
+    reading TEXT NOT NULL,
+    html TEXT NOT NULL,
+    PRIMARY KEY (word, reading)
+) WITHOUT ROWID;
+"""
+
+
+class ResultCache:
+    """
+    Key-value file of (word, reading) -> definition HTML.
+    An empty string means the word was looked up and nothing was found.
+
+    Writes are committed in batches and on close(); use it as a context manager.
+    One ResultCache can be shared by threads, its connection is only used by one at a time.
+    Open one per file rather than one per thread: a connection holds its write transaction
+    until the batch is committed, and any other connection writing meanwhile waits and fails.
+    """
+
+    def __init__(self, path=RESULT_CACHE_FILE, version="", commit_every=500):
+        self.path = path
+        self.version = version
+        self.commit_every = commit_every
+        self._pending = 0
+        self.hits = 0
+        self.misses = 0
+
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode = WAL")
+        self._connection.execute("PRAGMA synchronous = NORMAL")
+        self._connection.executescript(SCHEMA)
+
+        row = self._connection.execute("SELECT value FROM meta WHERE key = 'version'").fetchone()
+        if row is None or row[0] != version:
+            if row is not None:
+                print(f"Dictionary data or rendering changed, clearing {path}")
+            self._connection.execute("DELETE FROM results")
+            self._connection.execute(
+                "INSERT OR REPLACE INTO meta (key, value) VALUES ('version', ?)", (version,)
+            )
+            self._connection.commit()
+
+    def get(self, word, reading):
+        """Returns the cached HTML ("" if nothing was found), or None if the word isn't cached."""
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT html FROM results WHERE word = ? AND reading = ?", (word, reading)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return row[0]
+
+    def put(self, word, reading, html):
+        with self._lock:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO results (word, reading, html) VALUES (?, ?, ?)",
+                (word, reading, html or ""),
+            )
+            self._pending += 1
+            if self._pending >= self.commit_every:
+                self._commit()
+
+    def _commit(self):
+        self._connection.commit()
+        self._pending = 0
+
+    def commit(self):
+        with self._lock:
+            self._commit()
+
+    def close(self):
+        with self._lock:
+            self._commit()
+            self._connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
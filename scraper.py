@@ -7,24 +7,12 @@ import json
 import re
 from time import sleep
 
-katakana_to_hiragana = {
-    chr(k): chr(k - 96) for k in range(12449, 12534) 
-}
+from kana import hiragana_only, to_hiragana
 
 
-
-def get_hiragana_only(text):
-    text = convert_word_to_hiragana(text)
-    text = re.sub(r"\[(?:[ぁ-ゔー]+)(?:/|／|・|\n| |<br ?\\?>)([ぁ-ゔ]+)\]", r"\1", text)
-    text = re.sub(r"[^ぁ-ゔー]", r"", text)
-    return text
-
-
-def convert_word_to_hiragana(word):
-    # Katakana to Hiragana Conversion
-    for k in [letter for letter in katakana_to_hiragana if letter in word]:
-        word = word.replace(k, katakana_to_hiragana[k])
-    return word
+# Kept for anything still importing them from here, see kana.py
+get_hiragana_only = hiragana_only
+convert_word_to_hiragana = to_hiragana
 
 
 # Function to search for a word in Weblio's dictionary
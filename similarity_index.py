@@ -0,0 +1,198 @@
+"""
+Character bitsets of the words in each reading bucket of big_data.
+
+get_definitions asks "is any word with this reading similar to this version?"
+(see similarity_score in convert_decks.py). With a bucket's words as rows of a bit matrix
+(one column per character used in the bucket), that's a handful of vectorized operations
+instead of two Python sets per word.
+
+Buckets are indexed the first time they're asked for. The build can also precompute all of them
+into SIMILARITY_INDEX_FILE with `python convert_to_big_data.py --similarity-index`.
+"""
+
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+SIMILARITY_INDEX_FILE = "similarity_index.npz"
+SIMILARITY_THRESHOLD = 0.65
+
+
+class BucketBitsets:
+    """The words of one reading bucket as packed character bitsets, in the bucket's order."""
+
+    __slots__ = ("columns", "packed", "sizes")
+
+    def __init__(self, columns, packed, sizes):
+        self.columns = columns  # {character: column}
+        self.packed = packed  # uint8, one row per word, np.packbits of the columns
+        self.sizes = sizes  # Number of different characters in each word
+
+    @classmethod
+    def from_words(cls, words):
+        words = list(words)
+        columns = {character: i for i, character in enumerate(dict.fromkeys("".join(words)))}
+        matrix = np.zeros((len(words), len(columns)), dtype=bool)
+        for row, word in enumerate(words):
+            matrix[row, [columns[character] for character in set(word)]] = True
+        return cls(columns, np.packbits(matrix, axis=1), matrix.sum(axis=1))
+
+    def __len__(self):
+        return len(self.sizes)
+
+    def scores(self, word):
+        """similarity_score(word, x) for every word x in the bucket."""
+        characters = set(word)
+        common = np.zeros(len(self.sizes), dtype=np.int64)
+        for character in characters:
+            column = self.columns.get(character)
+            if column is not None:
+                common += (self.packed[:, column >> 3] >> (7 - (column & 7))) & 1
+
+        largest = np.maximum(self.sizes, len(characters))
+        # Two empty words are the same
+        return np.where(largest == 0, 1.0, common / np.maximum(largest, 1))
+
+    def has_similar(self, word, threshold=SIMILARITY_THRESHOLD):
+        return bool((self.scores(word) > threshold).any())
+
+
+class SimilarityIndex:
+    """
+    BucketBitsets of the reading buckets of one big_data, built lazily and kept in an LRU.
+    Buckets found in a precomputed index file are read from it instead.
+    Safe to share between the threads of a batch conversion.
+    """
+
+    def __init__(self, cache_size=16384, precomputed=None):
+        self.cache_size = cache_size
+        self._buckets = OrderedDict()
+        self._precomputed = precomputed
+        self._lock = threading.Lock()
+        self.data_version = None
+
+    def bucket(self, big_data, dictionary, reading, data_version=None):
+        """Returns the BucketBitsets of big_data[dictionary][reading]."""
+        key = (dictionary, reading)
+        with self._lock:
+            if data_version != self.data_version:
+                # Different data, nothing we have applies to it anymore
+                self._buckets.clear()
+                self.data_version = data_version
+
+            bitsets = self._buckets.get(key)
+            if bitsets is not None:
+                self._buckets.move_to_end(key)
+                return bitsets
+
+        words = big_data[dictionary][reading]
+        if self._precomputed is not None:
+            bitsets = self._precomputed.get(dictionary, reading)
+        # The precomputed index may be out of date
+        if bitsets is None or len(bitsets) != len(words):
+            bitsets = BucketBitsets.from_words(words)
+
+        with self._lock:
+            self._buckets[key] = bitsets
+            if len(self._buckets) > self.cache_size:
+                self._buckets.popitem(last=False)
+        return bitsets
+
+    def has_similar(self, big_data, dictionary, reading, word, data_version=None):
+        """Whether any word with this reading has a similarity_score above SIMILARITY_THRESHOLD."""
+        return self.bucket(big_data, dictionary, reading, data_version).has_similar(word)
+
+
+class PrecomputedBitsets:
+    """Every bucket's BucketBitsets, read out of a SIMILARITY_INDEX_FILE on demand."""
+
+    def __init__(self, path=SIMILARITY_INDEX_FILE):
+        with np.load(path, allow_pickle=False) as data:
+            self.data_version = str(data["data_version"])
+            keys = data["keys"]
+            self._positions = {key: i for i, key in enumerate(keys.tolist())}
+            self._row_offsets = data["row_offsets"]
+            self._byte_offsets = data["byte_offsets"]
+            self._widths = data["widths"]
+            self._char_offsets = data["char_offsets"]
+            self._chars = str(data["chars"])
+            self._bytes = data["bytes"]
+            self._sizes = data["sizes"]
+
+    def get(self, dictionary, reading):
+        i = self._positions.get(f"{dictionary}\t{reading}")
+        if i is None:
+            return None
+        rows = self._row_offsets[i + 1] - self._row_offsets[i]
+        width = self._widths[i]
+        start = self._byte_offsets[i]
+        packed = self._bytes[start : start + rows * width].reshape(rows, width)
+        characters = self._chars[self._char_offsets[i] : self._char_offsets[i + 1]]
+        columns = {character: column for column, character in enumerate(characters)}
+        sizes = self._sizes[self._row_offsets[i] : self._row_offsets[i + 1]]
+        return BucketBitsets(columns, packed, sizes)
+
+
+def save_similarity_index(big_data, data_version, path=SIMILARITY_INDEX_FILE):
+    """
+    Precomputes the BucketBitsets of every reading bucket of big_data.
+
+    Args:
+    - big_data (dict): {dictionary: {reading: {word: [definitions]}}}
+    - data_version (str): Identifies the big_data the index was built from.
+    - path (str): Where to save the index.
+    """
+    keys = []
+    row_offsets = [0]
+    byte_offsets = []
+    widths = []
+    char_offsets = [0]
+    chars = []
+    packed_buckets = []
+    sizes = []
+    byte_offset = 0
+
+    for dictionary, readings in big_data.items():
+        for reading, words in readings.items():
+            bitsets = BucketBitsets.from_words(words)
+            keys.append(f"{dictionary}\t{reading}")
+            row_offsets.append(row_offsets[-1] + len(bitsets))
+            byte_offsets.append(byte_offset)
+            widths.append(bitsets.packed.shape[1])
+            bucket_chars = "".join(bitsets.columns)
+            chars.append(bucket_chars)
+            char_offsets.append(char_offsets[-1] + len(bucket_chars))
+            packed_buckets.append(bitsets.packed.ravel())
+            sizes.append(bitsets.sizes)
+            byte_offset += bitsets.packed.size
+
+    temp_path = f"{path}.tmp.npz"
+    np.savez(
+        temp_path,
+        data_version=np.array(data_version),
+        keys=np.array(keys),
+        row_offsets=np.array(row_offsets, dtype=np.int64),
+        byte_offsets=np.array(byte_offsets, dtype=np.int64),
+        widths=np.array(widths, dtype=np.int64),
+        char_offsets=np.array(char_offsets, dtype=np.int64),
+        chars=np.array("".join(chars)),
+        bytes=np.concatenate(packed_buckets) if packed_buckets else np.zeros(0, dtype=np.uint8),
+        sizes=np.concatenate(sizes).astype(np.int32) if sizes else np.zeros(0, dtype=np.int32),
+    )
+    os.replace(temp_path, path)
+    print(f"Saved similarity index to {path}")
+
+
+def load_similarity_index(data_version, path=SIMILARITY_INDEX_FILE):
+    """
+    Returns a SimilarityIndex, using the precomputed buckets if they were built from the same data.
+    """
+    precomputed = None
+    if os.path.exists(path):
+        precomputed = PrecomputedBitsets(path)
+        if precomputed.data_version != data_version:
+            print(f"{path} was built from other data, indexing buckets as they're used instead")
+            precomputed = None
+    return SimilarityIndex(precomputed=precomputed)